@@ -1,5 +1,13 @@
 import logging
 import requests
+import queue
+import threading
+import time
+import random
+import atexit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from http import HTTPStatus
 from io import BytesIO
 from datetime import datetime
 
@@ -18,59 +26,227 @@ class JSONFormatter(logging.Formatter):
         }
         return log_record
 
+def create_http_session(pool_size=10, max_retries=3, backoff_factor=0.5):
+    """Create a requests Session that keeps the connections to the Manager API alive.
+
+    GET and PUT requests are retried on 502/503/504 responses with exponential
+    backoff and jitter. Every method is retried when the connection fails, 
+    as the request never reached the server.
+
+    Args:
+        pool_size (int): Maximum number of connections kept open
+        max_retries (int): Maximum number of retries of a request
+        backoff_factor (float): Base of the exponential backoff, in seconds
+
+    Returns:
+        requests.Session: Session with the connection pool and retry policy
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        backoff_jitter=backoff_factor,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=["GET", "PUT"],
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def is_session_not_found(response):
+    """Whether a 404 response of the Manager API is about an unknown session, not a missing endpoint."""
+    try:
+        detail = response.json().get("detail")
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(detail, str) and detail.startswith("Session ID not found")
+
 class APILogHandler(logging.Handler):
-    def __init__(self, endpoint, session_id, app_name):
+    def __init__(self, endpoint, session_id, app_name, batch_size=500, flush_interval=2.0, max_queue_size=10000, http_session=None, timeout=None):
         """Wrapper class to automatically send the logs to the Monitor API
 
+        The records are queued by `emit` and sent in batches by a background thread,
+        so logging never waits for the API. When the queue is full the record is dropped.
+
         Args:
             endpoint (str): API Endpoint
             session_id (str): Logs session. Retrieved from the API.
             app_name (str): Name of the app that generate the logs
+            batch_size (int): Maximum number of records sent in a single request
+            flush_interval (float): Maximum number of seconds a record waits in the queue
+            max_queue_size (int): Maximum number of records waiting to be sent
+            http_session (requests.Session): Session used to send the logs. Shared with the ManagerInterface.
+            timeout (tuple): Connect and read timeouts of the requests, in seconds
         """
         super().__init__()
         self.endpoint = endpoint
         self.session_id = session_id
         self.app_name   = app_name
+        self.http_session = http_session or create_http_session()
+        self.timeout      = timeout
+
+        self.batch_size      = batch_size
+        self.flush_interval  = flush_interval
+        self.queue           = queue.Queue(maxsize=max_queue_size)
+        self.dropped_records = 0
+        self.use_batch_endpoint = True
+
+        self.flush_requested = threading.Event()
+        self.stop_requested  = threading.Event()
+        self.closed = False
+
+        self.worker = threading.Thread(target=self.send_queued_logs, name=f"{app_name}-log-handler", daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
 
     def emit(self, record):
-        # Create a log message
-        log_entry = self.format(record)
-        # Send the log message to the specified API endpoint
-        log_entry['session_id'] = self.session_id
-        log_entry['app_name']   = self.app_name
+        try:
+            # Create a log message
+            log_entry = self.format(record)
+            log_entry['session_id'] = self.session_id
+            log_entry['app_name']   = self.app_name
+            self.queue.put_nowait(log_entry)
+        except queue.Full:
+            self.dropped_records += 1
+        except Exception:
+            self.handleError(record)
 
+    def next_batch(self):
         try:
-            response = requests.post(f"{self.endpoint}/log", json=log_entry)
-            response.raise_for_status()  # Raise an error for bad responses
-        except Exception as e:
-            print(f"Failed to send log to API: {e}")
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self.flush_requested.is_set() or self.stop_requested.is_set():
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def send_batch(self, batch):
+        # Send the log messages to the specified API endpoint
+        if self.use_batch_endpoint:
+            try:
+                response = self.http_session.post(f"{self.endpoint}/log/batch", json=batch, timeout=self.timeout)
+                if response.status_code == HTTPStatus.METHOD_NOT_ALLOWED or (
+                    response.status_code == HTTPStatus.NOT_FOUND and not is_session_not_found(response)
+                ):
+                    # Older Manager API, without the batch endpoint
+                    self.use_batch_endpoint = False
+                else:
+                    response.raise_for_status()  # Raise an error for bad responses
+                    return
+            except Exception as e:
+                print(f"Failed to send {len(batch)} logs to API: {e}")
+                return
+
+        for log_entry in batch:
+            try:
+                response = self.http_session.post(f"{self.endpoint}/log", json=log_entry, timeout=self.timeout)
+                response.raise_for_status()  # Raise an error for bad responses
+            except Exception as e:
+                print(f"Failed to send log to API: {e}")
+
+    def send_queued_logs(self):
+        while not (self.stop_requested.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+            if not batch:
+                continue
+
+            try:
+                self.send_batch(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self, timeout=30):
+        """Wait until all the queued records are sent to the API."""
+        self.flush_requested.set()
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and self.worker.is_alive() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.flush_requested.clear()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Handlers closed before the exit (e.g. one per request) must not be kept alive by the exit hook
+        atexit.unregister(self.close)
+
+        self.flush()
+        self.stop_requested.set()
+        self.worker.join(timeout=self.flush_interval + 1)
+
+        if self.dropped_records:
+            print(f"{self.dropped_records} logs were dropped because the queue was full.")
+        super().close()
 
 
 class ManagerInterface():
 
-    def __init__(self, app_name: str, endpoint: str) -> None:
+    def __init__(
+            self, 
+            app_name: str, 
+            endpoint: str, 
+            pool_size: int = 10,
+            connect_timeout: float = 10,
+            read_timeout: float = 60,
+            upload_timeout: float = 600,
+            max_retries: int = 3,
+            backoff_factor: float = 0.5
+        ) -> None:
         self.app_name = app_name
         self.endpoint = endpoint
+        self.timeout        = (connect_timeout, read_timeout)
+        self.upload_timeout = (connect_timeout, upload_timeout)
+        self.max_retries    = max_retries
+        self.backoff_factor = backoff_factor
+        self.http_session   = create_http_session(pool_size, max_retries, backoff_factor)
+        # Uploads are retried by send_with_retries: retries of the adapter would multiply its attempts
+        self.upload_session = create_http_session(pool_size, max_retries=0)
         self.logger = logging.getLogger(app_name)
         self.session_id = None
+        self.api_handler = None
         self.configure_api_logs_handler()
 
     def configure_api_logs_handler(self):
         self.logger.info("Configuring API Logs handler.")
         
         try:
-            response = requests.get(f"{self.endpoint}/log", params={'app_name': self.app_name})
+            response = self.http_session.get(f"{self.endpoint}/log", params={'app_name': self.app_name}, timeout=self.timeout)
             response.raise_for_status()
         except Exception as e:
             self.logger.error(f"Unable to retrieve a Logs' Session ID from the API. {e}")
+            raise
 
         self.session_id = response.json()['session_id']
         self.logger.info(f"Session id: '{self.session_id}'")
 
-        api_handler = APILogHandler(self.endpoint, session_id=self.session_id, app_name=self.app_name)
+        # Handlers of previous sessions would keep a background thread alive and duplicate the logs
+        for handler in list(self.logger.handlers):
+            if isinstance(handler, APILogHandler):
+                self.logger.removeHandler(handler)
+                handler.close()
+
+        self.api_handler = APILogHandler(
+            self.endpoint, 
+            session_id=self.session_id, 
+            app_name=self.app_name,
+            http_session=self.http_session,
+            timeout=self.timeout
+        )
         json_formatter = JSONFormatter()
-        api_handler.setFormatter(json_formatter)
-        self.logger.addHandler(api_handler)
+        self.api_handler.setFormatter(json_formatter)
+        self.logger.addHandler(self.api_handler)
 
     def upload_file(
             self, 
@@ -79,26 +255,82 @@ class ManagerInterface():
             file_content: BytesIO,
             file_name: str
         ):
+        """Upload a file to the storage through the Manager API.
 
-        response = requests.post(
-            f"{self.endpoint}/file", 
-            params={
-                "session_id": self.session_id,
-                "organization": organization,
-                "project": project
-            }, 
-            files={
-                "file": (file_name, file_content, 'text/csv')
-            }
-        )
+        The upload is retried with exponential backoff and jitter on connection errors, 
+        timeouts and 5xx responses. Retrying is safe because the storage path depends 
+        only on the project, organization and file name, so the object is overwritten.
+
+        Returns:
+            bool: True if the file was uploaded
+        """
+
+        def send_request():
+            # The content may have been read by a previous attempt/upload
+            if file_content.seekable():
+                file_content.seek(0)
+
+            return self.upload_session.post(
+                f"{self.endpoint}/file", 
+                params={
+                    "session_id": self.session_id,
+                    "organization": organization,
+                    "project": project
+                }, 
+                files={
+                    "file": (file_name, file_content, 'text/csv')
+                },
+                timeout=self.upload_timeout
+            )
+
+        return self.send_with_retries(file_name, send_request)
+
+    def send_with_retries(self, file_name: str, send_request):
+        """Send an upload request, retrying with exponential backoff and jitter on connection errors, timeouts and 5xx responses.
+
+        Returns:
+            bool: True if the file was uploaded
+        """
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(random.uniform(0, self.backoff_factor * 2 ** attempt))
+
+            try:
+                response = send_request()
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+
+            if response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR:
+                break
+            error = f"HTTP {response.status_code} - {response.text}"
+        else:
+            self.logger.error(f"Unable to upload file {file_name} after {self.max_retries + 1} attempts. {error}")
+            return False
+
+        if response.status_code != HTTPStatus.OK:
+            self.logger.error(f"Unable to upload file {file_name}. HTTP {response.status_code} - {response.text}")
+            return False
+
+        return True
 
     def close_session(self, status="COMPLETED"):
-        response = requests.put(
-            f"{self.endpoint}/status", 
-            json = {
-                "session_id": self.session_id,
-                "status": status,  # New Session STATUS
-                "end": datetime.now().isoformat()
-            }
-        )
+        # Send the pending logs before closing the session
+        if self.api_handler:
+            self.api_handler.flush()
 
+        try:
+            response = self.http_session.put(
+                f"{self.endpoint}/status", 
+                json = {
+                    "session_id": self.session_id,
+                    "status": status,  # New Session STATUS
+                    "end": datetime.now().isoformat()
+                },
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.error(f"Unable to close the session '{self.session_id}'. {e}")
@@ -284,20 +284,29 @@ if __name__ == "__main__":
                     logger.error(f"Unable to determine which project (arbo/respat) the file '{filename}' from {lab_name} is part of. The file will not be uploaded.")
                     continue
 
+                all_projects_uploaded = True
                 for project in projects:
 
                     logger.info(f"Uploading file {filename} (project={project})...")
                     new_filename = f"{lab_name}_{email_date}__{filename}"
 
-                    manager_interface.upload_file(
+                    file_uploaded = manager_interface.upload_file(
                         organization=lab_name.lower(),
                         project=project,
                         file_content=file_bytes,
                         file_name=new_filename
                     )
-                    logger.info(f"Finished uploading file {filename}!")
                     file_bytes.seek(0)
 
+                    if not file_uploaded:
+                        all_projects_uploaded = False
+                        continue
+                    logger.info(f"Finished uploading file {filename}!")
+
+                # Files not uploaded are tried again in the next execution
+                if not all_projects_uploaded:
+                    continue
+
                 logger.info(f"Adding {filename} to the list of downloaded files today.")
                 update_files_downloaded_today([filename])
     
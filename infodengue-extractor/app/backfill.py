@@ -0,0 +1,230 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from epiweeks import Year
+
+from client import InfoDengueClient
+from http_cache import ResponseCache
+from fetch import FetchEngine
+from output import SpooledCSVWriter
+from enrich import enrich_in_batches
+
+
+class BackfillShard():
+
+    def __init__(self, disease: str, uf: str, from_year: int, to_year: int) -> None:
+        """Unit of work of a backfill: all the cities of a UF, for a disease and a range of years.
+
+        Args:
+            disease (str): Disease
+            uf (str): UF code
+            from_year (int): First year, inclusive
+            to_year (int): Last year, inclusive
+        """
+        self.disease = disease
+        self.uf = uf
+        self.from_year = from_year
+        self.to_year = to_year
+
+    @property
+    def name(self):
+        return f"{self.disease}/{self.uf}/{self.from_year}-{self.to_year}"
+
+    def partition_dir(self, base_dir: str):
+        return os.path.join(base_dir, f"disease={self.disease}", f"uf={self.uf}")
+
+    def file_name(self, compress: bool = False):
+        file_name = f"INFODENGUE_{self.uf}_{self.disease}_{self.from_year}_{self.to_year}.csv"
+        return f"{file_name}.gz" if compress else file_name
+
+
+def build_shards(from_year: int, to_year: int, diseases: list, ufs: list, years_per_shard: int = 1):
+    """Split a backfill into shards of `years_per_shard` years, for each disease and UF.
+
+    Returns:
+        list of BackfillShard: Shards, in the order they are submitted
+    """
+    return [
+        BackfillShard(disease, uf, year, min(year + years_per_shard - 1, to_year))
+        for disease in diseases
+        for uf in ufs
+        for year in range(from_year, to_year + 1, years_per_shard)
+    ]
+
+
+def run_shard(shard: BackfillShard, cities: dict, base_dir: str, client_config: dict, last_epiweek: tuple, compress: bool = False, cache_config: dict = None):
+    """Extract a shard and write its file to the partition directory.
+
+    Runs in a worker process: the file is written to a temporary path and
+    renamed when complete, followed by a `.done` marker.
+
+    Args:
+        shard (BackfillShard): Shard to extract
+        cities (dict): City data for each geocode of the UF
+        base_dir (str): Directory of the backfill outputs
+        client_config (dict): Arguments of the InfoDengueClient of the worker
+        last_epiweek (tuple): (year, epiweek) of the last epiweek that can be requested
+        compress (bool): Compress the file with gzip
+        cache_config (dict): Arguments of the ResponseCache of the worker. None disables the cache.
+
+    Returns:
+        dict: Shard name, file path, number of rows, failed cities and elapsed seconds
+    """
+    start = time.monotonic()
+    cache = ResponseCache(**cache_config) if cache_config is not None else None
+    client = InfoDengueClient(**client_config, cache=cache)
+    fetch_engine = FetchEngine(client_config["max_concurrency"])
+
+    ew_end = Year(shard.to_year).totalweeks()
+    if (shard.to_year, ew_end) > last_epiweek:
+        ew_end = last_epiweek[1]
+
+    fetch_tasks = [
+        (geocode, shard.disease, 1, ew_end, shard.from_year, shard.to_year)
+        for geocode in cities.keys()
+    ]
+
+    partition_dir = shard.partition_dir(base_dir)
+    os.makedirs(partition_dir, exist_ok=True)
+    output_writer = SpooledCSVWriter(8 * 1024 * 1024, partition_dir, compress=compress)
+
+    failed_cities = 0
+    def city_dataframes():
+        nonlocal failed_cities
+        for geocode, infodengue_df in zip(cities.keys(), fetch_engine.fetch_iter(client.get_city_data, fetch_tasks)):
+            if infodengue_df is None:
+                failed_cities += 1
+                continue
+            if infodengue_df.shape[0] < 1:
+                continue
+
+            yield infodengue_df.assign(disease=shard.disease, city_ibge_code=geocode)
+
+    for enriched_df in enrich_in_batches(city_dataframes(), shard.uf, cities):
+        output_writer.write(enriched_df)
+
+    path = os.path.join(partition_dir, shard.file_name(compress))
+    output_file = output_writer.finish()
+    with open(f"{path}.tmp", 'wb') as f:
+        while chunk := output_file.read(1024 * 1024):
+            f.write(chunk)
+    output_file.close()
+    os.replace(f"{path}.tmp", path)
+
+    # A shard with failed cities is not marked as done, so it runs again when the backfill is restarted.
+    # The marker keeps the number of rows of the file.
+    if failed_cities == 0:
+        with open(f"{path}.done", 'w') as f:
+            f.write(str(output_writer.rows))
+
+    return {
+        "shard": shard.name,
+        "path": path,
+        "rows": output_writer.rows,
+        "failed_cities": failed_cities,
+        "elapsed": time.monotonic() - start,
+        "client_summary": client.summary() + (f". {cache.summary()}" if cache is not None else "")
+    }
+
+
+class Backfill():
+
+    def __init__(
+            self,
+            base_dir: str,
+            cities_per_uf: dict,
+            client_config: dict,
+            last_epiweek: tuple,
+            processes: int = 4,
+            compress: bool = False,
+            cache_config: dict = None,
+            logger=None
+        ) -> None:
+        """Extract the InfoDengue data of past years, running the shards in a process pool.
+
+        Each shard writes its own file in `base_dir/disease=<disease>/uf=<uf>/`.
+        Shards with a `.done` marker are skipped and files with an `.uploaded`
+        marker are not uploaded again, so a stopped backfill restarts shard by shard.
+        Separate from the daily extraction: the history store is not used.
+
+        Args:
+            base_dir (str): Directory of the backfill outputs
+            cities_per_uf (dict): City data for each geocode, for each UF
+            client_config (dict): Arguments of the InfoDengueClient of all the workers together.
+                The request rate is split between the processes.
+            last_epiweek (tuple): (year, epiweek) of the last epiweek that can be requested
+            processes (int): Number of worker processes
+            compress (bool): Compress the files with gzip
+            cache_config (dict): Arguments of the ResponseCache of the workers. None disables the cache.
+            logger (logging.Logger): Logger
+        """
+        self.base_dir = base_dir
+        self.cities_per_uf = cities_per_uf
+        self.last_epiweek = last_epiweek
+        self.processes = processes
+        self.compress = compress
+        self.cache_config = cache_config
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.client_config = dict(client_config)
+        self.client_config["max_requests_per_second"] = client_config["max_requests_per_second"] / processes
+
+    def shard_path(self, shard: BackfillShard):
+        return os.path.join(shard.partition_dir(self.base_dir), shard.file_name(self.compress))
+
+    def done_rows(self, shard: BackfillShard):
+        """Number of rows of a shard already done, or None if it is not done."""
+        done_path = f"{self.shard_path(shard)}.done"
+        if not os.path.exists(done_path):
+            return None
+        with open(done_path, 'r') as f:
+            return int(f.read() or 0)
+
+    def pending_shards(self, shards: list):
+        return [shard for shard in shards if self.done_rows(shard) is None]
+
+    def run(self, shards: list, on_shard_done=None):
+        """Run the shards not done yet.
+
+        Args:
+            shards (list of BackfillShard): All the shards of the backfill
+            on_shard_done (callable): Called in the main process with the result of each shard
+
+        Returns:
+            list of dict: Results of the shards run
+        """
+        pending_shards = self.pending_shards(shards)
+        self.logger.info(f"Backfill: {len(shards)} shards, {len(shards) - len(pending_shards)} already done. Running with {self.processes} processes.")
+
+        results = []
+        # Spawned processes do not inherit the threads of the manager interface
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=context) as executor:
+            futures = {
+                executor.submit(
+                    run_shard, shard, self.cities_per_uf[shard.uf], self.base_dir,
+                    self.client_config, self.last_epiweek, self.compress, self.cache_config
+                ): shard
+                for shard in pending_shards
+            }
+
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.error(f"Backfill shard {shard.name} failed: {e}")
+                    continue
+
+                self.logger.info(
+                    f"Backfill shard {result['shard']} finished in {result['elapsed']:.1f}s. "
+                    f"Rows: {result['rows']}, failed cities: {result['failed_cities']}. {result['client_summary']}"
+                )
+                results.append(result)
+                if on_shard_done is not None:
+                    on_shard_done(shard, result)
+
+        return results
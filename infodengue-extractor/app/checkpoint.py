@@ -0,0 +1,167 @@
+import os
+import json
+import shutil
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from history import HistoryStore
+
+
+class Checkpoint():
+
+    # Status of a (disease, UF) unit
+    EXTRACTED = "EXTRACTED" # History store updated, file not uploaded yet
+    DONE      = "DONE"      # File uploaded
+
+    def __init__(self, base_dir: str, year: int, epiweek: int, shared: bool = False) -> None:
+        """Progress of a run, saved to disk so a restarted run resumes where the previous one stopped.
+
+        Keeps the status of each (disease, UF) and the rows already fetched for
+        each city of the UFs in progress. A checkpoint of another epiweek is discarded.
+
+        A `shared` checkpoint is used by several workers at once (see `worker.py`).
+        The status of each (disease, UF) is kept by the leases in the Manager API,
+        so only the rows fetched for each city are saved, and they are resumed by
+        the worker that claims the UF again.
+
+        Args:
+            base_dir (str): Directory where the checkpoint is saved
+            year (int): Year of the run
+            epiweek (int): Epiweek of the run
+            shared (bool): Checkpoint shared by the workers of a distributed run
+        """
+        self.base_dir = base_dir
+        self.shared = shared
+        self.meta_path = os.path.join(base_dir, "checkpoint.json")
+        self.lock = threading.Lock()
+
+        self.meta = {"year": year, "epiweek": epiweek, "ufs": dict()}
+        self.resumed = False
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r') as f:
+                saved_meta = json.load(f)
+            if (saved_meta["year"], saved_meta["epiweek"]) == (year, epiweek):
+                self.meta = saved_meta
+                self.resumed = True
+
+        if not self.resumed:
+            # Discards any file left by a checkpoint of another epiweek
+            shutil.rmtree(base_dir, ignore_errors=True)
+            self.save()
+
+    def save(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        with open(f"{self.meta_path}.tmp", 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(f"{self.meta_path}.tmp", self.meta_path)
+
+    def uf_status(self, disease: str, uf: str):
+        if self.shared:
+            return None
+        return self.meta["ufs"].get(f"{disease}|{uf}")
+
+    def set_uf_status(self, disease: str, uf: str, status: str):
+        if self.shared:
+            return
+
+        # Called by the background uploads too
+        with self.lock:
+            self.meta["ufs"][f"{disease}|{uf}"] = status
+            self.save()
+
+    def uf_dir(self, disease: str, uf: str):
+        return os.path.join(self.base_dir, disease, uf)
+
+    def open_uf(self, disease: str, uf: str, flush_every: int = 50):
+        """Start saving the cities fetched for a disease and UF.
+
+        Returns:
+            UFCheckpoint: Checkpoint of the cities of the UF
+        """
+        return UFCheckpoint(self.uf_dir(disease, uf), flush_every)
+
+    def clear_uf(self, disease: str, uf: str):
+        # Fetched rows are not needed once they are in the history store
+        shutil.rmtree(self.uf_dir(disease, uf), ignore_errors=True)
+
+    def clear(self):
+        # Other workers may still be using a shared checkpoint
+        if self.shared:
+            return
+
+        # Called when the run finishes, so the next run of the same epiweek starts from scratch
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+class UFCheckpoint():
+
+    def __init__(self, base_dir: str, flush_every: int) -> None:
+        """Rows fetched for each city of a disease and UF.
+
+        Cities are saved in batches of `flush_every`: the rows in a Parquet
+        part file and, after it, the geocodes in `completed.txt`. A city is only
+        resumed when its geocode is in `completed.txt`.
+
+        Args:
+            base_dir (str): Directory of the disease and UF
+            flush_every (int): Number of cities saved at once
+        """
+        self.base_dir = base_dir
+        self.flush_every = flush_every
+        self.completed_path = os.path.join(base_dir, "completed.txt")
+        self.pending = dict()
+
+        os.makedirs(base_dir, exist_ok=True)
+        self.n_parts = len([name for name in os.listdir(base_dir) if name.endswith(".parquet")])
+
+    def load(self):
+        """Load the cities saved by a previous run.
+
+        Returns:
+            dict: Rows of each completed city. None for cities without data.
+        """
+        if not os.path.exists(self.completed_path):
+            return dict()
+
+        with open(self.completed_path, 'r') as f:
+            completed_geocodes = set(f.read().splitlines())
+
+        parts = [
+            pd.read_parquet(os.path.join(self.base_dir, name))
+            for name in sorted(os.listdir(self.base_dir)) if name.endswith(".parquet")
+        ]
+        rows_per_city = dict()
+        if parts:
+            rows_per_city = {geocode: city_df for geocode, city_df in pd.concat(parts).groupby('city_ibge_code', sort=False)}
+
+        return {geocode: rows_per_city.get(geocode) for geocode in completed_geocodes}
+
+    def add(self, geocode: str, infodengue_df: pd.DataFrame = None):
+        """Save the rows of a city.
+
+        Args:
+            geocode (str): City geocode
+            infodengue_df (pd.DataFrame): Rows fetched, or None if the city has no data
+        """
+        self.pending[geocode] = infodengue_df
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        city_dataframes = [df for df in self.pending.values() if df is not None]
+        if city_dataframes:
+            part_path = os.path.join(self.base_dir, f"part-{self.n_parts:05d}.parquet")
+            table = pa.Table.from_pandas(pd.concat(city_dataframes)[HistoryStore.COLUMNS], schema=HistoryStore.SCHEMA, preserve_index=False)
+            pq.write_table(table, f"{part_path}.tmp")
+            os.replace(f"{part_path}.tmp", part_path)
+            self.n_parts += 1
+
+        with open(self.completed_path, 'a') as f:
+            f.write("".join(f"{geocode}\n" for geocode in self.pending))
+        self.pending = dict()
@@ -0,0 +1,77 @@
+import os
+import csv
+import json
+import hashlib
+
+# Only these columns of the IBGE file are used by the extractor
+LOOKUP_COLUMNS = ('municipio_codigo', 'municipio_nome', 'uf_sigla')
+
+
+def get_file_hash(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def build_lookup(file_path):
+    """Read the needed columns of the IBGE file.
+
+    Returns:
+        dict: One tuple of values for each column in LOOKUP_COLUMNS, in the order of the file
+    """
+    with open(file_path, newline='', encoding='utf-8') as f:
+        rows = [tuple(row[column] for column in LOOKUP_COLUMNS) for row in csv.DictReader(f)]
+
+    return {column: values for column, values in zip(LOOKUP_COLUMNS, zip(*rows))}
+
+def load_lookup(file_path, cache_dir):
+    """Load the city lookup from the cache, building it when the IBGE file changes.
+
+    The cache file name contains the hash of the IBGE file, so an updated file
+    never reuses an outdated cache.
+
+    Args:
+        file_path (str): Path to the IBGE file
+        cache_dir (str): Directory where the cache is saved (the data volume). Not cached if not writable.
+
+    Returns:
+        dict: One tuple of values for each column in LOOKUP_COLUMNS
+    """
+    cache_path = os.path.join(cache_dir, f"ibge_municipios.{get_file_hash(file_path)}.json")
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+            return {column: tuple(cached[column]) for column in LOOKUP_COLUMNS}
+        except (ValueError, KeyError, TypeError, OSError):
+            pass
+
+    lookup = build_lookup(file_path)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(f"{cache_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(lookup, f, ensure_ascii=False)
+        os.replace(f"{cache_path}.tmp", cache_path)
+    except OSError:
+        pass
+
+    return lookup
+
+def load_cities(file_path, cache_dir):
+    """Build the dictionaries of cities to extract from the IBGE file.
+
+    Returns:
+        tuple: Cities indexed by geocode, and cities indexed by UF and geocode
+    """
+    lookup = load_lookup(file_path, cache_dir)
+
+    cities_to_extract = dict()
+    cities_to_extract_per_uf = dict()
+    for city_key, name, uf in zip(lookup['municipio_codigo'], lookup['municipio_nome'], lookup['uf_sigla']):
+        city_data = {"name": name, "state_code": uf}
+        cities_to_extract[city_key] = city_data
+        cities_to_extract_per_uf.setdefault(uf, dict())[city_key] = city_data
+
+    assert len(cities_to_extract) == len(lookup['municipio_codigo']), "Duplicate city codes found in ibge file"
+    assert sum([len(cities) for uf, cities in cities_to_extract_per_uf.items()]) == len(cities_to_extract), "Mismatch in city counts"
+
+    return cities_to_extract, cities_to_extract_per_uf
@@ -0,0 +1,121 @@
+import os
+import json
+import fcntl
+from datetime import date
+
+
+class CityStats():
+
+    # How a city is requested in a run
+    FULL  = "FULL"  # All the epiweeks of the extraction
+    PROBE = "PROBE" # Only the recent epiweeks, to check if the city started to have data
+    SKIP  = "SKIP"  # Not requested
+
+    def __init__(self, path: str, empty_runs_threshold: int = 4, probe_interval: int = 1, full_sweep_interval: int = 7, today: date = None) -> None:
+        """Statistics of each (geocode, disease) in previous runs, used to request less the cities that never have data.
+
+        A city is considered empty after `empty_runs_threshold` full requests in a row
+        returned no rows. Empty cities are requested in full every `full_sweep_interval`
+        days and probed every `probe_interval` days. In the other runs they are skipped.
+
+        Args:
+            path (str): Path to the JSON file where the statistics are saved
+            empty_runs_threshold (int): Full requests without rows that make a city empty
+            probe_interval (int): Days between probes of an empty city
+            full_sweep_interval (int): Days between full requests of an empty city
+            today (date): Date of the run. Defaults to the current date.
+        """
+        self.path = path
+        self.empty_runs_threshold = empty_runs_threshold
+        self.probe_interval = probe_interval
+        self.full_sweep_interval = full_sweep_interval
+        self.today = today or date.today()
+
+        self.stats = dict()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.stats = json.load(f)
+
+        self.recorded = set()
+        self.scheduled = {self.FULL: 0, self.PROBE: 0, self.SKIP: 0}
+        self.probes_with_data = 0
+
+    def days_since(self, day: str):
+        if day is None:
+            return float('inf')
+        return (self.today - date.fromisoformat(day)).days
+
+    def schedule(self, disease: str, geocode: str):
+        """Decide how a city is requested in this run.
+
+        Returns:
+            str: FULL, PROBE or SKIP
+        """
+        city_stats = self.stats.get(disease, dict()).get(geocode)
+
+        if city_stats is None or city_stats["empty_runs"] < self.empty_runs_threshold:
+            action = self.FULL
+        elif self.days_since(city_stats.get("last_full")) >= self.full_sweep_interval:
+            action = self.FULL
+        elif self.days_since(city_stats.get("last_probe")) >= self.probe_interval:
+            action = self.PROBE
+        else:
+            action = self.SKIP
+
+        self.scheduled[action] += 1
+        return action
+
+    def record(self, disease: str, geocode: str, action: str, rows: int):
+        """Save the result of a request.
+
+        Args:
+            disease (str): Disease requested
+            geocode (str): City geocode
+            action (str): FULL or PROBE
+            rows (int): Number of rows returned. None if the request failed, which is not recorded.
+        """
+        if rows is None:
+            return
+
+        self.recorded.add((disease, geocode))
+        city_stats = self.stats.setdefault(disease, dict()).setdefault(geocode, {"empty_runs": 0, "last_full": None, "last_probe": None})
+        if action == self.FULL:
+            city_stats["last_full"] = self.today.isoformat()
+            city_stats["empty_runs"] = 0 if rows > 0 else city_stats["empty_runs"] + 1
+        else:
+            city_stats["last_probe"] = self.today.isoformat()
+            if rows > 0:
+                self.probes_with_data += 1
+                city_stats["empty_runs"] = 0
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # The file may be shared by several workers (each one recording other cities), so it is
+        # read again under a lock and only the cities recorded by this worker are replaced
+        with open(f"{self.path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            saved_stats = dict()
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    saved_stats = json.load(f)
+            for disease, geocode in self.recorded:
+                saved_stats.setdefault(disease, dict())[geocode] = self.stats[disease][geocode]
+
+            with open(f"{self.path}.tmp", 'w') as f:
+                json.dump(saved_stats, f)
+            os.replace(f"{self.path}.tmp", self.path)
+
+    def summary(self):
+        total = sum(self.scheduled.values())
+        if total == 0:
+            return "No cities scheduled."
+
+        # Probes that found data are followed by a full request
+        avoided = self.scheduled[self.SKIP] + self.scheduled[self.PROBE] - self.probes_with_data
+        return (
+            f"Cities requested in full: {self.scheduled[self.FULL]}, probed: {self.scheduled[self.PROBE]} "
+            f"({self.probes_with_data} with new data), skipped: {self.scheduled[self.SKIP]}. "
+            f"Full requests avoided: {avoided} of {total} ({100 * avoided / total:.1f}%)"
+        )
@@ -0,0 +1,319 @@
+import io
+import time
+import random
+import logging
+import threading
+
+import requests
+import pandas as pd
+from http import HTTPStatus
+from requests.adapters import HTTPAdapter
+
+INFODENGUE_COLUMNS = ['data_iniSE', 'SE', 'casos_est', 'casos_est_min', 'casos_est_max', 'casos', 'casprov', 'notif_accum_year', 'casconf']
+
+
+class TransientError(Exception):
+    """Error that may not happen again if the request is retried (throttling, 5xx)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket():
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        """Limit the request rate, allowing short bursts.
+
+        Args:
+            rate (float): Tokens added per second. Zero or negative disables the limit.
+            capacity (float): Maximum number of tokens (burst size). Defaults to `rate`.
+        """
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter():
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_threshold: float, decrease_factor: float = 0.5) -> None:
+        """Limit the number of requests running at the same time, adapting the limit to the API health (AIMD).
+
+        The limit grows by one after a full window of healthy responses, and is
+        multiplied by `decrease_factor` after a throttled/failed or slow response.
+
+        Args:
+            initial (int): Initial limit
+            minimum (int): Minimum limit
+            maximum (int): Maximum limit
+            latency_threshold (float): Responses slower than this (in seconds) decrease the limit
+            decrease_factor (float): Multiplicative decrease factor
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_threshold = latency_threshold
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self, latency: float, throttled: bool):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled or latency > self.latency_threshold:
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class CircuitBreaker():
+
+    CLOSED, OPEN, HALF_OPEN = "CLOSED", "OPEN", "HALF_OPEN"
+
+    def __init__(self, failure_threshold: int, cooldown: float, max_cooldown: float, logger=None) -> None:
+        """Pause all the requests when the API keeps failing.
+
+        After `failure_threshold` consecutive failures the circuit opens and every
+        request waits `cooldown` seconds. Then a single request is let through: if it
+        succeeds the circuit closes, otherwise it opens again with twice the cooldown.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            cooldown (float): Seconds the circuit stays open the first time
+            max_cooldown (float): Maximum seconds the circuit stays open
+            logger (logging.Logger): Logger used to report the pauses
+        """
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.times_opened = 0
+        self.condition = threading.Condition()
+
+    def open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self.logger.warning(f"InfoDengue API is failing. Pausing requests for {self.cooldown:.0f}s.")
+
+    def before_request(self):
+        with self.condition:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+
+                if self.state == self.OPEN:
+                    remaining = self.opened_at + self.cooldown - time.monotonic()
+                    if remaining <= 0:
+                        self.state = self.HALF_OPEN
+                        return
+                    self.condition.wait(remaining)
+                else:
+                    # Waits for the result of the request made in HALF_OPEN state
+                    self.condition.wait()
+
+    def record_success(self):
+        with self.condition:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.logger.info("InfoDengue API recovered. Resuming requests.")
+                self.state = self.CLOSED
+                self.cooldown = self.base_cooldown
+                self.condition.notify_all()
+
+    def record_failure(self):
+        with self.condition:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self.open()
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self.open()
+            self.condition.notify_all()
+
+
+class InfoDengueClient():
+
+    def __init__(
+            self,
+            base_url: str,
+            max_concurrency: int = 8,
+            max_requests_per_second: float = 10,
+            latency_threshold: float = 5,
+            max_retries: int = 3,
+            backoff_factor: float = 1,
+            failure_threshold: int = 10,
+            cooldown: float = 30,
+            max_cooldown: float = 600,
+            timeout: tuple = (10, 60),
+            cache=None,
+            logger=None
+        ) -> None:
+        """Client of the InfoDengue `alertcity` API.
+
+        Requests are rate limited (token bucket), run with an adaptive concurrency
+        limit, retried with backoff on transient errors (connection errors, 429, 5xx)
+        and paused by a circuit breaker when the API keeps failing. Responses saved
+        in the cache are used without making a request.
+
+        Args:
+            base_url (str): URL of the `alertcity` endpoint
+            max_concurrency (int): Maximum number of requests at the same time
+            max_requests_per_second (float): Maximum request rate
+            latency_threshold (float): Responses slower than this (in seconds) reduce the concurrency
+            max_retries (int): Maximum number of retries of a request
+            backoff_factor (float): Base of the exponential backoff, in seconds
+            failure_threshold (int): Consecutive failures that pause the requests
+            cooldown (float): Seconds the requests are paused the first time
+            max_cooldown (float): Maximum seconds the requests are paused
+            timeout (tuple): Connect and read timeouts, in seconds
+            cache (ResponseCache): Cache of the responses. None disables the cache.
+            logger (logging.Logger): Logger used to report the pauses and the failed requests
+        """
+        self.base_url = base_url
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.cache = cache
+
+        self.token_bucket    = TokenBucket(max_requests_per_second)
+        self.concurrency     = AdaptiveConcurrencyLimiter(max(1, max_concurrency // 2), 1, max_concurrency, latency_threshold)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, cooldown, max_cooldown, self.logger)
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.retries = 0
+        self.transient_errors = 0
+        self.lock = threading.Lock()
+
+    def get_url(self, geocode, disease, ew_start, ew_end, ey_start, ey_end):
+        return (
+            f"{self.base_url}?geocode={geocode}&disease={disease}&format=csv"
+            f"&ew_start={ew_start}&ew_end={ew_end}&ey_start={ey_start}&ey_end={ey_end}"
+        )
+
+    def request(self, url):
+        """Make a single request, respecting the rate, concurrency and circuit breaker limits.
+
+        Returns:
+            bytes: Response content
+
+        Raises:
+            TransientError: Throttled or server error
+            requests.exceptions.RequestException: Connection error or 4xx response
+        """
+        self.circuit_breaker.before_request()
+        self.token_bucket.acquire()
+        self.concurrency.acquire()
+
+        start = time.monotonic()
+        throttled = True
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+
+            if response.status_code == HTTPStatus.TOO_MANY_REQUESTS or response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                retry_after = response.headers.get("Retry-After")
+                raise TransientError(
+                    f"HTTP {response.status_code}",
+                    retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+                )
+
+            throttled = False
+            response.raise_for_status()
+            return response.content
+        finally:
+            self.concurrency.release(time.monotonic() - start, throttled)
+
+    def get_city_data(self, geocode, disease, ew_start, ew_end, ey_start, ey_end):
+        """Request the data of a city and disease between two epiweeks.
+
+        Returns:
+            pd.DataFrame: Values as text, exactly as returned by the API. None if the request failed.
+        """
+        url = self.get_url(geocode, disease, ew_start, ew_end, ey_start, ey_end)
+
+        content = self.cache.get(url) if self.cache is not None else None
+        if content is not None:
+            return self.parse(content)
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                with self.lock:
+                    self.retries += 1
+
+            try:
+                content = self.request(url)
+                self.circuit_breaker.record_success()
+            except (TransientError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.circuit_breaker.record_failure()
+                with self.lock:
+                    self.transient_errors += 1
+
+                if attempt == self.max_retries:
+                    break
+
+                retry_after = getattr(e, "retry_after", None)
+                time.sleep(retry_after or random.uniform(0, self.backoff_factor * 2 ** attempt))
+                continue
+            except Exception as e:
+                # The API answered (e.g. 4xx), so it is not failing
+                self.circuit_breaker.record_success()
+                self.logger.error(f"Unable to get the data from {url}. {e}")
+                return None
+
+            infodengue_df = self.parse(content)
+            # Only valid responses are saved
+            if infodengue_df is not None and self.cache is not None:
+                self.cache.put(url, content)
+            return infodengue_df
+
+        self.logger.error(f"Unable to get the data from {url} after {self.max_retries + 1} attempts")
+        return None
+
+    def parse(self, content):
+        try:
+            infodengue_df = pd.read_csv(io.BytesIO(content), dtype=str)
+            return infodengue_df[INFODENGUE_COLUMNS]
+        except Exception as e:
+            self.logger.error(f"Unable to parse the InfoDengue response. {e}")
+            return None
+
+    def summary(self):
+        return (
+            f"Retries: {self.retries}, transient errors: {self.transient_errors}, "
+            f"pauses: {self.circuit_breaker.times_opened}, final concurrency limit: {int(self.concurrency.limit)}"
+        )
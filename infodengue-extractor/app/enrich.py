@@ -0,0 +1,83 @@
+import pandas as pd
+
+from client import INFODENGUE_COLUMNS
+
+UF_TO_NAME = {
+    "AC": "Acre",              "AL": "Alagoas",              "AM": "Amazonas",
+    "AP": "Amapá",             "BA": "Bahia",                "CE": "Ceará",
+    "DF": "Distrito Federal",  "ES": "Espírito Santo",       "GO": "Goiás",
+    "MA": "Maranhão",          "MT": "Mato Grosso",          "MS": "Mato Grosso do Sul",   
+    "MG": "Minas Gerais",      "PA": "Pará",                 "PB": "Paraíba",
+    "PR": "Paraná",            "PE": "Pernambuco",           "PI": "Piauí",
+    "RJ": "Rio de Janeiro",    "RN": "Rio Grande do Norte",  "RS": "Rio Grande do Sul",
+    "RO": "Rondônia",          "RR": "Roraima",              "SC": "Santa Catarina",
+    "SP": "São Paulo",         "SE": "Sergipe",              "TO": "Tocantins"
+}
+
+UF_TO_REGION = {
+    "AC": "Norte", "AP": "Norte", "AM": "Norte", "PA": "Norte", "RO": "Norte", "RR": "Norte", "TO": "Norte",
+    "AL": "Nordeste", "BA": "Nordeste", "CE": "Nordeste", "MA": "Nordeste", "PB": "Nordeste",
+    "PE": "Nordeste", "PI": "Nordeste", "RN": "Nordeste", "SE": "Nordeste",
+    "DF": "Centro-Oeste", "GO": "Centro-Oeste", "MT": "Centro-Oeste", "MS": "Centro-Oeste",
+    "ES": "Sudeste", "MG": "Sudeste", "RJ": "Sudeste", "SP": "Sudeste",
+    "PR": "Sul", "RS": "Sul", "SC": "Sul"
+}
+
+OUTPUT_COLUMNS = INFODENGUE_COLUMNS + ['disease', 'city_ibge_code', 'city', 'state_code', 'state', 'region', 'data_fimSE']
+
+# Rows of several cities enriched at once, so the enrichment does not run once per city
+ENRICH_BATCH_ROWS = 64 * 1024
+
+def enrich_infodengue_df(infodengue_df, uf, cities):
+    """Add the city, state, region and week end date columns to all the rows of a UF at once.
+
+    Repeated strings are stored as categoricals, so the mappings are made once
+    per distinct value instead of once per row.
+
+    Args:
+        infodengue_df (pd.DataFrame): Rows of a single UF and disease
+        uf (str): UF code
+        cities (dict): City data for each geocode of the UF
+
+    Returns:
+        pd.DataFrame: Rows with the columns in OUTPUT_COLUMNS
+    """
+    city_names = {geocode: city_data['name'] for geocode, city_data in cities.items()}
+
+    enriched_df = infodengue_df.copy()
+    enriched_df['disease'] = enriched_df['disease'].astype('category')
+    enriched_df['city_ibge_code'] = enriched_df['city_ibge_code'].astype('category')
+    enriched_df['city'] = enriched_df['city_ibge_code'].map(city_names)
+    enriched_df['state_code'] = pd.Categorical([uf] * len(enriched_df))
+    enriched_df['state'] = enriched_df['state_code'].map(UF_TO_NAME)
+    enriched_df['region'] = enriched_df['state_code'].map(UF_TO_REGION)
+
+    # Only the distinct week start dates are converted
+    week_start = enriched_df['data_iniSE'].astype('category')
+    week_end = pd.to_datetime(week_start.cat.categories, format='%Y-%m-%d') + pd.Timedelta(days=6)
+    enriched_df['data_fimSE'] = week_start.cat.rename_categories(week_end.strftime('%Y-%m-%d'))
+
+    return enriched_df[OUTPUT_COLUMNS]
+
+def enrich_in_batches(city_dataframes, uf, cities, batch_rows=ENRICH_BATCH_ROWS):
+    """Enrich the rows of the cities of a UF in batches of about `batch_rows` rows.
+
+    Args:
+        city_dataframes (iterable): Rows of each city, in the order they must appear in the file
+        uf (str): UF code
+        cities (dict): City data for each geocode of the UF
+        batch_rows (int): Number of rows enriched at once
+
+    Yields:
+        pd.DataFrame: Enriched rows of several cities, with the columns in OUTPUT_COLUMNS
+    """
+    batch, rows = [], 0
+    for city_df in city_dataframes:
+        batch.append(city_df)
+        rows += len(city_df)
+        if rows >= batch_rows:
+            yield enrich_infodengue_df(pd.concat(batch, ignore_index=True), uf, cities)
+            batch, rows = [], 0
+
+    if batch:
+        yield enrich_infodengue_df(pd.concat(batch, ignore_index=True), uf, cities)
@@ -0,0 +1,77 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FetchStats():
+
+    def __init__(self) -> None:
+        """Latency and failure counters of all the requests made in a run."""
+        self.latencies = []
+        self.failures  = 0
+        self.lock = threading.Lock()
+
+    def add(self, latency: float, failed: bool):
+        with self.lock:
+            self.latencies.append(latency)
+            self.failures += int(failed)
+
+    def summary(self):
+        if not self.latencies:
+            return "No requests made."
+
+        latencies = sorted(self.latencies)
+        def percentile(p):
+            return latencies[min(int(len(latencies) * p), len(latencies) - 1)]
+
+        return (
+            f"Requests: {len(latencies)}, failures: {self.failures}. "
+            f"Latency p50: {percentile(0.50):.2f}s, p95: {percentile(0.95):.2f}s, max: {latencies[-1]:.2f}s"
+        )
+
+
+class FetchEngine():
+
+    def __init__(self, max_workers: int) -> None:
+        """Run the requests to the InfoDengue API in parallel.
+
+        Args:
+            max_workers (int): Maximum number of requests running at the same time
+        """
+        self.max_workers = max_workers
+        self.stats = FetchStats()
+
+    def fetch_all(self, fetch_function, tasks):
+        """Call `fetch_function(*task)` for every task, in parallel.
+
+        Args:
+            fetch_function (callable): Function that makes the request. Returns None when it fails.
+            tasks (list of tuple): Arguments of each call
+
+        Returns:
+            list: Results of each call, in the same order of `tasks`
+        """
+        return list(self.fetch_iter(fetch_function, tasks))
+
+    def fetch(self, fetch_function, task):
+        """Call `fetch_function(*task)` in the calling thread, recording it in the stats like the other requests.
+
+        Args:
+            fetch_function (callable): Function that makes the request. Returns None when it fails.
+            task (tuple): Arguments of the call
+
+        Returns:
+            Result of the call
+        """
+        start = time.monotonic()
+        result = fetch_function(*task)
+        self.stats.add(time.monotonic() - start, failed=result is None)
+        return result
+
+    def fetch_iter(self, fetch_function, tasks):
+        """Same as `fetch_all`, but yields each result as soon as it is ready (in the order of `tasks`),
+        so the results already consumed can be released.
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(lambda task: self.fetch(fetch_function, task), tasks)
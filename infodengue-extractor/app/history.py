@@ -0,0 +1,136 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class HistoryStore():
+
+    # Columns that identify a row: the disease is part of the file path
+    KEY_COLUMNS = ['city_ibge_code', 'SE']
+
+    # Values are kept as the text returned by the API, so the files reproduce it exactly.
+    # Files written with another version (e.g. the typed files of version 1) are rebuilt.
+    VERSION = "2"
+    COLUMNS = ['data_iniSE', 'SE', 'casos_est', 'casos_est_min', 'casos_est_max', 'casos', 'casprov', 'notif_accum_year', 'casconf', 'disease', 'city_ibge_code']
+    SCHEMA  = pa.schema([(column, pa.string()) for column in COLUMNS], metadata={"history_version": VERSION})
+
+    def __init__(self, base_dir: str) -> None:
+        """Local store with all the InfoDengue data already extracted.
+
+        Data is saved in Parquet files, one for each disease and UF, with one
+        row group for each city. Each row is identified by (geocode, disease, SE),
+        where SE is the epiweek in the YYYYWW format.
+
+        Args:
+            base_dir (str): Directory where the files are saved
+        """
+        self.base_dir = base_dir
+
+    def path(self, disease: str, uf: str):
+        return os.path.join(self.base_dir, disease, f"{uf}.parquet")
+
+    @staticmethod
+    def is_current(path: str):
+        """Check if a history file exists and was written with the current version."""
+        if not os.path.exists(path):
+            return False
+
+        metadata = pq.read_schema(path).metadata or dict()
+        return metadata.get(b"history_version") == HistoryStore.VERSION.encode()
+
+    def load(self, disease: str, uf: str):
+        """Load all the rows of a disease and UF.
+
+        Returns:
+            pd.DataFrame: Saved rows or None if nothing was saved yet.
+        """
+        path = self.path(disease, uf)
+        if not self.is_current(path):
+            return None
+
+        return pd.read_parquet(path)
+
+    def known_geocodes(self, disease: str, uf: str):
+        # Cities of an outdated file are requested again in full
+        path = self.path(disease, uf)
+        if not self.is_current(path):
+            return set()
+
+        return set(pq.read_table(path, columns=['city_ibge_code']).column('city_ibge_code').to_pylist())
+
+    def open_update(self, disease: str, uf: str):
+        """Start updating the rows of a disease and UF, one city at a time.
+
+        Returns:
+            HistoryUpdate: Update to be finished with `commit`
+        """
+        return HistoryUpdate(self.path(disease, uf))
+
+
+class HistoryUpdate():
+
+    def __init__(self, path: str) -> None:
+        """Merge new rows into a history file, city by city, without loading the whole file.
+
+        The merged cities are written to a temporary file, which replaces the
+        history file on `commit`. Only one city is kept in memory at a time.
+        A file of an outdated version is ignored, and replaced on `commit`.
+
+        Args:
+            path (str): Path to the history file
+        """
+        self.path = path
+        self.writer = None
+        self.history_file = None
+        self.row_groups_per_city = dict()
+
+        if HistoryStore.is_current(path):
+            self.history_file = pq.ParquetFile(path)
+            for row_group in range(self.history_file.num_row_groups):
+                geocodes = self.history_file.read_row_group(row_group, columns=['city_ibge_code']).column('city_ibge_code')
+                for geocode in set(geocodes.to_pylist()):
+                    self.row_groups_per_city.setdefault(geocode, []).append(row_group)
+
+    def load_city(self, geocode: str):
+        row_groups = self.row_groups_per_city.get(geocode)
+        if not row_groups:
+            return None
+
+        history_df = self.history_file.read_row_groups(row_groups).to_pandas()
+        return history_df[history_df['city_ibge_code'] == geocode]
+
+    def merge(self, geocode: str, new_df: pd.DataFrame = None):
+        """Merge the new rows of a city with its saved rows. The new rows replace the saved rows with the same key.
+
+        Must be called for every city that should be kept, in the order they must appear in the file.
+
+        Args:
+            geocode (str): City geocode
+            new_df (pd.DataFrame): Rows just extracted, or None if the request failed or returned no data
+
+        Returns:
+            pd.DataFrame: All the rows of the city, most recent epiweeks first. None if there are no rows.
+        """
+        city_dataframes = [df for df in (new_df, self.load_city(geocode)) if df is not None and len(df) > 0]
+        if not city_dataframes:
+            return None
+
+        city_df = pd.concat(city_dataframes)[HistoryStore.COLUMNS]
+        city_df = city_df.drop_duplicates(subset=HistoryStore.KEY_COLUMNS, keep='first')
+        city_df = city_df.sort_values('SE', ascending=False, kind='mergesort').reset_index(drop=True)
+
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = pq.ParquetWriter(f"{self.path}.tmp", HistoryStore.SCHEMA)
+        self.writer.write_table(pa.Table.from_pandas(city_df, schema=HistoryStore.SCHEMA, preserve_index=False))
+
+        return city_df
+
+    def commit(self):
+        # Replace the file only at the end, so a failure never corrupts the store
+        if self.writer is None:
+            return
+
+        self.writer.close()
+        os.replace(f"{self.path}.tmp", self.path)
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from epiweeks import Week
+
+
+class ResponseCache():
+
+    def __init__(
+            self,
+            cache_dir: str,
+            max_size: int = 512 * 1024 * 1024,
+            recent_ttl: float = 6 * 3600,
+            closed_ttl: float = 30 * 24 * 3600,
+            recent_epiweeks: int = 8
+        ) -> None:
+        """On-disk cache of the InfoDengue API responses, keyed by the normalized request URL.
+
+        Responses that include one of the last `recent_epiweeks` epiweeks can still
+        be revised, so they expire after `recent_ttl` seconds. Responses of closed
+        epiweeks only expire after `closed_ttl` seconds. When the cache is bigger
+        than `max_size` bytes, the least recently used responses are removed.
+
+        Args:
+            cache_dir (str): Directory where the responses are saved
+            max_size (int): Maximum size of the cache, in bytes
+            recent_ttl (float): Seconds a response with recent epiweeks is valid
+            closed_ttl (float): Seconds a response with only closed epiweeks is valid
+            recent_epiweeks (int): Number of epiweeks, up to the current one, that can be revised
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.recent_ttl = recent_ttl
+        self.closed_ttl = closed_ttl
+        self.first_recent_epiweek = Week.thisweek() - (recent_epiweeks - 1)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".body"))
+
+    @staticmethod
+    def normalize_url(url: str):
+        # The same request with the parameters in another order has the same key
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query)))
+        return f"{parts.scheme}://{parts.netloc.lower()}{parts.path}?{query}"
+
+    def key(self, url: str):
+        return hashlib.sha256(self.normalize_url(url).encode()).hexdigest()
+
+    def ttl(self, url: str):
+        """Validity of the response of a request, based on the last epiweek requested."""
+        query = dict(parse_qsl(urlsplit(url).query))
+        try:
+            last_epiweek = Week(int(query["ey_end"]), int(query["ew_end"]))
+        except (KeyError, ValueError):
+            return self.recent_ttl
+
+        return self.recent_ttl if last_epiweek >= self.first_recent_epiweek else self.closed_ttl
+
+    def load(self, key: str):
+        body_path = os.path.join(self.cache_dir, f"{key}.body")
+        try:
+            with open(os.path.join(self.cache_dir, f"{key}.meta"), 'r') as f:
+                meta = json.load(f)
+            if meta["expires_at"] < time.time():
+                return None
+
+            with open(body_path, 'rb') as f:
+                content = f.read()
+            os.utime(body_path) # Marks it as recently used
+            return content
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url: str):
+        """Return the saved response of a request, if it is still valid.
+
+        Returns:
+            bytes: Response content, or None
+        """
+        content = self.load(self.key(url))
+        with self.lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return content
+
+    def put(self, url: str, content: bytes):
+        key = self.key(url)
+        body_path = os.path.join(self.cache_dir, f"{key}.body")
+        meta_path = os.path.join(self.cache_dir, f"{key}.meta")
+        previous_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+
+        # Written to temporary files and renamed, so a response is never read half written
+        with open(f"{body_path}.tmp{threading.get_ident()}", 'wb') as f:
+            f.write(content)
+        os.replace(f"{body_path}.tmp{threading.get_ident()}", body_path)
+        with open(f"{meta_path}.tmp{threading.get_ident()}", 'w') as f:
+            json.dump({"url": self.normalize_url(url), "expires_at": time.time() + self.ttl(url)}, f)
+        os.replace(f"{meta_path}.tmp{threading.get_ident()}", meta_path)
+
+        with self.lock:
+            self.size += len(content) - previous_size
+            if self.size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        # Removes the least recently used responses until the cache is 10% below its maximum size
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".body")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self.size <= self.max_size * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                os.remove(f"{entry.path[:-len('.body')]}.meta")
+            except OSError:
+                continue
+            self.size -= size
+            self.evictions += 1
+
+    def summary(self):
+        requests = self.hits + self.misses
+        hit_rate = 100 * self.hits / requests if requests else 0
+        return (
+            f"Cache hits: {self.hits}, misses: {self.misses} ({hit_rate:.1f}% hit rate), "
+            f"evictions: {self.evictions}, size: {self.size / 1024 / 1024:.1f} MiB"
+        )
@@ -1,83 +1,35 @@
 
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from epiweeks import Week, Year
 
 import os
-import io
+import time
+import argparse
 
 from itertools import product
 
 # Save and handle logs
-from log import ManagerInterface
+from log import ManagerInterface, AsyncManagerInterface
+from fetch import FetchEngine
+from client import InfoDengueClient
+from history import HistoryStore
+from cities import load_cities
+from output import SpooledCSVWriter, ParquetPartitionWriter
+from enrich import enrich_in_batches
+from checkpoint import Checkpoint
+from city_stats import CityStats
+from backfill import Backfill, build_shards
+from http_cache import ResponseCache
+from worker import LeaseWorker
 
 # Prepare city and state information from ibge file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 file_path = os.path.join(BASE_DIR, "ibge_municipios_full.csv")
-ibge_df = pd.read_csv(file_path, dtype=str)
-
-cities_to_extract = dict()
-for index, row in ibge_df.iterrows():
-    city_data = dict({
-        "name": row['municipio_nome'],
-        "state_code": row['uf_sigla'],
-    })
-    city_key = row['municipio_codigo']
-    cities_to_extract[city_key] = city_data
-assert len(cities_to_extract) == ibge_df.shape[0], "Duplicate city codes found in ibge file"
-
-cities_to_extract_per_uf = dict()
-for city_key, city_data in cities_to_extract.items():
-    uf = city_data['state_code']
-    if uf not in cities_to_extract_per_uf:
-        cities_to_extract_per_uf[uf] = dict()
-    cities_to_extract_per_uf[uf][city_key] = city_data
-assert sum([len(cities) for uf, cities in cities_to_extract_per_uf.items()]) == len(cities_to_extract), "Mismatch in city counts"
-
-UF_TO_NAME = {
-    "AC": "Acre",              "AL": "Alagoas",              "AM": "Amazonas",
-    "AP": "Amapá",             "BA": "Bahia",                "CE": "Ceará",
-    "DF": "Distrito Federal",  "ES": "Espírito Santo",       "GO": "Goiás",
-    "MA": "Maranhão",          "MT": "Mato Grosso",          "MS": "Mato Grosso do Sul",   
-    "MG": "Minas Gerais",      "PA": "Pará",                 "PB": "Paraíba",
-    "PR": "Paraná",            "PE": "Pernambuco",           "PI": "Piauí",
-    "RJ": "Rio de Janeiro",    "RN": "Rio Grande do Norte",  "RS": "Rio Grande do Sul",
-    "RO": "Rondônia",          "RR": "Roraima",              "SC": "Santa Catarina",
-    "SP": "São Paulo",         "SE": "Sergipe",              "TO": "Tocantins"
-}
-
-UF_TO_REGION = {
-    "AC": "Norte", "AP": "Norte", "AM": "Norte", "PA": "Norte", "RO": "Norte", "RR": "Norte", "TO": "Norte",
-    "AL": "Nordeste", "BA": "Nordeste", "CE": "Nordeste", "MA": "Nordeste", "PB": "Nordeste",
-    "PE": "Nordeste", "PI": "Nordeste", "RN": "Nordeste", "SE": "Nordeste",
-    "DF": "Centro-Oeste", "GO": "Centro-Oeste", "MT": "Centro-Oeste", "MS": "Centro-Oeste",
-    "ES": "Sudeste", "MG": "Sudeste", "RJ": "Sudeste", "SP": "Sudeste",
-    "PR": "Sul", "RS": "Sul", "SC": "Sul"
-}
-
-BASE_URL = "https://info.dengue.mat.br/api/alertcity"
-
-def get_data_infodengue(geocode, disease, ew_start, ew_end, ey_start, ey_end):
-    
-    columns = ['data_iniSE', 'SE', 'casos_est', 'casos_est_min', 'casos_est_max', 'casos', 'casprov', 'notif_accum_year', 'casconf']
-    url = (
-        f"{BASE_URL}?geocode={geocode}&disease={disease}&format=csv"
-        f"&ew_start={ew_start}&ew_end={ew_end}&ey_start={ey_start}&ey_end={ey_end}"
-    )
-    
-    try:
-        infodengue_df = pd.read_csv(url)
-        infodengue_df = infodengue_df[columns]
-        return infodengue_df
-    except Exception as e:
-        # Em caso de erro, exibe uma mensagem de erro
-        print(f"Erro ao obter ou processar os dados: {e}")
-        return None
-
-def get_week_end_date(date_str):
-    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-    end_date_obj = date_obj + timedelta(days=6)
-    return end_date_obj.strftime('%Y-%m-%d')
+cache_dir = os.path.join(os.getenv("INFODENGUE_DATA_DIR", "/data"), "cache")
+cities_to_extract, cities_to_extract_per_uf = load_cities(file_path, cache_dir)
+
+BASE_URL = os.getenv("INFODENGUE_BASE_URL", "https://info.dengue.mat.br/api/alertcity")
+FIRST_YEAR_TO_COLLECT = 2023
 
 def get_current_epiweek():
     current_date = datetime.now().date()
@@ -92,6 +44,13 @@ def get_current_epiweek():
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Extract the InfoDengue data of all the cities")
+    parser.add_argument(
+        "--backfill", nargs=2, type=int, metavar=("FROM_YEAR", "TO_YEAR"),
+        help="Extract the data of past years in parallel, instead of the daily extraction"
+    )
+    args = parser.parse_args()
+
     API_ENPOINT = os.getenv("MANAGER_ENDPOINT")
     APP_NAME    = 'infodengue'
 
@@ -103,6 +62,12 @@ if __name__ == "__main__":
     current_epiweek = get_current_epiweek()
     diseases = ["dengue", "chikungunya", "zika"]
 
+    # The extraction can be restricted to some diseases and UFs (e.g. in benchmarks)
+    diseases = os.getenv("INFODENGUE_DISEASES", ",".join(diseases)).split(",")
+    if os.getenv("INFODENGUE_UFS"):
+        ufs = os.getenv("INFODENGUE_UFS").split(",")
+        cities_to_extract_per_uf = {uf: cities for uf, cities in cities_to_extract_per_uf.items() if uf in ufs}
+
     all_epiweeks = list(range(1, 53+1))
     all_years = list(range(2022, current_year+1))
     
@@ -112,65 +77,322 @@ if __name__ == "__main__":
     # ===================================
     manager_interface = ManagerInterface(APP_NAME, API_ENPOINT )
     logger = manager_interface.logger
+
+    # Files are uploaded in background while the extraction goes on
+    UPLOAD_CONCURRENCY = int(os.getenv("INFODENGUE_UPLOAD_CONCURRENCY", 4))
+    async_manager_interface = AsyncManagerInterface(manager_interface, max_concurrency=UPLOAD_CONCURRENCY)
     
 
+    # Requests to the API run in parallel, with an adaptive concurrency limit
+    FETCH_WORKERS = int(os.getenv("INFODENGUE_FETCH_WORKERS", 8))
+    MAX_REQUESTS_PER_SECOND = float(os.getenv("INFODENGUE_MAX_REQUESTS_PER_SECOND", 10))
+    LATENCY_THRESHOLD = float(os.getenv("INFODENGUE_LATENCY_THRESHOLD", 5))
+    # Responses are cached on disk, so a rerun does not request the same URLs again
+    DATA_DIR = os.getenv("INFODENGUE_DATA_DIR", "/data")
+    HTTP_CACHE = os.getenv("INFODENGUE_HTTP_CACHE", "true").lower() == "true"
+    cache_config = {
+        "cache_dir": os.path.join(DATA_DIR, "cache", "http"),
+        "max_size": int(os.getenv("INFODENGUE_HTTP_CACHE_MAX_SIZE", 512 * 1024 * 1024)),
+        "recent_ttl": float(os.getenv("INFODENGUE_HTTP_CACHE_RECENT_TTL", 6 * 3600)),
+        "closed_ttl": float(os.getenv("INFODENGUE_HTTP_CACHE_CLOSED_TTL", 30 * 24 * 3600))
+    } if HTTP_CACHE else None
+    response_cache = ResponseCache(**cache_config) if HTTP_CACHE else None
+
+    infodengue_client = InfoDengueClient(
+        BASE_URL,
+        max_concurrency=FETCH_WORKERS,
+        max_requests_per_second=MAX_REQUESTS_PER_SECOND,
+        latency_threshold=LATENCY_THRESHOLD,
+        cache=response_cache,
+        logger=logger
+    )
+    fetch_engine = FetchEngine(FETCH_WORKERS)
+
+    # In incremental mode, only the last epiweeks (the ones that can still be revised) are requested
+    # for cities already in the history store. The other cities are requested from FIRST_YEAR_TO_COLLECT.
+    EXTRACTION_MODE = os.getenv("INFODENGUE_MODE", "incremental")
+    history_store = HistoryStore(os.path.join(DATA_DIR, "history"))
+    logger.info(f"Extraction mode: {EXTRACTION_MODE}")
+
+    # Each UF file is written city by city into a spooled file, and uploaded from disk
+    SPOOL_MAX_SIZE = int(os.getenv("INFODENGUE_SPOOL_MAX_SIZE", 8 * 1024 * 1024))
+    GZIP_OUTPUT = os.getenv("INFODENGUE_GZIP_OUTPUT", "false").lower() == "true"
+    SPOOL_DIR = os.path.join(DATA_DIR, "tmp")
+
+    # With the 'parquet' format, each UF is uploaded as typed Parquet files, one for each epiweek year
+    OUTPUT_FORMAT = os.getenv("INFODENGUE_OUTPUT_FORMAT", "csv")
+    logger.info(f"Output format: {OUTPUT_FORMAT}")
+
+    # Backfill
+    # ==================================
+    if args.backfill:
+        from_year, to_year = args.backfill
+        BACKFILL_PROCESSES = int(os.getenv("INFODENGUE_BACKFILL_PROCESSES", 4))
+        BACKFILL_YEARS_PER_SHARD = int(os.getenv("INFODENGUE_BACKFILL_YEARS_PER_SHARD", 1))
+
+        backfill = Backfill(
+            os.path.join(DATA_DIR, "backfill"),
+            cities_to_extract_per_uf,
+            client_config={
+                "base_url": BASE_URL,
+                "max_concurrency": FETCH_WORKERS,
+                "max_requests_per_second": MAX_REQUESTS_PER_SECOND,
+                "latency_threshold": LATENCY_THRESHOLD
+            },
+            last_epiweek=(current_year, current_epiweek),
+            processes=BACKFILL_PROCESSES,
+            compress=GZIP_OUTPUT,
+            cache_config=cache_config,
+            logger=logger
+        )
+        shards = build_shards(from_year, to_year, diseases, list(cities_to_extract_per_uf.keys()), BACKFILL_YEARS_PER_SHARD)
+
+        def upload_shard(path, rows):
+            # Files are uploaded once: an '.uploaded' marker is saved after the upload
+            if rows == 0 or os.path.exists(f"{path}.uploaded"):
+                return
+
+            output_file = open(path, 'rb')
+            upload = async_manager_interface.upload_file_in_background(
+                organization="InfoDengue",
+                project="arbo",
+                file_content=output_file,
+                file_name=os.path.basename(path)
+            )
+            def on_upload_done(upload, path=path, output_file=output_file):
+                output_file.close()
+                if upload.result()['uploaded']:
+                    open(f"{path}.uploaded", 'w').close()
+            upload.add_done_callback(on_upload_done)
+
+        # Shards extracted by a previous backfill whose files were not uploaded
+        for shard in shards:
+            done_rows = backfill.done_rows(shard)
+            if done_rows is not None:
+                upload_shard(backfill.shard_path(shard), done_rows)
+
+        def on_shard_done(shard, result):
+            if result['failed_cities'] == 0:
+                upload_shard(result['path'], result['rows'])
+
+        logger.info(f"Starting backfill from {from_year} to {to_year}")
+        backfill.run(shards, on_shard_done=on_shard_done)
+
+        for upload_result in async_manager_interface.wait_background_uploads():
+            if not upload_result['uploaded']:
+                logger.error(f"Unable to upload file {upload_result['file_name']}")
+                continue
+            logger.info(f"Finished uploading file {upload_result['file_name']} ({upload_result['elapsed']:.1f}s)")
+
+        remaining_shards = len(backfill.pending_shards(shards))
+        if remaining_shards > 0:
+            logger.warning(f"Backfill incomplete: {remaining_shards} shards must run again")
+        manager_interface.close_session()
+        logger.info("Finished backfill.")
+        exit(0)
+
+    # Several replicas can split the (disease, UF) units of the same run, claiming them through the Manager.
+    # Units of a replica that stops sending heartbeats are claimed again by the others.
+    DISTRIBUTED = os.getenv("INFODENGUE_DISTRIBUTED", "false").lower() == "true"
+    all_units = list(product(diseases, cities_to_extract_per_uf.keys()))
+    if DISTRIBUTED:
+        lease_worker = LeaseWorker(
+            manager_interface,
+            run_id=os.getenv("INFODENGUE_RUN_ID") or f"{current_year}-SE{current_epiweek:02d}",
+            lease_seconds=int(os.getenv("INFODENGUE_LEASE_SECONDS", 300)),
+            logger=logger
+        )
+        lease_worker.register(all_units)
+        work_units = lease_worker.claim_units()
+    else:
+        work_units = all_units
+
+    # Progress is saved to disk, so a run restarted in the same epiweek resumes where the last one stopped
+    checkpoint = Checkpoint(os.path.join(DATA_DIR, "checkpoint"), current_year, current_epiweek, shared=DISTRIBUTED)
+    if checkpoint.resumed:
+        logger.info(f"Resuming the run of SE{current_epiweek:02d} - {current_year} from the last checkpoint")
+
+    # Cities that never have data are probed daily (only the recent epiweeks) and requested in full weekly
+    PRUNE_EMPTY_CITIES = os.getenv("INFODENGUE_PRUNE_EMPTY_CITIES", "true").lower() == "true"
+    city_stats = CityStats(
+        os.path.join(DATA_DIR, "stats", "city_stats.json"),
+        empty_runs_threshold=int(os.getenv("INFODENGUE_EMPTY_RUNS_THRESHOLD", 4)),
+        probe_interval=int(os.getenv("INFODENGUE_PROBE_INTERVAL_DAYS", 1)),
+        full_sweep_interval=int(os.getenv("INFODENGUE_FULL_SWEEP_INTERVAL_DAYS", 7))
+    )
+
     # Application
     # ==================================
     NUMBER_OF_PREVIOUS_EPIWEEKS_TO_COLLECT = 8
-    for disease in diseases:
-        logger.info(f"Running for {disease}")
-        for uf in cities_to_extract_per_uf.keys():
-            all_ufs_dataframes = []
-            counter = 0
-            for geocode, city_data in cities_to_extract_per_uf[uf].items():
-                logger.info(f"Requesting {disease} data for {uf} ({counter+1}/{len(cities_to_extract_per_uf[uf])})")
-                counter += 1
-                infodengue_df = get_data_infodengue(geocode, disease, 1, current_epiweek, 2023, current_year)
+    first_epiweek_to_collect = Week(current_year, current_epiweek) - (NUMBER_OF_PREVIOUS_EPIWEEKS_TO_COLLECT - 1)
+    running_disease = None
+    for disease, uf in work_units:
+        if disease != running_disease:
+            logger.info(f"Running for {disease}")
+            running_disease = disease
+
+        uf_status = checkpoint.uf_status(disease, uf)
+        if uf_status == Checkpoint.DONE:
+            logger.info(f"Skipping {disease} data for {uf}: already uploaded")
+            if DISTRIBUTED:
+                lease_worker.finish(disease, uf)
+            continue
+        uf_start = time.monotonic()
 
-                if infodengue_df is None:
-                    logger.warning(f"API returned 'None' {disease} SE{current_epiweek:02d} - {current_year} {uf} - {geocode} ({city_data['name']})")
-                    continue
+        if uf_status == Checkpoint.EXTRACTED:
+            # The history store is already updated, only the file must be generated again
+            logger.info(f"Generating {disease} file for {uf} from the history store")
+            checkpointed_cities = {geocode: None for geocode in cities_to_extract_per_uf[uf].keys()}
+        else:
+            uf_checkpoint = checkpoint.open_uf(disease, uf)
+            checkpointed_cities = uf_checkpoint.load()
 
-                if infodengue_df.shape[0] < 1:
-                    logger.warning(f"No data found for {disease} SE{current_epiweek:02d} - {current_year} {uf} - {geocode} ({city_data['name']})")
-                    continue
+        known_geocodes = set()
+        if EXTRACTION_MODE == "incremental":
+            known_geocodes = history_store.known_geocodes(disease, uf)
             
-                infodengue_df['disease'] = disease
-                infodengue_df['city_ibge_code'] = geocode
-                infodengue_df['city'] = city_data['name']
-                infodengue_df['state_code'] = uf
-                infodengue_df['state'] = infodengue_df['state_code'].map(UF_TO_NAME)
-                infodengue_df['region'] = infodengue_df['state_code'].map(UF_TO_REGION)
-                infodengue_df['data_fimSE'] = infodengue_df['data_iniSE'].apply(get_week_end_date)
-
-                all_ufs_dataframes.append(infodengue_df)
+        logger.info(
+            f"Requesting {disease} data for {uf} ({len(cities_to_extract_per_uf[uf])} cities, "
+            f"{len(known_geocodes)} incremental, {len(checkpointed_cities)} from checkpoint)"
+        )
+        def get_fetch_task(geocode, action=CityStats.FULL):
+            # Probes cover the epiweeks that can still be revised, so late reported cases are found
+            if action == CityStats.PROBE or geocode in known_geocodes:
+                return (geocode, disease, first_epiweek_to_collect.week, current_epiweek, first_epiweek_to_collect.year, current_year)
+            return (geocode, disease, 1, current_epiweek, FIRST_YEAR_TO_COLLECT, current_year)
+
+        city_actions = {
+            geocode: city_stats.schedule(disease, geocode) if PRUNE_EMPTY_CITIES else CityStats.FULL
+            for geocode in cities_to_extract_per_uf[uf].keys() if geocode not in checkpointed_cities
+        }
+        fetch_tasks = [
+            get_fetch_task(geocode, action)
+            for geocode, action in city_actions.items() if action != CityStats.SKIP
+        ]
+        fetch_results = fetch_engine.fetch_iter(infodengue_client.get_city_data, fetch_tasks)
+
+        # The file is always generated with all the data in the history store
+        history_update = history_store.open_update(disease, uf)
+        if OUTPUT_FORMAT == "parquet":
+            output_writer = ParquetPartitionWriter(SPOOL_DIR)
+        else:
+            output_writer = SpooledCSVWriter(SPOOL_MAX_SIZE, SPOOL_DIR, compress=GZIP_OUTPUT)
+
+        def merged_cities():
+            for geocode, city_data in cities_to_extract_per_uf[uf].items():
+
+                if geocode in checkpointed_cities:
+                    infodengue_df = checkpointed_cities[geocode]
+
+                elif city_actions[geocode] == CityStats.SKIP:
+                    infodengue_df = None
+
+                else:
+                    infodengue_df = next(fetch_results)
+                    city_stats.record(disease, geocode, city_actions[geocode], None if infodengue_df is None else len(infodengue_df))
+
+                    if infodengue_df is not None and len(infodengue_df) > 0 and city_actions[geocode] == CityStats.PROBE:
+                        # Cities in the history store are requested only for the same epiweeks of the probe
+                        if geocode not in known_geocodes:
+                            logger.info(f"Probe found {disease} data for {uf} - {geocode} ({city_data['name']}). Requesting all epiweeks.")
+                            infodengue_df = fetch_engine.fetch(infodengue_client.get_city_data, get_fetch_task(geocode))
+                        city_stats.record(disease, geocode, CityStats.FULL, None if infodengue_df is None else len(infodengue_df))
+
+                    if infodengue_df is None:
+                        logger.warning(f"API returned 'None' {disease} SE{current_epiweek:02d} - {current_year} {uf} - {geocode} ({city_data['name']})")
+
+                    elif infodengue_df.shape[0] < 1:
+                        logger.warning(f"No data found for {disease} SE{current_epiweek:02d} - {current_year} {uf} - {geocode} ({city_data['name']})")
+                        infodengue_df = None
+                        uf_checkpoint.add(geocode, None)
+
+                    else:
+                        infodengue_df = infodengue_df.assign(disease=disease, city_ibge_code=geocode)
+                        uf_checkpoint.add(geocode, infodengue_df)
+
+                city_infodengue_df = history_update.merge(geocode, infodengue_df)
+                if city_infodengue_df is not None:
+                    yield city_infodengue_df
+
+        for enriched_df in enrich_in_batches(merged_cities(), uf, cities_to_extract_per_uf[uf]):
+            output_writer.write(enriched_df)
                 
-            if len(all_ufs_dataframes) == 0:
-                logger.warning(f"No data found for {disease} SE{current_epiweek:02d} - {current_year} {uf}")
-                all_ufs_dataframes = []
-                continue
-            
-            all_ufs_infodengue_df = pd.concat(all_ufs_dataframes)
-            all_ufs_dataframes = []
+        if uf_status != Checkpoint.EXTRACTED:
+            uf_checkpoint.flush()
+        history_update.commit()
+        city_stats.save()
+        checkpoint.set_uf_status(disease, uf, Checkpoint.EXTRACTED)
+        checkpoint.clear_uf(disease, uf)
+        if OUTPUT_FORMAT == "parquet":
+            output_files = {
+                f"INFODENGUE_{uf}_{disease}_{year}_until_SE{current_epiweek:02d}_{current_year}.parquet": year_file
+                for year, year_file in output_writer.finish().items()
+            }
+        else:
             filename = f"INFODENGUE_{uf}_{disease}_until_SE{current_epiweek:02d}_{current_year}.csv"
-            
-            logger.info(f"Finished extracting data for {disease} UF {uf}. DataFrame shape: {all_ufs_infodengue_df.shape}")
-            logger.info(f"Saving file {filename}...")
+            if GZIP_OUTPUT:
+                filename = f"{filename}.gz"
+            output_files = {filename: output_writer.finish()}
+
+        if output_writer.rows == 0:
+            logger.warning(f"No data found for {disease} SE{current_epiweek:02d} - {current_year} {uf}")
+            for output_file in output_files.values():
+                output_file.close()
+            checkpoint.set_uf_status(disease, uf, Checkpoint.DONE)
+            if DISTRIBUTED:
+                lease_worker.finish(disease, uf)
+            continue
+
+        logger.info(f"Finished extracting data for {disease} UF {uf} in {time.monotonic() - uf_start:.1f}s. Rows: {output_writer.rows}")
 
-            buffer = io.BytesIO()
-            all_ufs_infodengue_df.to_csv(buffer, index=False)
-            buffer.seek(0)  # Move to the beginning of the buffer
+        # The UF is done when all its files are uploaded
+        uf_uploads = []
+        def on_upload_done(upload, disease=disease, uf=uf, uf_uploads=uf_uploads):
+            if not all(uf_upload.done() for uf_upload in uf_uploads):
+                return
+            uploaded = all(uf_upload.result()['uploaded'] for uf_upload in uf_uploads)
+            if uploaded:
+                checkpoint.set_uf_status(disease, uf, Checkpoint.DONE)
+            # A unit with a failed upload is claimed again
+            if DISTRIBUTED:
+                lease_worker.finish(disease, uf, done=uploaded)
 
-            manager_interface.upload_file(
+        for filename, output_file in output_files.items():
+            logger.info(f"Saving file {filename}...")
+            upload = async_manager_interface.upload_file_in_background(
                 organization="InfoDengue",
                 project="arbo",
-                file_content=buffer,
+                file_content=output_file,
                 file_name=filename
             )
+            uf_uploads.append(upload)
+            upload.add_done_callback(lambda _, output_file=output_file: output_file.close())
 
-            logger.info(f"Finished uploading file {filename}!")
+        for upload in uf_uploads:
+            upload.add_done_callback(on_upload_done)
 
     logger.info("Finished extracting all data")
+    logger.info(f"InfoDengue API {fetch_engine.stats.summary()}")
+    logger.info(f"InfoDengue API {infodengue_client.summary()}")
+    if response_cache is not None:
+        logger.info(f"InfoDengue API {response_cache.summary()}")
+    if PRUNE_EMPTY_CITIES:
+        logger.info(f"Empty-city pruning: {city_stats.summary()}")
+
+    logger.info("Waiting for the remaining uploads...")
+    all_uploaded = True
+    for upload_result in async_manager_interface.wait_background_uploads():
+        if not upload_result['uploaded']:
+            logger.error(f"Unable to upload file {upload_result['file_name']}")
+            all_uploaded = False
+            continue
+        logger.info(f"Finished uploading file {upload_result['file_name']} ({upload_result['elapsed']:.1f}s)")
+
+    # Keeps the checkpoint when an upload failed, so the next run only generates the missing files
+    if all_uploaded:
+        checkpoint.clear()
+    if DISTRIBUTED:
+        lease_worker.stop()
     manager_interface.close_session()
 
     logger.info("Finished pipeline.")
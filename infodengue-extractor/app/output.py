@@ -0,0 +1,148 @@
+import os
+import gzip
+import tempfile
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+class SpooledCSVWriter():
+
+    def __init__(self, spool_max_size: int, spool_dir: str = None, compress: bool = False) -> None:
+        """Write a CSV file in chunks, keeping at most `spool_max_size` bytes in memory.
+
+        The content is kept in memory while it is small and moved to a temporary
+        file in `spool_dir` when it gets bigger, so the memory used does not depend
+        on the size of the file.
+
+        Args:
+            spool_max_size (int): Maximum number of bytes kept in memory
+            spool_dir (str): Directory of the temporary file. Uses the system temp dir if None.
+            compress (bool): Compress the file with gzip
+        """
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_max_size, dir=spool_dir)
+        self.stream = gzip.GzipFile(fileobj=self.file, mode='wb') if compress else self.file
+        self.rows = 0
+
+    def write(self, dataframe):
+        # The header is written only with the first chunk
+        dataframe.to_csv(self.stream, header=(self.rows == 0), index=False, mode='wb')
+        self.rows += len(dataframe)
+
+    def finish(self):
+        """Finish writing and return the file, ready to be read from the beginning.
+
+        Returns:
+            SpooledTemporaryFile: File content. Must be closed after being uploaded.
+        """
+        if self.stream is not self.file:
+            self.stream.close() # Writes the gzip trailer, without closing self.file
+        self.file.flush()
+        self.file.seek(0)
+        return self.file
+
+
+class ParquetPartitionWriter():
+
+    # Typed columns: counts are float, as the API may return them with decimals or empty.
+    # The strings repeated in all the rows are dictionary encoded.
+    SCHEMA = pa.schema([
+        ('data_iniSE', pa.date32()),
+        ('SE', pa.int32()),
+        ('casos_est', pa.float64()),
+        ('casos_est_min', pa.float64()),
+        ('casos_est_max', pa.float64()),
+        ('casos', pa.float64()),
+        ('casprov', pa.float64()),
+        ('notif_accum_year', pa.float64()),
+        ('casconf', pa.float64()),
+        ('disease', pa.dictionary(pa.int32(), pa.string())),
+        ('city_ibge_code', pa.dictionary(pa.int32(), pa.string())),
+        ('city', pa.dictionary(pa.int32(), pa.string())),
+        ('state_code', pa.dictionary(pa.int32(), pa.string())),
+        ('state', pa.dictionary(pa.int32(), pa.string())),
+        ('region', pa.dictionary(pa.int32(), pa.string())),
+        ('data_fimSE', pa.date32()),
+    ])
+
+    def __init__(self, spool_dir: str = None, row_group_size: int = 64 * 1024) -> None:
+        """Write the rows of a disease and UF as Parquet, one file for each epiweek year.
+
+        Rows are buffered and written every `row_group_size` rows, split by year,
+        to temporary files in `spool_dir`.
+
+        Args:
+            spool_dir (str): Directory of the temporary files. Uses the system temp dir if None.
+            row_group_size (int): Number of rows buffered before being written
+        """
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+
+        self.spool_dir = spool_dir
+        self.row_group_size = row_group_size
+        self.buffer = []
+        self.buffered_rows = 0
+        self.files = dict()
+        self.writers = dict()
+        self.rows = 0
+
+    @classmethod
+    def to_table(cls, tables):
+        """Concatenate the tables of the cities and convert the text columns to their types."""
+        table = pa.concat_tables(tables, promote_options="permissive")
+
+        columns = []
+        for field in cls.SCHEMA:
+            column = table.column(field.name)
+            if pa.types.is_dictionary(field.type):
+                column = pc.dictionary_encode(column.cast(pa.string())).cast(field.type)
+            else:
+                # Empty values are null
+                column = column.cast(pa.string())
+                column = pc.if_else(pc.equal(column, ""), None, column)
+                if pa.types.is_date(field.type):
+                    column = pc.strptime(column, format='%Y-%m-%d', unit='s').cast(field.type)
+                else:
+                    column = column.cast(field.type)
+            columns.append(column)
+
+        return pa.Table.from_arrays(columns, schema=cls.SCHEMA)
+
+    def flush(self):
+        if not self.buffer:
+            return
+
+        table = self.to_table(self.buffer)
+        self.buffer, self.buffered_rows = [], 0
+
+        years = pc.divide(table.column('SE'), 100)
+        for year in pc.unique(years).to_pylist():
+            if year not in self.writers:
+                self.files[year] = tempfile.TemporaryFile(dir=self.spool_dir)
+                self.writers[year] = pq.ParquetWriter(self.files[year], self.SCHEMA)
+            self.writers[year].write_table(table.filter(pc.equal(years, year)))
+
+    def write(self, dataframe):
+        # Converted to Arrow right away: dataframes with different categories are slow to concatenate
+        self.buffer.append(pa.Table.from_pandas(dataframe[self.SCHEMA.names], preserve_index=False))
+        self.buffered_rows += len(dataframe)
+        self.rows += len(dataframe)
+        if self.buffered_rows >= self.row_group_size:
+            self.flush()
+
+    def finish(self):
+        """Finish writing and return the file of each year, ready to be read from the beginning.
+
+        Returns:
+            dict: File of each year. Must be closed after being uploaded.
+        """
+        self.flush()
+
+        for year, writer in self.writers.items():
+            writer.close()
+            self.files[year].seek(0)
+        return dict(sorted(self.files.items()))
@@ -0,0 +1,140 @@
+import time
+import logging
+import threading
+
+import requests
+
+from log import ManagerInterface
+
+
+class LeaseWorker():
+
+    def __init__(
+            self,
+            manager_interface: ManagerInterface,
+            run_id: str,
+            lease_seconds: int = 300,
+            heartbeat_interval: float = None,
+            poll_interval: float = 30,
+            max_attempts: int = 3,
+            logger: logging.Logger = None
+        ) -> None:
+        """Split the (disease, UF) units of a run between several workers, through leases in the Manager API.
+
+        Each unit is claimed for `lease_seconds` and the lease is renewed by a background
+        thread while the unit is extracted and uploaded. When a worker dies, its leases
+        expire and its units are claimed by the other workers of the same `run_id`.
+
+        Args:
+            manager_interface (ManagerInterface): Interface to the Manager API. Its session ID identifies the worker.
+            run_id (str): Run shared by all the workers
+            lease_seconds (int): Seconds a unit stays leased without a heartbeat
+            heartbeat_interval (float): Seconds between heartbeats. Defaults to a third of `lease_seconds`.
+            poll_interval (float): Seconds between claims while all the pending units are leased by other workers
+            max_attempts (int): Claims of a unit before it is given up
+            logger (logging.Logger): Logger
+        """
+        self.manager_interface = manager_interface
+        self.run_id = run_id
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval or lease_seconds / 3
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.logger = logger or logging.getLogger(__name__)
+
+        # Lease ID of each unit held by this worker
+        self.leases = dict()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.heartbeat_thread = threading.Thread(target=self.send_heartbeats, daemon=True)
+
+    @staticmethod
+    def unit_name(disease: str, uf: str):
+        return f"{disease}|{uf}"
+
+    def register(self, units: list):
+        """Register the (disease, UF) units of the run. All the workers register the same units."""
+        registered_count = self.manager_interface.register_work_units(
+            self.run_id, [self.unit_name(disease, uf) for disease, uf in units]
+        )
+        self.logger.info(f"Run '{self.run_id}': {registered_count} of {len(units)} units registered by this worker")
+
+    def claim_units(self):
+        """Claim the units of the run, one at a time, until all of them are done.
+
+        Yields:
+            tuple: (disease, uf) of the unit claimed. It must be released with `finish`.
+        """
+        if not self.heartbeat_thread.is_alive():
+            self.heartbeat_thread.start()
+
+        while True:
+            lease, pending = self.manager_interface.claim_work_unit(self.run_id, self.lease_seconds)
+
+            if lease is None:
+                with self.lock:
+                    held_units = len(self.leases)
+                # The units of this worker are only waiting for their uploads
+                if pending <= held_units:
+                    return
+                self.logger.info(f"Run '{self.run_id}': {pending - held_units} units leased by other workers. Waiting...")
+                time.sleep(self.poll_interval)
+                continue
+
+            disease, uf = lease['unit'].split("|")
+            if lease['attempts'] > self.max_attempts:
+                # Marked as done so the workers stop claiming it; the error is in the logs of each attempt
+                self.logger.error(f"Giving up {disease} data for {uf} after {lease['attempts'] - 1} attempts")
+                self.manager_interface.complete_work_unit(lease['id'], done=True)
+                continue
+
+            with self.lock:
+                self.leases[lease['unit']] = lease['id']
+            self.logger.info(f"Claimed {disease} data for {uf} (attempt {lease['attempts']})")
+            yield disease, uf
+
+    def finish(self, disease: str, uf: str, done: bool = True):
+        """Release a unit claimed by this worker.
+
+        Args:
+            disease (str): Disease of the unit
+            uf (str): UF of the unit
+            done (bool): False returns the unit to be claimed again (e.g. when an upload failed)
+        """
+        with self.lock:
+            lease_id = self.leases.pop(self.unit_name(disease, uf), None)
+        if lease_id is None:
+            return
+
+        try:
+            completed = self.manager_interface.complete_work_unit(lease_id, done=done)
+        except requests.exceptions.RequestException as e:
+            # The lease expires and the unit is claimed again
+            self.logger.error(f"Unable to release the lease of {disease} data for {uf}. {e}")
+            return
+
+        if not completed:
+            self.logger.warning(f"Lease of {disease} data for {uf} was lost before it finished. Another worker may repeat it.")
+
+    def send_heartbeats(self):
+        while not self.stopped.wait(self.heartbeat_interval):
+            with self.lock:
+                leases = list(self.leases.items())
+
+            for unit, lease_id in leases:
+                try:
+                    renewed = self.manager_interface.heartbeat_work_unit(lease_id, self.lease_seconds)
+                except requests.exceptions.RequestException as e:
+                    # Retried in the next interval, before the lease expires
+                    self.logger.warning(f"Unable to renew the lease of {unit}. {e}")
+                    continue
+
+                if not renewed:
+                    self.logger.warning(f"Lease of {unit} expired and was claimed by another worker")
+                    with self.lock:
+                        self.leases.pop(unit, None)
+
+    def stop(self):
+        self.stopped.set()
+        if self.heartbeat_thread.is_alive():
+            self.heartbeat_thread.join()
@@ -0,0 +1,54 @@
+"""Benchmark of the city lookup loaded when the InfoDengue extractor starts.
+
+Compares the previous approach (all the columns of the IBGE file parsed by 
+pandas, then `iterrows`) with the cached lookup, both cold (cache being 
+built) and warm (cache already saved). Each measure runs in a new 
+interpreter, as in a scheduled run.
+
+Usage:
+    python benchmark/bench_cities_import.py [REPETITIONS]
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+PANDAS_LOOKUP = """
+import pandas as pd
+ibge_df = pd.read_csv('ibge_municipios_full.csv', dtype=str)
+cities_to_extract = dict()
+for index, row in ibge_df.iterrows():
+    cities_to_extract[row['municipio_codigo']] = {"name": row['municipio_nome'], "state_code": row['uf_sigla']}
+"""
+
+CACHED_LOOKUP = """
+import sys
+from cities import load_cities
+cities_to_extract, cities_to_extract_per_uf = load_cities('ibge_municipios_full.csv', sys.argv[1])
+"""
+
+
+def measure(code, cache_dir):
+    # Time of the whole interpreter, including imports
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code, cache_dir], cwd=APP_DIR, check=True)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    baseline = measure("pass", "")
+
+    results = {"pandas + iterrows": [], "cached lookup (cold)": [], "cached lookup (warm)": []}
+    for _ in range(repetitions):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            results["pandas + iterrows"].append(measure(PANDAS_LOOKUP, cache_dir))
+            results["cached lookup (cold)"].append(measure(CACHED_LOOKUP, cache_dir))
+            results["cached lookup (warm)"].append(measure(CACHED_LOOKUP, cache_dir))
+
+    print(f"Empty interpreter: {baseline * 1000:.0f} ms (subtracted below)")
+    for name, times in results.items():
+        print(f"{name:<22} {(min(times) - baseline) * 1000:>8.1f} ms")
@@ -0,0 +1,74 @@
+"""Micro-benchmark of the per-UF enrichment of the InfoDengue extractor.
+
+Compares the enrichment of each city dataframe on its own with the enrichment
+made by the extractor (`enrich_in_batches`), which enriches the rows of several
+cities at once.
+
+Usage:
+    python benchmark/bench_enrichment.py [UF ...]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from main import cities_to_extract_per_uf
+from enrich import enrich_in_batches, enrich_infodengue_df, INFODENGUE_COLUMNS
+
+N_WEEKS = 150 # ~3 years of epiweeks
+
+
+def fake_city_dataframes(uf, disease):
+    # Values as text, as merged by the history store
+    week_starts = pd.date_range("2023-01-01", periods=N_WEEKS, freq="7D")
+    city_df = pd.DataFrame({
+        'data_iniSE': week_starts.strftime('%Y-%m-%d'),
+        'SE': [f"{date.year}{week % 52 + 1:02d}" for week, date in enumerate(week_starts)],
+        **{column: "1.0" for column in INFODENGUE_COLUMNS[2:]},
+        'disease': disease,
+    })
+    return [city_df.assign(city_ibge_code=geocode) for geocode in cities_to_extract_per_uf[uf]]
+
+
+def enrich_per_city(city_dataframes, uf):
+    cities = cities_to_extract_per_uf[uf]
+    return pd.concat([enrich_infodengue_df(city_df, uf, cities) for city_df in city_dataframes])
+
+
+def enrich_batched(city_dataframes, uf):
+    return pd.concat(enrich_in_batches(city_dataframes, uf, cities_to_extract_per_uf[uf]))
+
+
+def measure(function, uf):
+    city_dataframes = fake_city_dataframes(uf, "dengue")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(city_dataframes, uf)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak, result
+
+
+if __name__ == "__main__":
+    ufs = sys.argv[1:] or ["RR", "PE", "SP", "MG"]
+
+    print(f"{'UF':<4}{'cities':>8}{'rows':>10}  {'per city (s / MiB)':>20}  {'batched (s / MiB)':>20}  {'speedup':>8}")
+    for uf in ufs:
+        before_time, before_peak, before_df = measure(enrich_per_city, uf)
+        after_time, after_peak, after_df = measure(enrich_batched, uf)
+
+        # Both approaches must generate the same file
+        assert before_df.to_csv(index=False) == after_df.to_csv(index=False), f"Different output for {uf}"
+
+        print(
+            f"{uf:<4}{len(cities_to_extract_per_uf[uf]):>8}{len(after_df):>10}  "
+            f"{before_time:>10.3f} / {before_peak / 2**20:>7.1f}  "
+            f"{after_time:>10.3f} / {after_peak / 2**20:>7.1f}  "
+            f"{before_time / after_time:>7.1f}x"
+        )
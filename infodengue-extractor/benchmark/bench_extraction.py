@@ -0,0 +1,125 @@
+"""End-to-end throughput benchmark of the InfoDengue extractor.
+
+Runs `app/main.py` against the local stand-ins of the `alertcity` API and of
+the Manager API (see `benchmark/standin`), with a fresh data directory, and
+reports the requests per second, the wall time of each UF, the peak RSS of
+the extractor and the bytes uploaded.
+
+Usage:
+    python benchmark/bench_extraction.py --ufs AC,RR --diseases dengue --latency 0.1 --error-rate 0.01
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import resource
+import tempfile
+import subprocess
+import urllib.request
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARK_DIR, "..", "app")
+STANDIN_DIR = os.path.join(BENCHMARK_DIR, "standin")
+
+UF_FINISHED = re.compile(r"Finished extracting data for (\w+) UF (\w+) in ([\d.]+)s\. Rows: (\d+)")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.loads(response.read())
+
+
+def start_standin(script, port, *args):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(STANDIN_DIR, script), "--port", str(port), *args],
+        stdout=subprocess.DEVNULL
+    )
+    for _ in range(50):
+        try:
+            get_stats(port)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{script} did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ufs", default="AC,RR", help="UFs extracted, comma separated")
+    parser.add_argument("--diseases", default="dengue", help="Diseases extracted, comma separated")
+    parser.add_argument("--mode", default="full", choices=["full", "incremental"])
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--max-requests-per-second", type=float, default=0, help="Client rate limit (0: no limit)")
+    parser.add_argument("--gzip", action="store_true", help="Upload the files compressed")
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"], help="Output format")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--max-rps", type=float, default=0, help="Server rate limit (0: no limit)")
+    parser.add_argument("--empty-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    alertcity_port, manager_port = free_port(), free_port()
+    alertcity = start_standin(
+        "alertcity_server.py", alertcity_port,
+        "--latency", str(args.latency), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+        "--throttle-rate", str(args.throttle_rate), "--max-rps", str(args.max_rps), "--empty-rate", str(args.empty_rate)
+    )
+    manager = start_standin("manager_server.py", manager_port)
+
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            env = {
+                **os.environ,
+                "MANAGER_ENDPOINT": f"http://127.0.0.1:{manager_port}",
+                "INFODENGUE_BASE_URL": f"http://127.0.0.1:{alertcity_port}/api/alertcity",
+                "INFODENGUE_DATA_DIR": data_dir,
+                "INFODENGUE_UFS": args.ufs,
+                "INFODENGUE_DISEASES": args.diseases,
+                "INFODENGUE_MODE": args.mode,
+                "INFODENGUE_FETCH_WORKERS": str(args.fetch_workers),
+                "INFODENGUE_MAX_REQUESTS_PER_SECOND": str(args.max_requests_per_second),
+                "INFODENGUE_GZIP_OUTPUT": str(args.gzip).lower(),
+                "INFODENGUE_OUTPUT_FORMAT": args.format,
+            }
+
+            start = time.perf_counter()
+            extractor = subprocess.run([sys.executable, "main.py"], cwd=APP_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            wall_time = time.perf_counter() - start
+
+            # Only the extractor has finished among the children, so this is its peak RSS (KiB on Linux)
+            peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+        alertcity_stats, manager_stats = get_stats(alertcity_port), get_stats(manager_port)
+    finally:
+        alertcity.kill()
+        manager.kill()
+
+    if extractor.returncode != 0:
+        print(extractor.stdout[-5000:])
+        sys.exit(f"Extractor failed with exit code {extractor.returncode}")
+
+    print(f"UFs: {args.ufs} - diseases: {args.diseases} - mode: {args.mode} - format: {args.format}")
+    print(f"Wall time:       {wall_time:>10.1f} s")
+    print(f"Requests:        {alertcity_stats['requests']:>10} ({alertcity_stats['ok']} ok, {alertcity_stats['errors']} errors, {alertcity_stats['throttled']} throttled)")
+    request_time = (alertcity_stats['last_request'] or 0) - (alertcity_stats['first_request'] or 0)
+    print(f"Requests/s:      {alertcity_stats['requests'] / wall_time:>10.1f} ({alertcity_stats['requests'] / max(request_time, 1e-9):.1f} from the first to the last request)")
+    print(f"Peak RSS:        {peak_rss / 1024:>10.1f} MiB")
+    print(f"Bytes received:  {alertcity_stats['bytes_sent'] / 1024 / 1024:>10.2f} MiB")
+    print(f"Bytes uploaded:  {manager_stats['bytes_uploaded'] / 1024 / 1024:>10.2f} MiB ({manager_stats['files']} files)")
+    print(f"Logs sent:       {manager_stats['logs']:>10} ({manager_stats['log_requests']} requests)")
+
+    print(f"\n{'Disease':<12} {'UF':<4} {'Time (s)':>10} {'Rows':>10}")
+    for disease, uf, elapsed, rows in UF_FINISHED.findall(extractor.stdout):
+        print(f"{disease:<12} {uf:<4} {float(elapsed):>10.1f} {int(rows):>10}")
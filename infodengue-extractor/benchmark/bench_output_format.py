@@ -0,0 +1,74 @@
+"""Size and read speed of the InfoDengue output formats.
+
+Writes the same UF data as CSV, gzipped CSV and Parquet (one file for each
+epiweek year), then measures the total size and the time to read all the
+files back with pandas.
+
+Usage:
+    python benchmark/bench_output_format.py [UF ...]
+"""
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from main import cities_to_extract_per_uf
+from enrich import enrich_in_batches, INFODENGUE_COLUMNS
+from output import SpooledCSVWriter, ParquetPartitionWriter
+
+N_WEEKS = 150 # ~3 years of epiweeks
+
+
+def fake_city_df(geocode, disease):
+    # Values as text, as returned by the API
+    week_starts = pd.date_range("2023-01-01", periods=N_WEEKS, freq="7D")
+    return pd.DataFrame({
+        'data_iniSE': week_starts.strftime('%Y-%m-%d'),
+        'SE': [f"{date.year}{week % 52 + 1:02d}" for week, date in enumerate(week_starts)],
+        **{column: [f"{(week * 7 + int(geocode)) % 97 * 1.5:.1f}" for week in range(N_WEEKS)] for column in INFODENGUE_COLUMNS[2:]},
+        'disease': disease,
+        'city_ibge_code': geocode,
+    })
+
+
+def write(output_writer, uf):
+    start = time.perf_counter()
+    city_dataframes = (fake_city_df(geocode, "dengue") for geocode in cities_to_extract_per_uf[uf])
+    for enriched_df in enrich_in_batches(city_dataframes, uf, cities_to_extract_per_uf[uf]):
+        output_writer.write(enriched_df)
+    files = output_writer.finish()
+    elapsed = time.perf_counter() - start
+    return elapsed, files if isinstance(files, dict) else {"csv": files}
+
+
+def measure(uf, name, output_writer, read_function):
+    write_time, files = write(output_writer, uf)
+    contents = {key: output_file.read() for key, output_file in files.items()}
+    for output_file in files.values():
+        output_file.close()
+
+    start = time.perf_counter()
+    rows = sum(len(read_function(content)) for content in contents.values())
+    read_time = time.perf_counter() - start
+
+    size = sum(len(content) for content in contents.values())
+    return name, len(contents), size, write_time, read_time, rows
+
+
+if __name__ == "__main__":
+    ufs = sys.argv[1:] or ["RR", "PE", "SP"]
+
+    formats = [
+        ("csv", lambda: SpooledCSVWriter(8 * 1024 * 1024), lambda content: pd.read_csv(io.BytesIO(content))),
+        ("csv.gz", lambda: SpooledCSVWriter(8 * 1024 * 1024, compress=True), lambda content: pd.read_csv(io.BytesIO(content), compression='gzip')),
+        ("parquet", lambda: ParquetPartitionWriter(), lambda content: pd.read_parquet(io.BytesIO(content))),
+    ]
+
+    print(f"{'UF':<4}{'format':<9}{'files':>6}{'size (MiB)':>12}{'write (s)':>11}{'read (s)':>10}{'rows':>10}")
+    for uf in ufs:
+        for name, create_writer, read_function in formats:
+            name, n_files, size, write_time, read_time, rows = measure(uf, name, create_writer(), read_function)
+            print(f"{uf:<4}{name:<9}{n_files:>6}{size / 2**20:>12.2f}{write_time:>11.2f}{read_time:>10.3f}{rows:>10}")
@@ -0,0 +1,182 @@
+"""Local stand-in of the InfoDengue `alertcity` API.
+
+Serves the responses recorded by `record_fixtures.py` (`fixtures/<disease>/<geocode>.csv`),
+keeping only the epiweeks requested. A disease recorded for a single city
+(`fixtures/<disease>.csv`) is used as template for all the cities. When nothing
+was recorded, the rows are generated with the same columns of the real API.
+
+Latency, errors (HTTP 500) and throttling (HTTP 429 with Retry-After) are
+configurable. `GET /stats` returns the counters of the requests served.
+
+Usage:
+    python benchmark/standin/alertcity_server.py --port 8765 --latency 0.2 --error-rate 0.01
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from http import HTTPStatus
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from epiweeks import Week
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+ALERTCITY_COLUMNS = [
+    'data_iniSE', 'SE', 'casos_est', 'casos_est_min', 'casos_est_max', 'casos', 'municipio_geocodigo',
+    'p_rt1', 'p_inc100k', 'Localidade_id', 'nivel', 'id', 'versao_modelo', 'tweet', 'Rt', 'pop',
+    'tempmin', 'umidmax', 'receptivo', 'transmissao', 'nivel_inc', 'umidmed', 'umidmin', 'tempmed',
+    'tempmax', 'casprov', 'casprov_est', 'casprov_est_min', 'casprov_est_max', 'casconf', 'notif_accum_year'
+]
+
+
+class AlertCityStandIn():
+
+    def __init__(self, fixtures_dir: str, latency: float, jitter: float, error_rate: float, throttle_rate: float, max_rps: float, empty_rate: float, seed: int) -> None:
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+        self.empty_rate = empty_rate
+        self.random = random.Random(seed)
+        self.fixtures = dict()
+
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "bytes_sent": 0, "first_request": None, "last_request": None}
+
+    def load_fixture(self, disease: str, geocode: str):
+        for path in (os.path.join(self.fixtures_dir, disease, f"{geocode}.csv"), os.path.join(self.fixtures_dir, f"{disease}.csv")):
+            if path not in self.fixtures and os.path.exists(path):
+                with open(path, 'r') as f:
+                    lines = f.read().splitlines()
+                self.fixtures[path] = (lines[0], lines[1:])
+            if path in self.fixtures:
+                return self.fixtures[path]
+        return None
+
+    def generate_rows(self, geocode: str, first: Week, last: Week):
+        # Same columns of the real API, values only plausible
+        rows = []
+        week, row_id = last, int(geocode) * 1000
+        while week >= first:
+            cases = self.random.randint(0, 50)
+            values = [
+                week.startdate().isoformat(), f"{week.year}{week.week:02d}", f"{cases * 1.1:.1f}", str(cases), f"{cases * 1.5:.1f}",
+                str(cases), geocode, "0.5", f"{cases / 10:.3f}", "0", "1", str(row_id), "2024-01-01", "", "0.9", "100000",
+                "20.1", "90.2", "1", "0", "1", "70.5", "50.3", "25.4", "30.2", str(cases // 2), "", "", "", "", str(cases * 10)
+            ]
+            rows.append(",".join(values))
+            week, row_id = week - 1, row_id + 1
+        return ",".join(ALERTCITY_COLUMNS), rows
+
+    def response(self, query: dict):
+        geocode, disease = query['geocode'][0], query['disease'][0]
+        first = Week(int(query['ey_start'][0]), int(query['ew_start'][0]))
+        last  = Week(int(query['ey_end'][0]), int(query['ew_end'][0]))
+
+        if self.random.random() < self.empty_rate:
+            return ",".join(ALERTCITY_COLUMNS) + "\n"
+
+        fixture = self.load_fixture(disease, geocode)
+        if fixture is None:
+            header, rows = self.generate_rows(geocode, first, last)
+        else:
+            header, rows = fixture
+            se_index = header.split(",").index("SE")
+            rows = [row for row in rows if first.cdcformat() <= row.split(",")[se_index] <= last.cdcformat()]
+
+        return "\n".join([header] + rows) + "\n"
+
+    def admit(self):
+        """Decide the status of a request: throttled, failed or ok."""
+        with self.lock:
+            now = time.monotonic()
+            self.stats["requests"] += 1
+            self.stats["first_request"] = self.stats["first_request"] or time.time()
+            self.stats["last_request"] = time.time()
+
+            if now - self.window_start >= 1:
+                self.window_start, self.window_requests = now, 0
+            self.window_requests += 1
+
+            if (self.max_rps > 0 and self.window_requests > self.max_rps) or self.random.random() < self.throttle_rate:
+                self.stats["throttled"] += 1
+                return HTTPStatus.TOO_MANY_REQUESTS
+            if self.random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return HTTPStatus.INTERNAL_SERVER_ERROR
+
+            self.stats["ok"] += 1
+            return HTTPStatus.OK
+
+
+def make_handler(standin: AlertCityStandIn):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def send(self, status, body: bytes, content_type="text/csv", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or dict()).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/stats":
+                with standin.lock:
+                    return self.send(HTTPStatus.OK, json.dumps(standin.stats).encode(), "application/json")
+
+            time.sleep(max(0, standin.latency + standin.random.uniform(-standin.jitter, standin.jitter)))
+
+            status = standin.admit()
+            if status == HTTPStatus.TOO_MANY_REQUESTS:
+                return self.send(status, b"Too many requests", headers={"Retry-After": "1"})
+            if status == HTTPStatus.INTERNAL_SERVER_ERROR:
+                return self.send(status, b"Internal server error")
+
+            try:
+                body = standin.response(parse_qs(url.query)).encode()
+            except (KeyError, ValueError) as e:
+                return self.send(HTTPStatus.BAD_REQUEST, f"Invalid request: {e}".encode())
+
+            with standin.lock:
+                standin.stats["bytes_sent"] += len(body)
+            self.send(HTTPStatus.OK, body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--latency", type=float, default=0.1, help="Mean latency of the responses, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Maximum variation of the latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of the requests answered with HTTP 500")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="Fraction of the requests answered with HTTP 429")
+    parser.add_argument("--max-rps", type=float, default=0, help="Requests per second above which HTTP 429 is returned (0: no limit)")
+    parser.add_argument("--empty-rate", type=float, default=0, help="Fraction of the requests answered without rows")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    standin = AlertCityStandIn(
+        args.fixtures_dir, args.latency, args.jitter, args.error_rate,
+        args.throttle_rate, args.max_rps, args.empty_rate, args.seed
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(standin))
+    server.daemon_threads = True
+    print(f"alertcity stand-in listening on http://127.0.0.1:{args.port}/api/alertcity", flush=True)
+    server.serve_forever()
@@ -0,0 +1,134 @@
+"""Local stand-in of the Manager API, used by the extraction benchmark.
+
+Implements the endpoints used by `ManagerInterface` (sessions, logs and file
+uploads). Uploaded files are read and discarded: only their size is kept.
+`GET /stats` returns the counters of the requests served.
+
+Usage:
+    python benchmark/standin/manager_server.py --port 8766
+"""
+import json
+import time
+import argparse
+import threading
+from http import HTTPStatus
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class ManagerStandIn():
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.stats = {"logs": 0, "log_requests": 0, "files": 0, "bytes_uploaded": 0, "upload_seconds": 0.0, "statuses": []}
+
+    def add(self, **counters):
+        with self.lock:
+            for name, value in counters.items():
+                self.stats[name] += value
+
+
+def make_handler(standin: ManagerStandIn):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1" # Keeps the connections alive, as the real API
+
+        def send_json(self, status, content):
+            body = json.dumps(content).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_body(self, chunk_size=1024 * 1024):
+            """Read the request body in chunks, without keeping it in memory.
+
+            Returns:
+                tuple: Number of bytes read and the first chunk (enough for the JSON requests)
+            """
+            first_chunk, size = b"", 0
+
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                while True:
+                    length = int(self.rfile.readline().strip().split(b";")[0], 16)
+                    chunk = self.rfile.read(length + 2)[:length] if length else b""
+                    if length == 0:
+                        self.rfile.readline()
+                        break
+                    first_chunk = first_chunk or chunk
+                    size += length
+                return size, first_chunk
+
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                chunk = self.rfile.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                first_chunk = first_chunk or chunk
+                size += len(chunk)
+                remaining -= len(chunk)
+            return size, first_chunk
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/log":
+                with standin.lock:
+                    standin.sessions += 1
+                    session_id = f"benchmark-{standin.sessions}"
+                return self.send_json(HTTPStatus.CREATED, {"session_id": session_id})
+
+            if url.path == "/stats":
+                with standin.lock:
+                    return self.send_json(HTTPStatus.OK, standin.stats)
+
+            self.send_json(HTTPStatus.NOT_FOUND, {"detail": "Not Found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+
+            if url.path == "/file":
+                start = time.monotonic()
+                size, _ = self.read_body()
+                standin.add(files=1, bytes_uploaded=size, upload_seconds=time.monotonic() - start)
+                return self.send_json(HTTPStatus.OK, {"filename": "uploaded"})
+
+            _, body = self.read_body()
+            if url.path == "/log/batch":
+                received_count = len(json.loads(body or b"[]"))
+                standin.add(logs=received_count, log_requests=1)
+                return self.send_json(HTTPStatus.OK, {"received_count": received_count})
+
+            if url.path == "/log":
+                standin.add(logs=1, log_requests=1)
+                return self.send_json(HTTPStatus.OK, json.loads(body or b"{}"))
+
+            self.send_json(HTTPStatus.NOT_FOUND, {"detail": "Not Found"})
+
+        def do_PUT(self):
+            _, body = self.read_body()
+            if urlparse(self.path).path == "/status":
+                status = json.loads(body or b"{}")
+                with standin.lock:
+                    standin.stats["statuses"].append(status.get("status"))
+                return self.send_json(HTTPStatus.OK, status)
+
+            self.send_json(HTTPStatus.NOT_FOUND, {"detail": "Not Found"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(ManagerStandIn()))
+    server.daemon_threads = True
+    print(f"Manager stand-in listening on http://127.0.0.1:{args.port}", flush=True)
+    server.serve_forever()
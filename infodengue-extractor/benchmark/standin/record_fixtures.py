@@ -0,0 +1,43 @@
+"""Record responses of the real InfoDengue `alertcity` API, to be served by `alertcity_server.py`.
+
+Each response is saved in `fixtures/<disease>/<geocode>.csv`. The first city
+of each disease is also saved as `fixtures/<disease>.csv`, the template used
+for the cities not recorded.
+
+Usage:
+    python benchmark/standin/record_fixtures.py FROM_YEAR TO_YEAR GEOCODE [GEOCODE ...]
+"""
+import os
+import sys
+import time
+
+import requests
+from epiweeks import Year
+
+from alertcity_server import FIXTURES_DIR
+
+BASE_URL = os.getenv("INFODENGUE_BASE_URL", "https://info.dengue.mat.br/api/alertcity")
+DISEASES = ["dengue", "chikungunya", "zika"]
+
+
+if __name__ == "__main__":
+    from_year, to_year, geocodes = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3:]
+
+    for disease in DISEASES:
+        os.makedirs(os.path.join(FIXTURES_DIR, disease), exist_ok=True)
+        for index, geocode in enumerate(geocodes):
+            response = requests.get(BASE_URL, params={
+                "geocode": geocode, "disease": disease, "format": "csv",
+                "ew_start": 1, "ew_end": Year(to_year).totalweeks(), "ey_start": from_year, "ey_end": to_year
+            }, timeout=60)
+            response.raise_for_status()
+
+            paths = [os.path.join(FIXTURES_DIR, disease, f"{geocode}.csv")]
+            if index == 0:
+                paths.append(os.path.join(FIXTURES_DIR, f"{disease}.csv"))
+            for path in paths:
+                with open(path, 'wb') as f:
+                    f.write(response.content)
+
+            print(f"Recorded {disease} {geocode}: {len(response.content)} bytes")
+            time.sleep(1) # Be gentle with the real API
@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from checkpoint import Checkpoint
+from history import HistoryStore
+
+
+def city_df(geocode, weeks=3):
+    return pd.DataFrame({
+        'data_iniSE': [f"2024-01-{week * 7 + 7:02d}" for week in range(weeks)],
+        'SE': [f"2024{week + 2:02d}" for week in range(weeks)],
+        **{column: "1.0" for column in HistoryStore.COLUMNS[2:-2]},
+        'disease': "dengue",
+        'city_ibge_code': geocode,
+    })
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.base_dir = os.path.join(self.work_dir.name, "checkpoint")
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_status_is_resumed_in_the_same_epiweek(self):
+        checkpoint = Checkpoint(self.base_dir, 2024, 10)
+        self.assertFalse(checkpoint.resumed)
+        checkpoint.set_uf_status("dengue", "AC", Checkpoint.DONE)
+        checkpoint.set_uf_status("dengue", "RR", Checkpoint.EXTRACTED)
+
+        checkpoint = Checkpoint(self.base_dir, 2024, 10)
+        self.assertTrue(checkpoint.resumed)
+        self.assertEqual(checkpoint.uf_status("dengue", "AC"), Checkpoint.DONE)
+        self.assertEqual(checkpoint.uf_status("dengue", "RR"), Checkpoint.EXTRACTED)
+        self.assertIsNone(checkpoint.uf_status("zika", "AC"))
+
+    def test_checkpoint_of_another_epiweek_is_discarded(self):
+        checkpoint = Checkpoint(self.base_dir, 2024, 10)
+        checkpoint.set_uf_status("dengue", "AC", Checkpoint.DONE)
+        uf_checkpoint = checkpoint.open_uf("dengue", "RR", flush_every=1)
+        uf_checkpoint.add("1400100", city_df("1400100"))
+
+        checkpoint = Checkpoint(self.base_dir, 2024, 11)
+        self.assertFalse(checkpoint.resumed)
+        self.assertIsNone(checkpoint.uf_status("dengue", "AC"))
+        self.assertEqual(checkpoint.open_uf("dengue", "RR").load(), {})
+
+    def test_clear(self):
+        checkpoint = Checkpoint(self.base_dir, 2024, 10)
+        checkpoint.set_uf_status("dengue", "AC", Checkpoint.DONE)
+        checkpoint.clear()
+
+        self.assertFalse(os.path.exists(self.base_dir))
+        self.assertFalse(Checkpoint(self.base_dir, 2024, 10).resumed)
+
+    def test_shared_checkpoint_keeps_only_the_cities(self):
+        checkpoint = Checkpoint(self.base_dir, 2024, 10, shared=True)
+        checkpoint.set_uf_status("dengue", "AC", Checkpoint.DONE)
+        self.assertIsNone(checkpoint.uf_status("dengue", "AC"))
+
+        uf_checkpoint = checkpoint.open_uf("dengue", "AC", flush_every=1)
+        uf_checkpoint.add("1200013", None)
+        checkpoint.clear()
+
+        # Another worker resumes the cities of the UF
+        checkpoint = Checkpoint(self.base_dir, 2024, 10, shared=True)
+        self.assertEqual(checkpoint.open_uf("dengue", "AC").load(), {"1200013": None})
+
+
+class TestUFCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.checkpoint = Checkpoint(os.path.join(self.work_dir.name, "checkpoint"), 2024, 10)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_completed_cities_are_resumed(self):
+        uf_checkpoint = self.checkpoint.open_uf("dengue", "RR", flush_every=2)
+        uf_checkpoint.add("1400050", city_df("1400050"))
+        uf_checkpoint.add("1400027", None)
+        uf_checkpoint.add("1400100", city_df("1400100", weeks=5))
+        uf_checkpoint.flush()
+
+        cities = self.checkpoint.open_uf("dengue", "RR").load()
+        self.assertEqual(set(cities), {"1400050", "1400027", "1400100"})
+        self.assertIsNone(cities["1400027"])
+        self.assertEqual(cities["1400100"]["SE"].tolist(), city_df("1400100", weeks=5)["SE"].tolist())
+        self.assertEqual(len(cities["1400050"]), 3)
+
+    def test_cities_not_flushed_are_fetched_again(self):
+        uf_checkpoint = self.checkpoint.open_uf("dengue", "RR", flush_every=2)
+        uf_checkpoint.add("1400050", city_df("1400050"))
+        uf_checkpoint.add("1400027", city_df("1400027"))
+        # Saved only with the next batch, which is never completed
+        uf_checkpoint.add("1400100", city_df("1400100"))
+
+        self.assertEqual(set(self.checkpoint.open_uf("dengue", "RR").load()), {"1400050", "1400027"})
+
+    def test_new_parts_do_not_overwrite_the_previous_ones(self):
+        uf_checkpoint = self.checkpoint.open_uf("dengue", "RR", flush_every=1)
+        uf_checkpoint.add("1400050", city_df("1400050"))
+
+        uf_checkpoint = self.checkpoint.open_uf("dengue", "RR", flush_every=1)
+        uf_checkpoint.add("1400100", city_df("1400100"))
+
+        self.assertEqual(set(self.checkpoint.open_uf("dengue", "RR").load()), {"1400050", "1400100"})
+
+    def test_clear_uf(self):
+        uf_checkpoint = self.checkpoint.open_uf("dengue", "RR", flush_every=1)
+        uf_checkpoint.add("1400050", city_df("1400050"))
+        self.checkpoint.clear_uf("dengue", "RR")
+
+        self.assertEqual(self.checkpoint.open_uf("dengue", "RR").load(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from city_stats import CityStats
+
+FIRST_DAY = date(2024, 3, 4)
+
+
+class TestCityStats(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.work_dir.name, "stats", "city_stats.json")
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def run_day(self, day, rows=0, geocode="1100015"):
+        """Schedule and record a city in the run of a day, like the extractor. Returns the action."""
+        city_stats = CityStats(self.path, empty_runs_threshold=2, probe_interval=1, full_sweep_interval=7, today=FIRST_DAY + timedelta(days=day))
+        action = city_stats.schedule("dengue", geocode)
+        if action != CityStats.SKIP:
+            city_stats.record("dengue", geocode, action, rows)
+        city_stats.save()
+        return action
+
+    def test_empty_city_is_probed_then_requested_weekly(self):
+        actions = [self.run_day(day) for day in range(10)]
+
+        # Empty after 2 full requests, then requested in full a week after the last full request
+        self.assertEqual(actions, [CityStats.FULL] * 2 + [CityStats.PROBE] * 6 + [CityStats.FULL, CityStats.PROBE])
+
+    def test_skipped_between_probes(self):
+        city_stats = CityStats(self.path, empty_runs_threshold=1, probe_interval=3, full_sweep_interval=7, today=FIRST_DAY)
+        city_stats.record("dengue", "1100015", CityStats.FULL, 0)
+        city_stats.record("dengue", "1100015", CityStats.PROBE, 0)
+
+        city_stats.today = FIRST_DAY + timedelta(days=1)
+        self.assertEqual(city_stats.schedule("dengue", "1100015"), CityStats.SKIP)
+        city_stats.today = FIRST_DAY + timedelta(days=3)
+        self.assertEqual(city_stats.schedule("dengue", "1100015"), CityStats.PROBE)
+
+    def test_probe_with_data_makes_the_city_active_again(self):
+        for day in range(3):
+            self.run_day(day)
+        self.assertEqual(self.run_day(3, rows=1), CityStats.PROBE)
+
+        self.assertEqual(self.run_day(4), CityStats.FULL)
+
+    def test_failed_requests_are_not_recorded(self):
+        for day in range(5):
+            city_stats = CityStats(self.path, empty_runs_threshold=2, today=FIRST_DAY + timedelta(days=day))
+            self.assertEqual(city_stats.schedule("dengue", "1100015"), CityStats.FULL)
+            city_stats.record("dengue", "1100015", CityStats.FULL, None)
+            city_stats.save()
+
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {})
+
+    def test_save_keeps_the_cities_of_other_workers(self):
+        worker_a = CityStats(self.path, today=FIRST_DAY)
+        worker_b = CityStats(self.path, today=FIRST_DAY)
+        worker_a.record("dengue", "1100015", CityStats.FULL, 0)
+        worker_b.record("zika", "1200013", CityStats.FULL, 10)
+        worker_a.save()
+        worker_b.save()
+
+        saved_stats = CityStats(self.path).stats
+        self.assertEqual(saved_stats["dengue"]["1100015"]["empty_runs"], 1)
+        self.assertEqual(saved_stats["zika"]["1200013"]["empty_runs"], 0)
+
+    def test_summary(self):
+        city_stats = CityStats(self.path, empty_runs_threshold=1, today=FIRST_DAY)
+        self.assertEqual(city_stats.summary(), "No cities scheduled.")
+
+        city_stats.record("dengue", "1100015", CityStats.FULL, 0)
+        city_stats.today = FIRST_DAY + timedelta(days=1)
+        for geocode in ("1100015", "1200013", "1300029", "1400027"):
+            city_stats.schedule("dengue", geocode)
+
+        self.assertIn("Full requests avoided: 1 of 4 (25.0%)", city_stats.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+import os
+import sys
+import time
+import threading
+import unittest
+from unittest import mock
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from client import TokenBucket, AdaptiveConcurrencyLimiter, CircuitBreaker, InfoDengueClient, INFODENGUE_COLUMNS
+
+CSV_CONTENT = (
+    ",".join(INFODENGUE_COLUMNS) + "\n"
+    + "2024-01-07,202402,10.0,8,12,10,0,15,\n"
+).encode()
+
+
+def make_alertcity_server(responses):
+    """`alertcity` API stand-in answering each request with the next (status, headers) of `responses`, then with a CSV."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            requests.append(self.path)
+            status, headers = responses.pop(0) if responses else (HTTPStatus.OK, {})
+            content = CSV_CONTENT if status == HTTPStatus.OK else b""
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/alertcity", requests
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        token_bucket = TokenBucket(rate=20, capacity=5)
+
+        start = time.monotonic()
+        for _ in range(5):
+            token_bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+
+        # The next tokens are added at 20 per second
+        for _ in range(4):
+            token_bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_no_limit(self):
+        token_bucket = TokenBucket(rate=0)
+
+        start = time.monotonic()
+        for _ in range(1000):
+            token_bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+
+    def test_additive_increase(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=2, minimum=1, maximum=4, latency_threshold=1)
+
+        # The limit grows by one after a full window of healthy responses
+        for _ in range(2):
+            limiter.acquire()
+            limiter.release(latency=0.1, throttled=False)
+        self.assertEqual(int(limiter.limit), 2)
+        for _ in range(3):
+            limiter.acquire()
+            limiter.release(latency=0.1, throttled=False)
+        self.assertEqual(int(limiter.limit), 3)
+
+        for _ in range(100):
+            limiter.acquire()
+            limiter.release(latency=0.1, throttled=False)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_multiplicative_decrease(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=1, maximum=8, latency_threshold=1)
+
+        limiter.acquire()
+        limiter.release(latency=0.1, throttled=True)
+        self.assertEqual(limiter.limit, 4)
+
+        # Slow responses also decrease the limit
+        limiter.acquire()
+        limiter.release(latency=2, throttled=False)
+        self.assertEqual(limiter.limit, 2)
+
+        for _ in range(5):
+            limiter.acquire()
+            limiter.release(latency=2, throttled=False)
+        self.assertEqual(limiter.limit, 1)
+
+    def test_acquire_waits_for_a_release(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=1, latency_threshold=1)
+        limiter.acquire()
+
+        acquired = threading.Event()
+        def acquire():
+            limiter.acquire()
+            acquired.set()
+        threading.Thread(target=acquire, daemon=True).start()
+
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release(latency=0.1, throttled=False)
+        self.assertTrue(acquired.wait(1))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=3, cooldown=0.2, max_cooldown=1)
+
+        with self.assertLogs(level="WARNING"):
+            for _ in range(3):
+                circuit_breaker.before_request()
+                circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+
+        # The next request waits the cooldown, and is let through as the probe
+        start = time.monotonic()
+        circuit_breaker.before_request()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05, max_cooldown=1)
+        with self.assertLogs(level="WARNING"):
+            circuit_breaker.record_failure()
+        time.sleep(0.1)
+        circuit_breaker.before_request()
+
+        # Other requests wait for the result of the probe
+        resumed = threading.Event()
+        def request():
+            circuit_breaker.before_request()
+            resumed.set()
+        threading.Thread(target=request, daemon=True).start()
+        self.assertFalse(resumed.wait(0.2))
+
+        with self.assertLogs(level="INFO"):
+            circuit_breaker.record_success()
+        self.assertTrue(resumed.wait(1))
+        self.assertEqual(circuit_breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_doubles_the_cooldown(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05, max_cooldown=0.15)
+        with self.assertLogs(level="WARNING"):
+            circuit_breaker.record_failure()
+
+            for cooldown in (0.1, 0.15, 0.15):
+                circuit_breaker.before_request()
+                circuit_breaker.record_failure()
+                self.assertEqual(circuit_breaker.state, CircuitBreaker.OPEN)
+                self.assertAlmostEqual(circuit_breaker.cooldown, cooldown)
+
+        # A successful probe closes the circuit with the initial cooldown
+        circuit_breaker.before_request()
+        with self.assertLogs(level="INFO"):
+            circuit_breaker.record_success()
+        self.assertEqual((circuit_breaker.state, circuit_breaker.cooldown), (CircuitBreaker.CLOSED, 0.05))
+        self.assertEqual(circuit_breaker.times_opened, 4)
+
+
+class TestInfoDengueClient(unittest.TestCase):
+
+    def client(self, responses, **options):
+        self.server, url, self.requests = make_alertcity_server(responses)
+        return InfoDengueClient(url, max_requests_per_second=0, backoff_factor=0, **options)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retry_after_is_respected(self):
+        infodengue_client = self.client([(HTTPStatus.TOO_MANY_REQUESTS, {"Retry-After": "2"})])
+
+        with mock.patch("client.time.sleep") as sleep:
+            infodengue_df = infodengue_client.get_city_data("1100015", "dengue", 1, 10, 2024, 2024)
+
+        sleep.assert_called_once_with(2.0)
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(infodengue_df["SE"].tolist(), ["202402"])
+        self.assertEqual(infodengue_client.retries, 1)
+
+    def test_transient_errors_are_retried(self):
+        infodengue_client = self.client([(HTTPStatus.SERVICE_UNAVAILABLE, {})] * 2)
+
+        infodengue_df = infodengue_client.get_city_data("1100015", "dengue", 1, 10, 2024, 2024)
+
+        self.assertIsNotNone(infodengue_df)
+        self.assertEqual((infodengue_client.retries, infodengue_client.transient_errors), (2, 2))
+
+    def test_gives_up_after_the_last_retry(self):
+        infodengue_client = self.client([(HTTPStatus.SERVICE_UNAVAILABLE, {})] * 3, max_retries=2)
+
+        with self.assertLogs(level="ERROR") as logs:
+            self.assertIsNone(infodengue_client.get_city_data("1100015", "dengue", 1, 10, 2024, 2024))
+        self.assertIn("after 3 attempts", logs.output[0])
+        self.assertEqual(len(self.requests), 3)
+
+    def test_client_errors_are_not_retried(self):
+        infodengue_client = self.client([(HTTPStatus.BAD_REQUEST, {})])
+
+        with self.assertLogs(level="ERROR"):
+            self.assertIsNone(infodengue_client.get_city_data("1100015", "dengue", 1, 10, 2024, 2024))
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(infodengue_client.circuit_breaker.failures, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from fetch import FetchEngine
+
+
+def fetch_city(geocode):
+    """Request stand-in that fails for the geocodes ending with 0."""
+    return None if geocode.endswith("0") else f"data of {geocode}"
+
+
+class TestFetchEngine(unittest.TestCase):
+
+    def test_results_keep_the_order_of_the_tasks(self):
+        fetch_engine = FetchEngine(max_workers=4)
+        tasks = [(f"12000{i:02d}",) for i in range(20)]
+
+        results = fetch_engine.fetch_all(fetch_city, tasks)
+
+        self.assertEqual(results, [fetch_city(*task) for task in tasks])
+        self.assertIn("Requests: 20, failures: 2.", fetch_engine.stats.summary())
+
+    def test_single_requests_are_in_the_stats(self):
+        fetch_engine = FetchEngine(max_workers=4)
+        list(fetch_engine.fetch_iter(fetch_city, [("1200013",), ("1200054",)]))
+
+        self.assertEqual(fetch_engine.fetch(fetch_city, ("1200013",)), "data of 1200013")
+        self.assertIsNone(fetch_engine.fetch(fetch_city, ("1200050",)))
+        self.assertIn("Requests: 4, failures: 1.", fetch_engine.stats.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
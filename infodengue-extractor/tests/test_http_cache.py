@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from epiweeks import Week
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from http_cache import ResponseCache
+
+BASE_URL = "https://info.dengue.mat.br/api/alertcity"
+
+
+def city_url(geocode, last_epiweek):
+    return (
+        f"{BASE_URL}?geocode={geocode}&disease=dengue&format=csv"
+        f"&ew_start=1&ew_end={last_epiweek.week}&ey_start=2023&ey_end={last_epiweek.year}"
+    )
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.work_dir.name, "http")
+        self.closed_url = city_url("1100015", Week(2023, 10))
+        self.recent_url = city_url("1100015", Week.thisweek())
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_put_and_get(self):
+        cache = ResponseCache(self.cache_dir)
+        self.assertIsNone(cache.get(self.closed_url))
+        cache.put(self.closed_url, b"data_iniSE,SE\n")
+
+        # Parameters in another order and an upper case host are the same request
+        reordered_url = "https://INFO.dengue.mat.br/api/alertcity?ey_end=2023&ey_start=2023&ew_end=10&ew_start=1&format=csv&disease=dengue&geocode=1100015"
+        self.assertEqual(cache.get(reordered_url), b"data_iniSE,SE\n")
+        self.assertIsNone(cache.get(city_url("1200013", Week(2023, 10))))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_recent_epiweeks_expire_first(self):
+        cache = ResponseCache(self.cache_dir, recent_ttl=-1, closed_ttl=3600)
+        cache.put(self.closed_url, b"closed")
+        cache.put(self.recent_url, b"recent")
+
+        self.assertEqual(cache.get(self.closed_url), b"closed")
+        self.assertIsNone(cache.get(self.recent_url))
+
+        # The last epiweek that can still be revised
+        self.assertEqual(cache.ttl(city_url("1100015", Week.thisweek() - 7)), -1)
+        self.assertEqual(cache.ttl(city_url("1100015", Week.thisweek() - 8)), 3600)
+
+    def test_least_recently_used_are_evicted(self):
+        cache = ResponseCache(self.cache_dir, max_size=30)
+        urls = [city_url(geocode, Week(2023, 10)) for geocode in ("1100015", "1200013", "1300029")]
+        for position, url in enumerate(urls):
+            cache.put(url, b"x" * 10)
+            # Older modification times, so the order does not depend on the clock resolution
+            body_path = os.path.join(self.cache_dir, f"{cache.key(url)}.body")
+            os.utime(body_path, (position, position))
+
+        # Reading the first response marks it as recently used
+        self.assertIsNotNone(cache.get(urls[0]))
+        cache.put(city_url("1400027", Week(2023, 10)), b"x" * 10)
+
+        self.assertIsNone(cache.get(urls[1]))
+        self.assertIsNotNone(cache.get(urls[0]))
+        self.assertEqual(cache.evictions, 2)
+        self.assertLessEqual(cache.size, 27)
+
+    def test_size_is_loaded_from_disk(self):
+        cache = ResponseCache(self.cache_dir)
+        cache.put(self.closed_url, b"x" * 100)
+        cache.put(self.closed_url, b"x" * 40)
+        self.assertEqual(cache.size, 40)
+
+        self.assertEqual(ResponseCache(self.cache_dir).size, 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import gc
+import json
+import weakref
+import threading
+import unittest
+from io import BytesIO
+from unittest import mock
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from log import APILogHandler, ManagerInterface
+
+
+def make_log_server(batch_response):
+    """Manager API stand-in answering `POST /log/batch` with `batch_response` (status, body) and `POST /log` with 200."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            content = json.dumps({"session_id": "s"}).encode()
+            self.send_response(HTTPStatus.CREATED)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_POST(self):
+            requests.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            status, body = batch_response if self.path == "/log/batch" else (HTTPStatus.OK, {})
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", requests
+
+
+class TestBatchEndpointFallback(unittest.TestCase):
+
+    BATCH = [{"timestamp": "2024-01-01 00:00:00", "level": "INFO", "message": "test", "session_id": "s", "app_name": "test"}]
+
+    def handler(self, batch_response):
+        self.server, url, self.requests = make_log_server(batch_response)
+        self.api_handler = APILogHandler(url, session_id="s", app_name="test", flush_interval=0.1)
+        return self.api_handler
+
+    def tearDown(self):
+        self.api_handler.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_unknown_session_keeps_the_batch_endpoint(self):
+        api_handler = self.handler((HTTPStatus.NOT_FOUND, {"detail": "Session ID not found. s"}))
+        api_handler.send_batch(self.BATCH)
+        api_handler.send_batch(self.BATCH)
+
+        self.assertTrue(api_handler.use_batch_endpoint)
+        self.assertEqual([path for path, _ in self.requests], ["/log/batch", "/log/batch"])
+
+    def test_missing_endpoint_falls_back_to_single_logs(self):
+        api_handler = self.handler((HTTPStatus.NOT_FOUND, {"detail": "Not Found"}))
+        api_handler.send_batch(self.BATCH)
+        api_handler.send_batch(self.BATCH)
+
+        self.assertFalse(api_handler.use_batch_endpoint)
+        self.assertEqual([path for path, _ in self.requests], ["/log/batch", "/log", "/log"])
+
+    def test_method_not_allowed_falls_back_to_single_logs(self):
+        api_handler = self.handler((HTTPStatus.METHOD_NOT_ALLOWED, {"detail": "Method Not Allowed"}))
+        api_handler.send_batch(self.BATCH)
+
+        self.assertFalse(api_handler.use_batch_endpoint)
+        self.assertEqual(self.requests[1], ("/log", self.BATCH[0]))
+
+
+class TestHandlerClose(unittest.TestCase):
+
+    def test_closed_handler_is_not_kept_by_the_exit_hook(self):
+        server, url, _ = make_log_server((HTTPStatus.OK, {}))
+        try:
+            api_handler = APILogHandler(url, session_id="s", app_name="test", flush_interval=0.1)
+            handler_reference = weakref.ref(api_handler)
+            api_handler.close()
+            del api_handler
+            gc.collect()
+            self.assertIsNone(handler_reference())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestUploadRetries(unittest.TestCase):
+
+    def test_connect_errors_are_retried_once_per_attempt(self):
+        server, url, _ = make_log_server((HTTPStatus.OK, {}))
+        manager_interface = ManagerInterface("test", url, max_retries=2, backoff_factor=0)
+        try:
+            with mock.patch("urllib3.util.connection.create_connection", side_effect=ConnectionRefusedError) as create_connection:
+                uploaded = manager_interface.upload_file("org", "project", BytesIO(b"a;b\n"), "file.csv")
+
+            self.assertFalse(uploaded)
+            self.assertEqual(create_connection.call_count, 3)
+        finally:
+            manager_interface.api_handler.close()
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
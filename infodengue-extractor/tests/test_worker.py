@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import threading
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from worker import LeaseWorker
+
+
+class LeaseStore():
+    """In-memory stand-in of the `/lease` endpoints of the Manager API."""
+
+    def __init__(self):
+        self.units = dict()
+        self.leases = dict()
+        self.lock = threading.Lock()
+
+    def interface(self, worker_id):
+        return ManagerInterfaceStandIn(self, worker_id)
+
+
+class ManagerInterfaceStandIn():
+
+    def __init__(self, store, worker_id):
+        self.store = store
+        self.session_id = worker_id
+        self.heartbeats = 0
+        self.fail_requests = False
+
+    def register_work_units(self, run_id, units):
+        with self.store.lock:
+            new_units = [unit for unit in units if (run_id, unit) not in self.store.units]
+            for unit in new_units:
+                self.store.units[(run_id, unit)] = {"done": False, "attempts": 0, "lease_id": None}
+            return len(new_units)
+
+    def claim_work_unit(self, run_id, lease_seconds=300):
+        with self.store.lock:
+            now = time.monotonic()
+            pending = [
+                (unit, state) for (unit_run_id, unit), state in self.store.units.items()
+                if unit_run_id == run_id and not state["done"]
+            ]
+            for unit, state in pending:
+                lease = self.store.leases.get(state["lease_id"])
+                if lease is not None and lease["expires_at"] > now:
+                    continue
+
+                state["attempts"] += 1
+                state["lease_id"] = len(self.store.leases) + 1
+                self.store.leases[state["lease_id"]] = {
+                    "unit": unit, "run_id": run_id, "worker_id": self.session_id, "expires_at": now + lease_seconds
+                }
+                return {"id": state["lease_id"], "unit": unit, "attempts": state["attempts"]}, len(pending)
+            return None, len(pending)
+
+    def heartbeat_work_unit(self, lease_id, lease_seconds=300):
+        if self.fail_requests:
+            raise requests.exceptions.ConnectionError("Manager is down")
+
+        with self.store.lock:
+            self.heartbeats += 1
+            lease = self.store.leases[lease_id]
+            state = self.store.units[(lease["run_id"], lease["unit"])]
+            if state["lease_id"] != lease_id:
+                return False
+            lease["expires_at"] = time.monotonic() + lease_seconds
+            return True
+
+    def complete_work_unit(self, lease_id, done=True):
+        if self.fail_requests:
+            raise requests.exceptions.ConnectionError("Manager is down")
+
+        with self.store.lock:
+            lease = self.store.leases[lease_id]
+            state = self.store.units[(lease["run_id"], lease["unit"])]
+            if state["lease_id"] != lease_id:
+                return False
+            state["done"] = done
+            state["lease_id"] = None
+            return True
+
+
+UNITS = [("dengue", "AC"), ("dengue", "RR"), ("zika", "AC"), ("zika", "RR")]
+
+
+class TestLeaseWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.store = LeaseStore()
+        self.workers = []
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def worker(self, worker_id, **options):
+        options = {"lease_seconds": 60, "poll_interval": 0.05, **options}
+        worker = LeaseWorker(self.store.interface(worker_id), "2024-SE10", **options)
+        worker.register(UNITS)
+        self.workers.append(worker)
+        return worker
+
+    def test_units_are_split_between_the_workers(self):
+        worker_a, worker_b = self.worker("a"), self.worker("b")
+        claims = {"a": [], "b": []}
+
+        # The workers claim units alternately
+        units_a, units_b = worker_a.claim_units(), worker_b.claim_units()
+        for worker_id, worker, units in [("a", worker_a, units_a), ("b", worker_b, units_b)] * 2:
+            unit = next(units)
+            claims[worker_id].append(unit)
+            worker.finish(*unit)
+
+        self.assertEqual(sorted(claims["a"] + claims["b"]), sorted(UNITS))
+        self.assertEqual(len(claims["a"]), 2)
+        self.assertEqual(list(units_a), [])
+        self.assertEqual(list(units_b), [])
+
+    def test_waits_for_the_units_of_other_workers(self):
+        worker_a, worker_b = self.worker("a"), self.worker("b")
+        # Worker a holds all the units, without finishing them
+        self.assertEqual(list(worker_a.claim_units()), UNITS)
+        self.assertEqual(len(worker_a.leases), 4)
+
+        claimed = []
+        def claim():
+            claimed.extend(worker_b.claim_units())
+        with self.assertLogs(level="INFO") as logs:
+            claim_thread = threading.Thread(target=claim)
+            claim_thread.start()
+            time.sleep(0.2)
+            for disease, uf in UNITS:
+                worker_a.finish(disease, uf)
+            claim_thread.join(1)
+
+        self.assertFalse(claim_thread.is_alive())
+        self.assertEqual(claimed, [])
+        self.assertTrue(any("4 units leased by other workers" in line for line in logs.output))
+
+    def test_failed_unit_is_claimed_again_then_given_up(self):
+        worker = self.worker("a", max_attempts=2)
+        attempts = []
+
+        with self.assertLogs(level="ERROR") as logs:
+            for disease, uf in worker.claim_units():
+                attempts.append((disease, uf))
+                # The upload of dengue AC always fails
+                worker.finish(disease, uf, done=(disease, uf) != ("dengue", "AC"))
+
+        self.assertEqual(attempts.count(("dengue", "AC")), 2)
+        self.assertEqual(len(attempts), 5)
+        self.assertIn("Giving up dengue data for AC after 2 attempts", logs.output[0])
+
+    def test_heartbeats_renew_the_leases(self):
+        worker = self.worker("a", lease_seconds=0.3, heartbeat_interval=0.05)
+        unit = next(worker.claim_units())
+
+        # Longer than the lease: without heartbeats, another worker would claim the unit
+        time.sleep(0.5)
+        other_worker = self.worker("b", lease_seconds=0.3)
+        self.assertNotEqual(next(other_worker.claim_units()), unit)
+        self.assertGreater(worker.manager_interface.heartbeats, 0)
+
+    def test_lost_lease_is_dropped(self):
+        worker = self.worker("a", lease_seconds=0.1, heartbeat_interval=60)
+        disease, uf = next(worker.claim_units())
+
+        # The lease expires and is claimed by another worker
+        time.sleep(0.2)
+        other_worker = self.worker("b")
+        self.assertEqual(next(other_worker.claim_units()), (disease, uf))
+
+        with self.assertLogs(level="WARNING") as logs:
+            worker.finish(disease, uf)
+        self.assertIn("was lost before it finished", logs.output[0])
+        self.assertEqual(worker.leases, {})
+
+    def test_release_error_is_logged(self):
+        worker = self.worker("a")
+        disease, uf = next(worker.claim_units())
+
+        worker.manager_interface.fail_requests = True
+        with self.assertLogs(level="ERROR") as logs:
+            worker.finish(disease, uf)
+        self.assertIn(f"Unable to release the lease of {disease} data for {uf}", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
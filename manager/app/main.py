@@ -1,25 +1,42 @@
 from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
 from http import HTTPStatus
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 import random
 
+from sqlalchemy import insert, or_, and_
 from sqlalchemy.orm import Session
 
 from models import get_db
-from models import Log, File as FileDB, Status
-from models import LogModel, FileModel, StatusUpdateModel
+from models import Log, File as FileDB, Status, Lease
+from models import LogModel, LogBatchResultModel, FileModel, StatusUpdateModel
+from models import LeaseUnitsModel, LeaseUnitsResultModel, LeaseClaimModel, LeaseClaimResultModel
+from models import LeaseHeartbeatModel, LeaseCompleteModel, LeaseModel
 from pydantic import ValidationError
 
-from minio_connection import get_minio_client, upload_file_to_folder
+from minio_connection import get_minio_client, upload_file_to_folder, minio_connection
 
 import os
 import json
+import anyio.to_thread
 from slack import get_slack_client
 from slack_sdk.errors import SlackApiError
 from models import SlackMessageModel
 
-app = FastAPI()
+# Handlers are sync functions: FastAPI runs them in a threadpool, so the blocking
+# calls to SQLite, MinIO and Slack never stall the event loop
+MANAGER_THREADPOOL_SIZE = int(os.getenv("MANAGER_THREADPOOL_SIZE", 40))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = MANAGER_THREADPOOL_SIZE
+
+    # Single MinIO client for the whole process, reused by every request
+    minio_connection.connect()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def root():
@@ -27,7 +44,7 @@ async def root():
 
 
 @app.get("/log", status_code=HTTPStatus.CREATED)
-async def get_log( app_name:str, db: Session = Depends(get_db) ):
+def get_log( app_name:str, db: Session = Depends(get_db) ):
 
     # Session ID is composed of APP-NAME + REQUEST TIMESTAMP + RANDOM NUMBER
     session_id = f"{app_name}-{datetime.now().strftime('%Y%m%d%H%m%S')}-{random.randint(0, 1000000):07d}"
@@ -40,7 +57,7 @@ async def get_log( app_name:str, db: Session = Depends(get_db) ):
 
 
 @app.post("/log", response_model=LogModel)
-async def post_log(log: LogModel, db: Session = Depends(get_db)):
+def post_log(log: LogModel, db: Session = Depends(get_db)):
 
     existing_status = db.query(Status).filter(Status.session_id == log.session_id).first()
     if not existing_status:
@@ -62,8 +79,47 @@ async def post_log(log: LogModel, db: Session = Depends(get_db)):
     return new_log
 
 
+@app.post("/log/batch", response_model=LogBatchResultModel)
+def post_log_batch(logs: list[LogModel], db: Session = Depends(get_db)):
+
+    if not logs:
+        return {"received_count": 0}
+
+    # Validate all the session ids with a single query
+    session_ids = {log.session_id for log in logs}
+    existing_session_ids = {
+        session_id for (session_id,) in 
+        db.query(Status.session_id).filter(Status.session_id.in_(session_ids))
+    }
+    missing_session_ids = session_ids - existing_session_ids
+    if missing_session_ids:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, 
+            detail=f"Session ID not found. {', '.join(sorted(missing_session_ids))}"
+        )
+
+    # All the rows must have the same keys to be sent in a single executemany
+    now = datetime.now()
+    log_rows = [
+        {**log.dict(exclude={"id", "timestamp"}), "timestamp": log.timestamp or now}
+        for log in logs
+    ]
+    db.execute(insert(Log.__table__), log_rows)
+
+    critical_session_ids = {log.session_id for log in logs if log.level == "CRITICAL"}
+    if critical_session_ids:
+        db.query(Status).filter(Status.session_id.in_(critical_session_ids)).update(
+            {Status.end: now, Status.status: "FINISHED WITH ERRORS"},
+            synchronize_session=False
+        )
+
+    db.commit()
+
+    return {"received_count": len(log_rows)}
+
+
 @app.put("/status", response_model=StatusUpdateModel)
-async def update_status(status_update: StatusUpdateModel, db: Session = Depends(get_db)):
+def update_status(status_update: StatusUpdateModel, db: Session = Depends(get_db)):
 
     existing_status = db.query(Status).filter(Status.session_id == status_update.session_id).first()
     if not existing_status:
@@ -83,7 +139,7 @@ async def update_status(status_update: StatusUpdateModel, db: Session = Depends(
 
 
 @app.post("/file", response_model=FileModel)
-async def upload_file(
+def upload_file(
     session_id   : str,
     organization : str,
     project      : str,
@@ -114,16 +170,12 @@ async def upload_file(
     # FILE UPLOAD
     # ===================================
 
-    file_content = file.file.read()
-    file_length = len(file_content)
-    file.file.seek(0)
-
+    # The file is streamed to MinIO in parts, without reading it fully into memory
     file_uploaded_successfully, file_upload_message = upload_file_to_folder(
         minio_client, 
         'data', 
         f'{project}/data/{organization}/{filename}', 
-        file.file,
-        file_length 
+        file.file
     )
 
     
@@ -137,12 +189,119 @@ async def upload_file(
     return new_file
 
 
+# ====================
+# LEASES
+# ====================
+# Work units of a run are split between several workers: each worker claims a unit
+# for some seconds and renews the lease while working on it. The unit of a worker
+# that stops sending heartbeats is claimed again by another worker when the lease expires.
+
+@app.post("/lease/units", response_model=LeaseUnitsResultModel)
+def register_lease_units(lease_units: LeaseUnitsModel, db: Session = Depends(get_db)):
+
+    # Every worker registers all the units, so the units already registered are ignored
+    registered_units = {
+        unit for (unit,) in
+        db.query(Lease.unit).filter(Lease.app_name == lease_units.app_name, Lease.run_id == lease_units.run_id)
+    }
+    new_units = [unit for unit in dict.fromkeys(lease_units.units) if unit not in registered_units]
+    if new_units:
+        db.execute(
+            insert(Lease.__table__).prefix_with("OR IGNORE"),
+            [
+                {"app_name": lease_units.app_name, "run_id": lease_units.run_id, "unit": unit, "status": "PENDING", "attempts": 0}
+                for unit in new_units
+            ]
+        )
+        db.commit()
+
+    return {"registered_count": len(new_units)}
+
+
+@app.post("/lease/claim", response_model=LeaseClaimResultModel)
+def claim_lease(lease_claim: LeaseClaimModel, db: Session = Depends(get_db)):
+
+    now = datetime.now()
+    run_filter = (Lease.app_name == lease_claim.app_name, Lease.run_id == lease_claim.run_id)
+    claimable = or_(Lease.status == "PENDING", and_(Lease.status == "LEASED", Lease.expires_at < now))
+
+    claimed_lease = None
+    candidate_ids = [lease_id for (lease_id,) in db.query(Lease.id).filter(*run_filter, claimable).order_by(Lease.id).limit(10)]
+    for lease_id in candidate_ids:
+        # Conditional update: another worker may have claimed the unit since it was selected
+        updated_rows = db.query(Lease).filter(Lease.id == lease_id, claimable).update(
+            {
+                Lease.status: "LEASED",
+                Lease.worker_id: lease_claim.worker_id,
+                Lease.expires_at: now + timedelta(seconds=lease_claim.lease_seconds),
+                Lease.attempts: Lease.attempts + 1
+            },
+            synchronize_session=False
+        )
+        db.commit()
+        if updated_rows == 1:
+            claimed_lease = db.query(Lease).filter(Lease.id == lease_id).first()
+            break
+
+    pending = db.query(Lease).filter(*run_filter, Lease.status != "DONE").count()
+    return {"lease": claimed_lease, "pending": pending}
+
+
+@app.put("/lease/heartbeat", response_model=LeaseModel)
+def heartbeat_lease(lease_heartbeat: LeaseHeartbeatModel, db: Session = Depends(get_db)):
+
+    existing_lease = db.query(Lease).filter(Lease.id == lease_heartbeat.lease_id).first()
+    if not existing_lease:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Lease not found.")
+
+    updated_rows = db.query(Lease).filter(
+        Lease.id == lease_heartbeat.lease_id,
+        Lease.worker_id == lease_heartbeat.worker_id,
+        Lease.status == "LEASED"
+    ).update(
+        {Lease.expires_at: datetime.now() + timedelta(seconds=lease_heartbeat.lease_seconds)},
+        synchronize_session=False
+    )
+    db.commit()
+    if updated_rows == 0:
+        raise HTTPException(status_code=HTTPStatus.CONFLICT, detail="Lease is held by another worker or already done.")
+
+    db.refresh(existing_lease)
+    return existing_lease
+
+
+@app.put("/lease/complete", response_model=LeaseModel)
+def complete_lease(lease_complete: LeaseCompleteModel, db: Session = Depends(get_db)):
+
+    existing_lease = db.query(Lease).filter(Lease.id == lease_complete.lease_id).first()
+    if not existing_lease:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Lease not found.")
+
+    updated_rows = db.query(Lease).filter(
+        Lease.id == lease_complete.lease_id,
+        Lease.worker_id == lease_complete.worker_id,
+        Lease.status == "LEASED"
+    ).update(
+        {
+            Lease.status: "DONE" if lease_complete.done else "PENDING",
+            Lease.expires_at: None
+        },
+        synchronize_session=False
+    )
+    db.commit()
+    if updated_rows == 0:
+        raise HTTPException(status_code=HTTPStatus.CONFLICT, detail="Lease is held by another worker or already done.")
+
+    db.refresh(existing_lease)
+    return existing_lease
+
+
 # ====================
 # NOTIFICATIONS
 # ====================
 
 @app.post("/notify/slack")
-async def upload_file(
+def upload_file(
     message      : str,
     slack_client = Depends(get_slack_client)
 ):
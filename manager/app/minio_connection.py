@@ -1,41 +1,197 @@
 import os
+import time
+import threading
+import urllib3
+from urllib3.exceptions import HTTPError
 from minio import Minio
-from minio.error import S3Error
 import io
 
-def get_minio_client():
+# Size of each part sent to MinIO. Uploads are streamed with an unknown length and their
+# parts are sent one at a time, so one part per request is buffered in memory (MinIO minimum is 5 MiB)
+MINIO_UPLOAD_PART_SIZE = int(os.getenv("MINIO_UPLOAD_PART_SIZE", 10 * 1024 * 1024))
 
-    # Get environment variables
-    endpoint   = os.getenv("MINIO_ENDPOINT")
-    access_key = os.getenv("MINIO_ACCESS_KEY")
-    secret_key = os.getenv("MINIO_SECRET_KEY")
+# Maximum number of bytes buffered by all the uploads running in the process
+MINIO_MAX_INFLIGHT_BYTES = int(os.getenv("MINIO_MAX_INFLIGHT_BYTES", 8 * MINIO_UPLOAD_PART_SIZE))
 
-    if not endpoint or not access_key or not secret_key:
-        return None
 
-    try:
-        # Initialize MinIO client
-        minio_client = Minio(
+class InflightBytesLimiter():
+
+    def __init__(self, max_bytes: int) -> None:
+        """Limit the amount of memory reserved by concurrent uploads.
+
+        Args:
+            max_bytes (int): Maximum number of bytes reserved at the same time.
+        """
+        self.max_bytes = max_bytes
+        self.inflight  = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, n_bytes: int):
+        # A single request bigger than the limit is still allowed when nothing else is running
+        n_bytes = min(n_bytes, self.max_bytes)
+        with self.condition:
+            self.condition.wait_for(lambda: self.inflight + n_bytes <= self.max_bytes)
+            self.inflight += n_bytes
+        return n_bytes
+
+    def release(self, n_bytes: int):
+        with self.condition:
+            self.inflight -= n_bytes
+            self.condition.notify_all()
+
+
+# Connections kept open to MinIO. Handlers run in a threadpool of MANAGER_THREADPOOL_SIZE
+# threads, so by default there is one connection available for each of them
+MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", os.getenv("MANAGER_THREADPOOL_SIZE", 40)))
+
+# Seconds between two health probes of an healthy connection
+MINIO_HEALTH_CHECK_INTERVAL = int(os.getenv("MINIO_HEALTH_CHECK_INTERVAL", 300))
+
+upload_limiter = InflightBytesLimiter(MINIO_MAX_INFLIGHT_BYTES)
+
+
+class MinioConnection():
+
+    def __init__(self, pool_size: int, health_check_interval: int) -> None:
+        """Long-lived MinIO client shared by all the requests of the process.
+
+        Args:
+            pool_size (int): Maximum number of pooled connections to MinIO.
+            health_check_interval (int): Seconds between two health probes.
+        """
+        self.pool_size = pool_size
+        self.health_check_interval = health_check_interval
+        self.client     = None
+        self.healthy    = False
+        self.last_probe = 0
+        self.known_buckets = set()
+        self.probing    = False
+        self.lock = threading.Lock()
+
+    def create_client(self):
+        # Get environment variables
+        endpoint   = os.getenv("MINIO_ENDPOINT")
+        access_key = os.getenv("MINIO_ACCESS_KEY")
+        secret_key = os.getenv("MINIO_SECRET_KEY")
+
+        if not endpoint or not access_key or not secret_key:
+            return None
+
+        # Same settings as the MinIO default client, with a bigger pool
+        http_client = urllib3.PoolManager(
+            maxsize=self.pool_size,
+            block=True,
+            timeout=urllib3.Timeout(connect=10, read=300),
+            cert_reqs="CERT_REQUIRED",
+            retries=urllib3.Retry(
+                total=5,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+
+        self.client = Minio(
             endpoint,
             access_key=access_key,
             secret_key=secret_key,
-            secure=False
+            secure=False,
+            http_client=http_client
         )
-        # Perform a basic check, e.g., list buckets
-        minio_client.list_buckets()
-        return minio_client
-    except S3Error as err:
-        return None
+        return self.client
+
+    def connect(self):
+        if self.create_client() is None:
+            return None
+        self.probe()
+        return self.client
+
+    def probe(self):
+        self.last_probe = time.monotonic()
+        try:
+            # Perform a basic check, e.g., list buckets
+            buckets = self.client.list_buckets()
+            self.known_buckets = {bucket.name for bucket in buckets}
+            self.healthy = True
+        except Exception as err:
+            self.known_buckets = set()
+            self.healthy = False
+        return self.healthy
+
+    def get_client(self):
+        # The lock only elects the thread that probes: the probe itself runs outside it,
+        # so a slow MinIO does not block the requests that only need the client
+        with self.lock:
+            if self.client is None and self.create_client() is None:
+                return None
+
+            probe_is_due = time.monotonic() - self.last_probe > self.health_check_interval
+            run_probe = (not self.healthy or probe_is_due) and not self.probing
+            if run_probe:
+                self.probing = True
+            elif self.probing:
+                # Another thread is probing: the request uses the client instead of failing.
+                # If MinIO is really down, the request fails with a transport error.
+                return self.client
+
+        if run_probe:
+            try:
+                self.probe()
+            finally:
+                self.probing = False
+
+        return self.client if self.healthy else None
+
+    def bucket_exists(self, bucket: str):
+        if bucket in self.known_buckets:
+            return True
+
+        exists = self.client.bucket_exists(bucket)
+        if exists:
+            self.known_buckets.add(bucket)
+        return exists
+
+    def mark_unhealthy(self):
+        # Forces a new probe in the next request
+        self.healthy = False
+
+
+minio_connection = MinioConnection(MINIO_POOL_SIZE, MINIO_HEALTH_CHECK_INTERVAL)
+
+
+def get_minio_client():
+    return minio_connection.get_client()
     
-def upload_file_to_folder(client, bucket, filename, file_content, length):
+def upload_file_to_folder(client, bucket, filename, file_content, length=-1):
+    """Upload a file-like object to MinIO.
+
+    When the length is unknown (-1) the content is sent as a multipart upload,
+    reading MINIO_UPLOAD_PART_SIZE bytes at a time. Parts are not uploaded in parallel:
+    each parallel part would be another buffer not counted by the upload limiter.
+    """
+    reserved_bytes = upload_limiter.acquire(MINIO_UPLOAD_PART_SIZE)
     try:
+        if client is None:
+            return False, "MinIO connection is not available."
+
+        if not minio_connection.bucket_exists(bucket):
+            return False, f"Bucket '{bucket}' does not exist."
+
         client.put_object(
             bucket,
             filename,
             file_content,
-            length
+            length,
+            part_size=MINIO_UPLOAD_PART_SIZE,
+            num_parallel_uploads=1
         )
         
         return True, "OK"
+    except HTTPError as e:
+        # Connection and transport errors (e.g. MaxRetryError). S3 errors, like an invalid
+        # object name, are answered by a healthy MinIO and do not force a new probe.
+        minio_connection.mark_unhealthy()
+        return False, str(e)
     except Exception as e:
         return False, str(e)
+    finally:
+        upload_limiter.release(reserved_bytes)
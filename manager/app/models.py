@@ -1,6 +1,8 @@
 
+import os
+
 # ORM Imports
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, UniqueConstraint
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Pydantic for smarter API Typing
@@ -13,7 +15,24 @@ from enum import Enum
 # Configuração do SQLite
 DATABASE_URL = "sqlite:////data/monitor.db"
 Base = declarative_base()
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# One connection for each thread of the API threadpool
+DATABASE_POOL_SIZE = int(os.getenv("MANAGER_THREADPOOL_SIZE", 40))
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=DATABASE_POOL_SIZE,
+    max_overflow=0
+)
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    # WAL lets readers run while a request is writing, and concurrent
+    # writers wait for the lock instead of failing with 'database is locked'
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # ==================================
@@ -51,6 +70,20 @@ class File(Base):
     upload_ts    = Column(DateTime, default=datetime.now())
 
 
+class Lease(Base):
+    __tablename__ = "lease"
+    __table_args__ = (UniqueConstraint("app_name", "run_id", "unit"),)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    app_name   = Column(String, index=True)
+    run_id     = Column(String, index=True)
+    unit       = Column(String)
+    status     = Column(String, default="PENDING") # PENDING, LEASED or DONE
+    worker_id  = Column(String, nullable=True)     # Session ID of the worker holding the lease
+    expires_at = Column(DateTime, nullable=True)
+    attempts   = Column(Integer, default=0)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -73,6 +106,9 @@ class LogModel(BaseModel):
     class Config:
         from_attributes = True
 
+class LogBatchResultModel(BaseModel):
+    received_count : int
+
 class StatusModel(BaseModel):
     session_id : str
     app_name   : str
@@ -101,6 +137,48 @@ class FileModel(BaseModel):
         from_attributes = True
 
 
+class LeaseUnitsModel(BaseModel):
+    app_name : str
+    run_id   : str
+    units    : list[str]
+
+class LeaseUnitsResultModel(BaseModel):
+    registered_count : int
+
+class LeaseClaimModel(BaseModel):
+    app_name      : str
+    run_id        : str
+    worker_id     : str
+    lease_seconds : int = 300
+
+class LeaseModel(BaseModel):
+    id         : int
+    app_name   : str
+    run_id     : str
+    unit       : str
+    status     : str
+    worker_id  : Optional[str] = None
+    expires_at : Optional[datetime] = None
+    attempts   : int
+
+    class Config:
+        from_attributes = True
+
+class LeaseClaimResultModel(BaseModel):
+    lease   : Optional[LeaseModel] = None
+    pending : int # Units not done yet, including the ones leased by other workers
+
+class LeaseHeartbeatModel(BaseModel):
+    lease_id      : int
+    worker_id     : str
+    lease_seconds : int = 300
+
+class LeaseCompleteModel(BaseModel):
+    lease_id  : int
+    worker_id : str
+    done      : bool = True # False returns the unit to be claimed again
+
+
 class SlackMessageModel(BaseModel):
     blocks: list[dict]
 
@@ -0,0 +1,88 @@
+import os
+import time
+import threading
+import unittest
+import requests
+from http import HTTPStatus
+
+class TestAPILogLatencyDuringUpload(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.api_base_url = "http://localhost:8000"
+        self.file_endpoint = f"{self.api_base_url}/file"
+        self.log_endpoint = f"{self.api_base_url}/log"
+        self.app_name = "TestAPILogLatencyDuringUpload"
+        self.n_requests = 100
+        self.upload_size = int(os.getenv("LATENCY_TEST_UPLOAD_SIZE", 200 * 1024 * 1024))
+
+        # Create a valid session_id
+        response = requests.get(self.log_endpoint, params={"app_name": self.app_name})
+        if response.status_code == HTTPStatus.CREATED:
+            self.session_id = response.json().get("session_id")
+        else:
+            self.fail("Falha ao obter session_id no setup. Status do GET inesperado.")
+
+    def measure_log_p99(self):
+        payload = {
+            "session_id": self.session_id,
+            "app_name": self.app_name,
+            "level": "INFO",
+            "message": "Latency test message"
+        }
+
+        latencies = []
+        for _ in range(self.n_requests):
+            start = time.perf_counter()
+            response = requests.post(self.log_endpoint, json=payload)
+            latencies.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        latencies.sort()
+        return latencies[int(len(latencies) * 0.99) - 1]
+
+    def upload_large_file(self):
+        def file_chunks():
+            chunk = b"0" * (1024 * 1024)
+            for _ in range(self.upload_size // len(chunk)):
+                yield chunk
+
+        boundary = "latency-test-boundary"
+        def multipart_body():
+            yield (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="file"; filename="latency_test.txt"\r\n'
+                f"Content-Type: text/plain\r\n\r\n"
+            ).encode()
+            yield from file_chunks()
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        requests.post(
+            self.file_endpoint,
+            params={
+                "session_id": self.session_id,
+                "organization": "TestOrg",
+                "project": "TestProject"
+            },
+            data=multipart_body(),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        )
+
+    # /log p99 latency must not grow while a large file is being uploaded
+    def test_POST_log_p99_flat_during_large_upload(self):
+        baseline_p99 = self.measure_log_p99()
+
+        upload_thread = threading.Thread(target=self.upload_large_file)
+        upload_thread.start()
+        time.sleep(1) # Let the upload reach the server
+        upload_p99 = self.measure_log_p99()
+        upload_in_flight = upload_thread.is_alive()
+        upload_thread.join()
+
+        self.assertTrue(upload_in_flight, "Upload finished before the measurement. Increase LATENCY_TEST_UPLOAD_SIZE.")
+        self.assertLess(
+            upload_p99, 3 * baseline_p99 + 0.05,
+            f"/log p99 - baseline: {baseline_p99*1000:.1f}ms, during upload: {upload_p99*1000:.1f}ms"
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import time
+import uuid
+import unittest
+import requests
+from http import HTTPStatus
+
+class TestAPILeaseRoute(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.api_base_url = "http://localhost:8000"
+        self.lease_endpoint = f"{self.api_base_url}/lease"
+        self.app_name = "TestAPILeaseRoute"  # App Name
+
+        # Each test uses its own run, so the units of other tests are never claimed
+        self.run_id = str(uuid.uuid4())
+        self.units = ["dengue|AC", "dengue|AL", "zika|AC"]
+        response = requests.post(f"{self.lease_endpoint}/units", json={
+            "app_name": self.app_name,
+            "run_id": self.run_id,
+            "units": self.units
+        })
+        if response.status_code != HTTPStatus.OK:
+            self.fail("Falha ao registrar as unidades no setup. Status do POST inesperado.")
+
+    def claim(self, worker_id, lease_seconds=300):
+        return requests.post(f"{self.lease_endpoint}/claim", json={
+            "app_name": self.app_name,
+            "run_id": self.run_id,
+            "worker_id": worker_id,
+            "lease_seconds": lease_seconds
+        })
+
+    # Test /LEASE/UNITS
+    # ===============================
+    # Units already registered (e.g. by another worker) are ignored
+    def test_POST_lease_units_200_OK__ignore_registered_units(self):
+        response = requests.post(f"{self.lease_endpoint}/units", json={
+            "app_name": self.app_name,
+            "run_id": self.run_id,
+            "units": self.units + ["chikungunya|AC"]
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()["registered_count"], 1)
+
+    def test_POST_lease_units_422_UnprocessableEntity__missing_parameters(self):
+        response = requests.post(f"{self.lease_endpoint}/units", json={"app_name": self.app_name})
+        self.assertEqual(response.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+
+    # Test /LEASE/CLAIM
+    # ===============================
+    # Workers never claim the same unit
+    def test_POST_lease_claim_200_OK__units_split_between_workers(self):
+        claimed_units = [self.claim(f"worker-{i}").json()["lease"]["unit"] for i in range(len(self.units))]
+        self.assertCountEqual(claimed_units, self.units)
+
+        response = self.claim("worker-extra")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIsNone(response.json()["lease"])
+        self.assertEqual(response.json()["pending"], len(self.units))
+
+    # The unit of a worker that stopped sending heartbeats is claimed again
+    def test_POST_lease_claim_200_OK__expired_lease_claimed_again(self):
+        leases = [self.claim("dead-worker", lease_seconds=1).json()["lease"] for _ in self.units]
+        time.sleep(1.5)
+
+        lease = self.claim("live-worker").json()["lease"]
+        self.assertEqual(lease["worker_id"], "live-worker")
+        self.assertIn(lease["id"], [dead_lease["id"] for dead_lease in leases])
+        self.assertEqual(lease["attempts"], 2)
+
+    # Test /LEASE/HEARTBEAT
+    # ===============================
+    def test_PUT_lease_heartbeat_200_OK__extend_lease(self):
+        lease = self.claim("worker", lease_seconds=1).json()["lease"]
+        response = requests.put(f"{self.lease_endpoint}/heartbeat", json={
+            "lease_id": lease["id"],
+            "worker_id": "worker",
+            "lease_seconds": 300
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertGreater(response.json()["expires_at"], lease["expires_at"])
+
+        # The renewed lease is not claimed by other workers
+        time.sleep(1.5)
+        claimed_ids = [(self.claim("other-worker").json()["lease"] or {}).get("id") for _ in self.units]
+        self.assertNotIn(lease["id"], claimed_ids)
+
+    def test_PUT_lease_heartbeat_409_Conflict__lease_lost(self):
+        lease = self.claim("dead-worker", lease_seconds=1).json()["lease"]
+        time.sleep(1.5)
+        while (self.claim("live-worker").json()["lease"] or {}).get("id") not in (lease["id"], None):
+            pass
+
+        response = requests.put(f"{self.lease_endpoint}/heartbeat", json={
+            "lease_id": lease["id"],
+            "worker_id": "dead-worker"
+        })
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+
+    def test_PUT_lease_heartbeat_404_NotFound__invalid_lease_id(self):
+        response = requests.put(f"{self.lease_endpoint}/heartbeat", json={
+            "lease_id": -1,
+            "worker_id": "worker"
+        })
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    # Test /LEASE/COMPLETE
+    # ===============================
+    def test_PUT_lease_complete_200_OK__done_units_not_claimed_again(self):
+        for _ in self.units:
+            lease = self.claim("worker").json()["lease"]
+            response = requests.put(f"{self.lease_endpoint}/complete", json={
+                "lease_id": lease["id"],
+                "worker_id": "worker"
+            })
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(response.json()["status"], "DONE")
+
+        response = self.claim("worker")
+        self.assertIsNone(response.json()["lease"])
+        self.assertEqual(response.json()["pending"], 0)
+
+    # A failed unit is returned to be claimed again
+    def test_PUT_lease_complete_200_OK__failed_unit_claimed_again(self):
+        lease = self.claim("worker").json()["lease"]
+        response = requests.put(f"{self.lease_endpoint}/complete", json={
+            "lease_id": lease["id"],
+            "worker_id": "worker",
+            "done": False
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()["status"], "PENDING")
+        self.assertEqual(self.claim("other-worker").json()["lease"]["id"], lease["id"])
+
+    def test_PUT_lease_complete_409_Conflict__other_worker(self):
+        lease = self.claim("worker").json()["lease"]
+        response = requests.put(f"{self.lease_endpoint}/complete", json={
+            "lease_id": lease["id"],
+            "worker_id": "other-worker"
+        })
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+
+
+if __name__ == "__main__":
+    unittest.main()
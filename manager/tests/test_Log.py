@@ -70,5 +70,58 @@ class TestAPILogsRoute(unittest.TestCase):
         self.assertEqual(response.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
         self.assertIn("detail", response.json())
 
+    # Test /LOG/BATCH
+    # ===============================
+    # POST method with a list of logs returns 200 OK and the number of logs saved
+    def test_POST_log_batch_200_OK__create_logs(self):
+        payload = [
+            {
+                "session_id": self.session_id,
+                "app_name": self.app_name,
+                "level": "INFO",
+                "message": f"Test message {i}"
+            }
+            for i in range(10)
+        ]
+        response = requests.post(f"{self.log_endpoint}/batch", json=payload)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()["received_count"], 10)
+
+    # POST method with an empty list returns 200 OK
+    def test_POST_log_batch_200_OK__empty_list(self):
+        response = requests.post(f"{self.log_endpoint}/batch", json=[])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()["received_count"], 0)
+
+    # POST method with one invalid session_id returns 404 error
+    def test_POST_log_batch_404_NotFound__invalid_session_id(self):
+        payload = [
+            {
+                "session_id": session_id,
+                "app_name": self.app_name,
+                "level": "INFO",
+                "message": "Test message"
+            }
+            for session_id in (self.session_id, "nonexistent_session")
+        ]
+        response = requests.post(f"{self.log_endpoint}/batch", json=payload)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn("nonexistent_session", response.json()["detail"])
+
+    # POST method with wrong 'type' value in one of the logs returns error
+    def test_POST_log_batch_422_UnprocessableEntity__wrong_type(self):
+        payload = [
+            {
+                "session_id": self.session_id,
+                "app_name": self.app_name,
+                "level": level,
+                "message": "Test message"
+            }
+            for level in ("INFO", "INVALID_TYPE")
+        ]
+        response = requests.post(f"{self.log_endpoint}/batch", json=payload)
+        self.assertEqual(response.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+        self.assertIn("detail", response.json())
+
 if __name__ == "__main__":
     unittest.main()
@@ -113,21 +113,27 @@ def send_sabin_files_to_server_api():
         file_content = BytesIO(open(f"/data/sabin/{filename}", "rb").read())
     
         # [WIP] Upload files to both 'arbo' and 'respat' projects
-        manager_interface.upload_file(
+        sent_to_arbo = manager_interface.upload_file(
             organization='sabin',
             project='arbo',
             file_content=file_content,
             file_name=filename
         )
-        logger.info(f"File {filename} sent to 'arbo' project.")
+        if sent_to_arbo:
+            logger.info(f"File {filename} sent to 'arbo' project.")
 
-        manager_interface.upload_file(
+        sent_to_respat = manager_interface.upload_file(
             organization='sabin',
             project='respat',
             file_content=file_content,
             file_name=filename
         )
-        logger.info(f"File {filename} sent to 'respat' project.")
+        if sent_to_respat:
+            logger.info(f"File {filename} sent to 'respat' project.")
+
+        # Files not sent are tried again in the next call
+        if not (sent_to_arbo and sent_to_respat):
+            continue
 
         logger.info(f"Adding file {filename} to sent files list.")
         add_file_to_sent_list(filename)
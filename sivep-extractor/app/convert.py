@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import shutil
+import logging
+from itertools import chain
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# Up to 18 digits, so the values fit in an int64
+INTEGER_PATTERN = re.compile(r"^-?\d{1,18}$")
+FLOAT_PATTERN = re.compile(r"^-?\d*[.,]\d+$")
+DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S"]
+
+ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "date": pa.date32(),
+    "string": pa.string(),
+}
+
+
+def detect_encoding(path, sample_size=1024 * 1024):
+    """
+    Detects if a CSV is UTF-8 or latin-1, the encoding of most DATASUS files.
+    :return: Encoding to read the file with.
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    # A multi-byte character may be cut at the end of the sample
+    sample = sample[:sample.rfind(b"\n") + 1] or sample
+    try:
+        sample.decode("utf-8-sig")
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def read_columns(csv_path):
+    """
+    Reads the header of a SRAG CSV.
+    :return: Names of the columns, as in the Parquet files.
+    """
+    header = pd.read_csv(csv_path, sep=";", encoding=detect_encoding(csv_path), dtype=str, nrows=0)
+    return list(header.columns.str.strip())
+
+
+def infer_column_type(values):
+    """
+    Infers the type of a SRAG column from a sample of its (text) values.
+    :param values: Non-empty values of the column.
+    :return: 'int', 'float', 'date:<format>' or 'string'.
+    """
+    if len(values) == 0:
+        return "string"
+
+    if values.str.match(INTEGER_PATTERN).all():
+        # Codes with leading zeros (e.g. CEP) would lose them as numbers
+        if not values.str.match(r"^-?0\d").any():
+            return "int"
+        return "string"
+
+    if (values.str.match(FLOAT_PATTERN) | values.str.match(INTEGER_PATTERN)).all():
+        return "float"
+
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(values, format=date_format, errors='coerce').notna().all():
+            return f"date:{date_format}"
+
+    return "string"
+
+
+# Types of the partition columns, when they are first seen
+PARTITION_TYPES = {"SEM_NOT": "int", "SG_UF_NOT": "string"}
+
+
+class DtypeSchema():
+
+    def __init__(self, path):
+        """
+        Type of each SRAG column, inferred from the first chunk of the first file that has it
+        and saved, so every chunk and every file is converted with the same types.
+        A column with values that do not fit its type is widened to 'string'. Only the files
+        converted with the old type of that column must be converted again (see `column_types`).
+        :param path: JSON file where the types are saved.
+        """
+        self.path = path
+        self.types = dict()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                saved = json.load(f)
+            # The first schemas saved only have the types
+            self.types = saved["types"] if "types" in saved else saved
+
+    def update(self, chunk):
+        """
+        Infers the type of the columns of a chunk that are not in the schema yet.
+        :return: Names of the new columns.
+        """
+        new_columns = [column for column in chunk.columns if column not in self.types]
+        for column in new_columns:
+            self.types[column] = PARTITION_TYPES.get(column) or infer_column_type(chunk[column].dropna())
+        return new_columns
+
+    def widen(self, columns):
+        """
+        Changes the type of columns with values that do not fit it to 'string'.
+        """
+        for column in columns:
+            self.types[column] = "string"
+        self.save()
+
+    def column_types(self, columns):
+        """
+        :return: Types of the given columns, saved with a converted file to know if any of them was widened since.
+        """
+        return {column: self.types.get(column) for column in columns}
+
+    def arrow_schema(self, columns):
+        return pa.schema([(column, ARROW_TYPES[self.types[column].split(":")[0]]) for column in columns])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", 'w') as f:
+            json.dump({"types": self.types}, f, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def convert_chunk(chunk, dtype_schema, schema, invalid_values):
+    """
+    Converts the text columns of a chunk to the types of the schema, with Arrow compute functions.
+    Values that do not fit the type are counted in `invalid_values` (and converted to null).
+    :return: Typed Arrow table.
+    """
+    text_table = pa.Table.from_pandas(chunk, preserve_index=False)
+    typed_columns = []
+    for column, field in zip(chunk.columns, schema):
+        values = text_table.column(column).cast(pa.string())
+        column_type, _, date_format = dtype_schema.types[column].partition(":")
+
+        if column_type == "int":
+            valid = pc.match_substring_regex(values, INTEGER_PATTERN.pattern)
+            typed_values = pc.cast(pc.if_else(valid, values, None), pa.int64())
+        elif column_type == "float":
+            values = pc.replace_substring(values, ",", ".")
+            valid = pc.or_(pc.match_substring_regex(values, FLOAT_PATTERN.pattern), pc.match_substring_regex(values, INTEGER_PATTERN.pattern))
+            typed_values = pc.cast(pc.if_else(valid, values, None), pa.float64())
+        elif column_type == "date":
+            typed_values = pc.cast(pc.strptime(values, format=date_format, unit="s", error_is_null=True), pa.date32())
+        else:
+            typed_values = values
+
+        if column_type != "string":
+            invalid_count = typed_values.null_count - values.null_count
+            if invalid_count:
+                invalid_values[column] = invalid_values.get(column, 0) + invalid_count
+        typed_columns.append(typed_values)
+
+    return pa.Table.from_arrays(typed_columns, schema=schema)
+
+
+def write_epiweeks(csv_path, epiweeks_dir, dtype_schema, encoding, chunksize, row_group_size, compression):
+    """
+    Converts the chunks of a CSV with the types of the schema, writing them partitioned by epiweek.
+    :return: Number of rows, number of values that do not fit the type of each column and Arrow schema.
+    """
+    shutil.rmtree(epiweeks_dir, ignore_errors=True)
+    invalid_values = dict()
+    rows = 0
+
+    with pd.read_csv(
+        csv_path, sep=";", encoding=encoding, dtype=str, chunksize=chunksize,
+        keep_default_na=False, na_values=[""], low_memory=False
+    ) as chunks:
+        first_chunk = next(chunks)
+        first_chunk.columns = first_chunk.columns.str.strip()
+        columns = list(first_chunk.columns)
+        if dtype_schema.update(first_chunk):
+            dtype_schema.save()
+        schema = dtype_schema.arrow_schema(columns)
+
+        def typed_batches():
+            nonlocal rows
+            for chunk in chain([first_chunk], chunks):
+                chunk.columns = columns
+                rows += len(chunk)
+                yield from convert_chunk(chunk, dtype_schema, schema, invalid_values).combine_chunks().to_batches()
+
+        ds.write_dataset(
+            typed_batches(), epiweeks_dir, schema=schema, format="parquet",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+            partitioning=ds.partitioning(pa.schema([schema.field("SEM_NOT")]), flavor="hive"),
+            min_rows_per_group=row_group_size, max_open_files=128, existing_data_behavior="overwrite_or_ignore"
+        )
+
+    return rows, invalid_values, schema
+
+
+def convert_to_parquet(csv_path, output_dir, dtype_schema, chunksize=100_000, row_group_size=16_384, compression="zstd", logger=None):
+    """
+    Converts a SRAG CSV to typed Parquet files, partitioned by epiweek (SEM_NOT) and sorted by UF (SG_UF_NOT).
+
+    The CSV is read in chunks, so memory use does not depend on the file size. The chunks are
+    first written partitioned by epiweek, then each epiweek is sorted by UF into a single file,
+    `SEM_NOT=<epiweek>/part-0.parquet`. A directory per UF is not used: it would split
+    each epiweek in 27 files of a few hundred rows, each with the metadata of ~190 columns.
+
+    Values are never lost: if a column has values that do not fit its type, the column
+    is widened to 'string' in the schema and the file is converted again.
+    :param csv_path: Path to the CSV (';' separated, UTF-8 or latin-1).
+    :param output_dir: Directory of the Parquet files. Removed before the conversion.
+    :param dtype_schema: DtypeSchema with the types of the columns.
+    :param chunksize: Rows read at a time.
+    :param row_group_size: Rows of each Parquet row group.
+    :param compression: Parquet compression codec.
+    :return: Paths of the Parquet files, relative to `output_dir`.
+    """
+    logger = logger or logging.getLogger(__name__)
+    encoding = detect_encoding(csv_path)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    epiweeks_dir = os.path.join(output_dir, "_epiweeks")
+
+    while True:
+        rows, invalid_values, schema = write_epiweeks(csv_path, epiweeks_dir, dtype_schema, encoding, chunksize, row_group_size, compression)
+        if not invalid_values:
+            break
+        for column, invalid_count in invalid_values.items():
+            logger.warning(f"{invalid_count} values of column {column} are not '{dtype_schema.types[column]}'. Converting {os.path.basename(csv_path)} again with the column as 'string'.")
+        dtype_schema.widen(invalid_values)
+
+    # Each epiweek is small enough to be sorted by UF in memory. Its row groups then hold contiguous
+    # UFs, so readers filtering by UF skip the others through the row group statistics.
+    file_schema = schema.remove(schema.get_field_index("SEM_NOT"))
+    for epiweek_dir in sorted(os.listdir(epiweeks_dir)):
+        epiweek_table = ds.dataset(os.path.join(epiweeks_dir, epiweek_dir), format="parquet", schema=file_schema).to_table()
+        os.makedirs(os.path.join(output_dir, epiweek_dir))
+        pq.write_table(
+            epiweek_table.sort_by([("SG_UF_NOT", "ascending")]), os.path.join(output_dir, epiweek_dir, "part-0.parquet"),
+            row_group_size=row_group_size, compression=compression
+        )
+    shutil.rmtree(epiweeks_dir)
+
+    logger.info(f"Converted {rows} rows of {os.path.basename(csv_path)} ({encoding}) to Parquet")
+    return sorted(
+        os.path.relpath(os.path.join(root, name), output_dir)
+        for root, _, names in os.walk(output_dir) for name in names
+    )
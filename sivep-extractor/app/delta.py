@@ -0,0 +1,203 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from convert import detect_encoding
+
+KEY_HASH_COLUMN = "_KEY_HASH"
+ROW_HASH_COLUMN = "_ROW_HASH"
+OPERATION_COLUMN = "_OPERATION"
+
+
+def occurrences(keys):
+    """
+    Numbers the repetitions of each key: 0 for its first row, 1 for the second...
+    :param keys: Array of key hashes, in the order of the rows.
+    :return: Array with the occurrence of each row.
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    positions = np.arange(len(keys))
+    run_starts = np.ones(len(keys), dtype=bool)
+    run_starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    first_positions = np.maximum.accumulate(np.where(run_starts, positions, 0))
+
+    occurrence = np.empty(len(keys), dtype=np.int64)
+    occurrence[order] = positions - first_positions
+    return occurrence
+
+
+class KeyCounter():
+
+    def __init__(self):
+        """
+        Counts how many times each key was seen, so repeated keys get distinct fingerprints across chunks.
+        """
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def number(self, keys):
+        """
+        :return: Occurrence of each key, counting the previous chunks.
+        """
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        previous = np.zeros(len(keys), dtype=np.int64)
+        previous[found] = self.counts[positions[found]]
+
+        chunk_keys, chunk_counts = np.unique(keys, return_counts=True)
+        all_keys, inverse = np.unique(np.concatenate([self.keys, chunk_keys]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, chunk_counts]), minlength=len(all_keys)).astype(np.int64)
+        self.keys = all_keys
+
+        return previous + occurrences(keys)
+
+
+def fingerprint_chunk(chunk, key_columns, key_counter):
+    """
+    Fingerprints of the rows of a chunk: a hash of the record key and a hash of all the values.
+    A key repeated in the file is combined with its occurrence, so each row has a distinct key.
+    :return: Arrays with the key hash and the row hash of each row.
+    """
+    keys = pd.util.hash_pandas_object(chunk[key_columns], index=False).to_numpy()
+    occurrence = key_counter.number(keys)
+    repeated = occurrence > 0
+    if repeated.any():
+        keys = keys.copy()
+        keys[repeated] = pd.util.hash_array(keys[repeated] ^ occurrence[repeated].astype(np.uint64))
+
+    # Sorted, so a release with the columns in another order has the same fingerprints
+    rows = pd.util.hash_pandas_object(chunk[sorted(chunk.columns)], index=False).to_numpy()
+    return keys, rows
+
+
+class RowIndex():
+
+    def __init__(self, path, key_columns):
+        """
+        Fingerprints (record key -> hash of the values) of the rows of the last release of a SRAG file.
+        The next release is compared with it to extract the inserted, updated and deleted rows.
+
+        The index is only replaced by `commit`, after the delta is uploaded: if a delta
+        is lost, the next one is extracted from the same index and includes its changes.
+        :param path: Parquet file of the index.
+        :param key_columns: Columns that identify a record (e.g. NU_NOTIFIC).
+        """
+        self.path = path
+        self.new_path = f"{path}.new"
+        self.key_columns = key_columns
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """
+        :return: Previous fingerprints, sorted by key hash.
+        """
+        table = pq.read_table(self.path)
+        return table.to_pandas().sort_values(KEY_HASH_COLUMN, kind="stable", ignore_index=True)
+
+    def delta(self, csv_path, delta_path, chunksize=100_000, logger=None):
+        """
+        Streams a release through the index, writing its changed rows to a delta CSV.
+
+        The delta has the columns of the release and an `_OPERATION` column: 'I' for
+        new rows, 'U' for rows with a key of the previous release and other values (with
+        the new values) and 'D' for keys that are not in the release (only the key is filled).
+        Without a previous index, only the new index is written.
+        :param csv_path: Path to the release CSV (';' separated, UTF-8 or latin-1).
+        :param delta_path: Path of the delta CSV (';' separated, UTF-8).
+        :param chunksize: Rows read at a time.
+        :return: Summary with the counts of rows, or None without a previous index.
+        """
+        logger = logger or logging.getLogger(__name__)
+        previous = self.load() if self.exists() else None
+        if previous is not None:
+            previous_keys = previous[KEY_HASH_COLUMN].to_numpy()
+            previous_rows = previous[ROW_HASH_COLUMN].to_numpy()
+
+        key_counter = KeyCounter()
+        index_chunks = []
+        inserts, updates, rows = 0, 0, 0
+        columns = None
+        write_header = True
+
+        with pd.read_csv(
+            csv_path, sep=";", encoding=detect_encoding(csv_path), dtype=str,
+            chunksize=chunksize, na_filter=False, low_memory=False
+        ) as chunks:
+            for chunk in chunks:
+                chunk.columns = chunk.columns.str.strip()
+                if columns is None:
+                    columns = list(chunk.columns)
+                    missing_columns = [column for column in self.key_columns if column not in columns]
+                    if missing_columns:
+                        raise ValueError(f"Key columns {missing_columns} are not in {os.path.basename(csv_path)}")
+
+                keys, row_hashes = fingerprint_chunk(chunk, self.key_columns, key_counter)
+                rows += len(chunk)
+                index_chunk = chunk[self.key_columns].copy()
+                index_chunk[KEY_HASH_COLUMN] = keys
+                index_chunk[ROW_HASH_COLUMN] = row_hashes
+                index_chunks.append(index_chunk)
+
+                if previous is None:
+                    continue
+
+                positions = np.searchsorted(previous_keys, keys)
+                found = positions < len(previous_keys)
+                found[found] = previous_keys[positions[found]] == keys[found]
+                changed = np.zeros(len(keys), dtype=bool)
+                changed[found] = previous_rows[positions[found]] != row_hashes[found]
+
+                operations = np.where(~found, "I", np.where(changed, "U", ""))
+                inserts += int((~found).sum())
+                updates += int(changed.sum())
+
+                delta_chunk = chunk[operations != ""]
+                delta_chunk.insert(0, OPERATION_COLUMN, operations[operations != ""])
+                delta_chunk.to_csv(delta_path, sep=";", index=False, mode="w" if write_header else "a", header=write_header)
+                write_header = False
+
+        if columns is None:
+            raise ValueError(f"{os.path.basename(csv_path)} is empty")
+
+        new_index = pd.concat(index_chunks, ignore_index=True)
+        repeated_keys = int((key_counter.counts - 1).sum())
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(new_index, preserve_index=False), self.new_path, compression="zstd")
+
+        if repeated_keys:
+            logger.warning(f"{repeated_keys} rows of {os.path.basename(csv_path)} repeat the key {self.key_columns}. They are matched by their order.")
+
+        if previous is None:
+            return None
+
+        deleted = previous[~np.isin(previous_keys, new_index[KEY_HASH_COLUMN].to_numpy())]
+        deletes = pd.DataFrame({column: deleted[column] if column in self.key_columns else "" for column in columns})
+        deletes.insert(0, OPERATION_COLUMN, "D")
+        deletes.to_csv(delta_path, sep=";", index=False, mode="a", header=False)
+
+        return {
+            "rows": rows,
+            "previous_rows": len(previous),
+            "inserts": inserts,
+            "updates": updates,
+            "deletes": len(deletes),
+            "unchanged": rows - inserts - updates,
+        }
+
+    def commit(self):
+        """
+        Replaces the index by the one of the last release, after its delta is uploaded.
+        """
+        os.replace(self.new_path, self.path)
+
+    def discard(self):
+        if os.path.exists(self.new_path):
+            os.remove(self.new_path)
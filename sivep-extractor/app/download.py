@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from validators import response_validators, is_unchanged, conditional_headers
+
+
+class DownloadError(Exception):
+    pass
+
+
+class CSVDownload():
+
+    def __init__(self, url, chunk_size=1024 * 1024, timeout=(10, 120)):
+        """
+        Streams a CSV file from the given URL, chunk by chunk, counting the bytes downloaded.
+        Only one chunk is kept in memory at a time, whatever the size of the file.
+        :param url: URL of the CSV file.
+        :param chunk_size: Bytes read from the connection at a time.
+        :param timeout: Connect and read timeouts, in seconds. The read timeout applies to each chunk.
+        """
+        self.url = url
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.bytes_downloaded = 0
+        self.start = None
+        self.validators = None
+
+    def is_unchanged(self, saved_validators):
+        """
+        Checks if the file changed since its validators were saved, without downloading it.
+        Uses a HEAD request or, when the server does not answer HEAD, a conditional GET.
+        :param saved_validators: Validators of the last download, or None.
+        :return: True if the file did not change.
+        """
+        if not saved_validators:
+            return False
+
+        response = requests.head(self.url, allow_redirects=True, timeout=self.timeout)
+        if response.ok:
+            self.validators = response_validators(response.headers)
+            return is_unchanged(saved_validators, self.validators)
+
+        # The body is not read: the connection is closed as soon as the headers arrive
+        with requests.get(self.url, headers=conditional_headers(saved_validators), stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                return True
+            response.raise_for_status()
+            self.validators = response_validators(response.headers)
+            return is_unchanged(saved_validators, self.validators)
+
+    def open(self):
+        """
+        Starts the download. Called again by each upload attempt, so it restarts from the beginning.
+        :return: Iterator over the chunks of the file.
+        """
+        response = requests.get(self.url, stream=True, timeout=self.timeout)
+        response.raise_for_status()
+
+        self.validators = response_validators(response.headers)
+        self.bytes_downloaded = 0
+        self.start = time.monotonic()
+        return self.iter_chunks(response)
+
+    def iter_chunks(self, response):
+        with response:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                self.bytes_downloaded += len(chunk)
+                yield chunk
+
+    def throughput(self):
+        """
+        :return: Megabytes downloaded and streamed per second since the last download started.
+        """
+        elapsed = time.monotonic() - self.start
+        return self.bytes_downloaded / 1024 / 1024 / max(elapsed, 1e-9)
+
+
+class RangeDownload():
+
+    def __init__(
+            self,
+            url,
+            download_dir,
+            range_size=16 * 1024 * 1024,
+            workers=4,
+            chunk_size=1024 * 1024,
+            timeout=(10, 120),
+            max_retries=3,
+            backoff_factor=1.0
+        ):
+        """
+        Downloads a large file to disk in byte ranges, fetched in parallel by a pool of threads.
+
+        The ranges already written are listed in `<file>.part.ranges`, so an interrupted
+        download resumes from the partial file, unless the file changed in the server
+        (the size and validators are kept in `<file>.part.json`). Servers without range
+        support are downloaded in a single stream. The file is only complete when its
+        size matches the Content-Length.
+        :param url: URL of the file.
+        :param download_dir: Directory of the partial and complete files (in the data volume).
+        :param range_size: Bytes of each range request.
+        :param workers: Ranges downloaded at the same time.
+        :param chunk_size: Bytes read from the connection at a time.
+        :param timeout: Connect and read timeouts, in seconds.
+        :param max_retries: Retries of each range (or of the single stream).
+        :param backoff_factor: Base of the exponential backoff between retries, in seconds.
+        """
+        self.url = url
+        self.range_size = range_size
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        self.path = os.path.join(download_dir, url.split('/')[-1])
+        self.part_path = f"{self.path}.part"
+        self.state_path = f"{self.path}.part.json"
+        self.ranges_path = f"{self.path}.part.ranges"
+        os.makedirs(download_dir, exist_ok=True)
+
+        self.size = None
+        self.ranges_supported = False
+        self.validators = None
+        self.bytes_downloaded = 0
+        self.elapsed = 0
+        self.lock = threading.Lock()
+
+    def probe(self):
+        """
+        Gets the size, the validators and the range support of the file, with a HEAD request
+        or, when the server does not answer HEAD, a GET of its first byte.
+        """
+        response = requests.head(self.url, allow_redirects=True, timeout=self.timeout)
+        if response.ok:
+            self.validators = response_validators(response.headers)
+            self.size = self.validators["content_length"]
+            self.ranges_supported = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            return
+
+        with requests.get(self.url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            self.validators = response_validators(response.headers)
+            content_range = response.headers.get("Content-Range", "")
+            self.ranges_supported = response.status_code == 206 and content_range.startswith("bytes ")
+            if self.ranges_supported:
+                self.size = int(content_range.split("/")[-1])
+                self.validators["content_length"] = self.size
+            else:
+                self.size = self.validators["content_length"]
+
+    def has_partial(self):
+        return os.path.exists(self.state_path)
+
+    def load_state(self):
+        # Only resumes the partial file of the same version of the file
+        state = {"url": self.url, "validators": self.validators, "range_size": self.range_size, "complete": False}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                saved_state = json.load(f)
+            if (
+                saved_state["url"] == self.url and saved_state["range_size"] == self.range_size
+                and is_unchanged(saved_state["validators"], self.validators)
+            ):
+                return saved_state
+
+        self.remove()
+        return state
+
+    def save_state(self, state):
+        with open(f"{self.state_path}.tmp", 'w') as f:
+            json.dump(state, f)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    def download(self):
+        """
+        Downloads the file, resuming the partial file of a previous run.
+        :return: Path of the complete file.
+        """
+        if self.size is None and not self.validators:
+            self.probe()
+
+        state = self.load_state()
+        if state["complete"] and os.path.exists(self.path):
+            return self.path
+
+        self.save_state(state)
+        start = time.monotonic()
+        if self.ranges_supported and self.size:
+            self.download_ranges()
+        else:
+            self.download_single_stream()
+        self.elapsed = time.monotonic() - start
+
+        if self.size is not None and os.path.getsize(self.part_path) != self.size:
+            raise DownloadError(f"Downloaded {os.path.getsize(self.part_path)} of {self.size} bytes of {self.url}")
+
+        os.replace(self.part_path, self.path)
+        state["complete"] = True
+        self.save_state(state)
+        if os.path.exists(self.ranges_path):
+            os.remove(self.ranges_path)
+        return self.path
+
+    def download_ranges(self):
+        done_ranges = set()
+        if os.path.exists(self.ranges_path):
+            with open(self.ranges_path, 'r') as f:
+                done_ranges = {int(line) for line in f.read().split()}
+
+        # The partial file has the final size from the start, each range is written at its offset
+        with open(self.part_path, 'ab') as f:
+            f.truncate(self.size)
+
+        pending_ranges = [
+            (index, start, min(start + self.range_size, self.size) - 1)
+            for index, start in enumerate(range(0, self.size, self.range_size)) if index not in done_ranges
+        ]
+
+        fd = os.open(self.part_path, os.O_WRONLY)
+        try:
+            with ThreadPoolExecutor(self.workers) as executor:
+                results = list(executor.map(lambda byte_range: self.fetch_range(fd, *byte_range), pending_ranges))
+        finally:
+            os.close(fd)
+
+        failed_ranges = results.count(False)
+        if failed_ranges:
+            raise DownloadError(f"{failed_ranges} of {len(pending_ranges)} ranges of {self.url} failed. The download resumes in the next run.")
+
+    def fetch_range(self, fd, index, start, end):
+        headers = {"Range": f"bytes={start}-{end}"}
+        # The server sends the whole file instead of the range if the file changed
+        if_range = self.validators["etag"] or self.validators["last_modified"]
+        if if_range:
+            headers["If-Range"] = if_range
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(random.uniform(0, self.backoff_factor * 2 ** attempt))
+
+            offset = start
+            try:
+                with requests.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise DownloadError(f"HTTP {response.status_code} for range {start}-{end}")
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        chunk = chunk[:end + 1 - offset]
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+                        with self.lock:
+                            self.bytes_downloaded += len(chunk)
+            except (requests.exceptions.RequestException, DownloadError):
+                continue
+
+            if offset == end + 1:
+                with self.lock:
+                    with open(self.ranges_path, 'a') as f:
+                        f.write(f"{index}\n")
+                return True
+
+        return False
+
+    def download_single_stream(self):
+        # Without range support an interrupted download starts again from the beginning
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(random.uniform(0, self.backoff_factor * 2 ** attempt))
+
+            try:
+                with requests.get(self.url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    with open(self.part_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            f.write(chunk)
+                            self.bytes_downloaded += len(chunk)
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+
+            if self.size is None or os.path.getsize(self.part_path) == self.size:
+                return
+            error = f"Downloaded {os.path.getsize(self.part_path)} of {self.size} bytes"
+
+        raise DownloadError(f"Unable to download {self.url} after {self.max_retries + 1} attempts. {error}")
+
+    def open_file(self):
+        """
+        :return: Iterator over the chunks of the complete file, to be uploaded.
+        """
+        def iter_chunks():
+            with open(self.path, 'rb') as f:
+                while chunk := f.read(self.chunk_size):
+                    yield chunk
+        return iter_chunks()
+
+    def remove(self):
+        """
+        Removes the partial or complete file and its state, e.g. after the file is uploaded.
+        """
+        for path in (self.path, self.part_path, self.state_path, self.ranges_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def throughput(self):
+        """
+        :return: Megabytes downloaded per second.
+        """
+        return self.bytes_downloaded / 1024 / 1024 / max(self.elapsed, 1e-9)
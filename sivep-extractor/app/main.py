@@ -2,12 +2,19 @@ import requests
 from bs4 import BeautifulSoup
 
 import os
-import io
+import json
+import shutil
+import asyncio
+from io import BytesIO
 
 # Save and handle logs
 import logging
 import requests
-from log import ManagerInterface
+from log import ManagerInterface, AsyncManagerInterface
+from validators import ValidatorStore
+from download import CSVDownload, RangeDownload, DownloadError
+from convert import DtypeSchema, convert_to_parquet, read_columns
+from delta import RowIndex
 
 from datetime import datetime
 
@@ -34,23 +41,122 @@ def extract_csv_public_links(html):
     hrefs = [ href for href in hrefs if href.endswith('.csv') ]
     return hrefs
 
-def download_csv(url):
+def upload_parquet(manager_interface, csv_path, file_name, data_dir, dtype_schema, chunksize):
     """
-    Downloads a CSV file from the given URL and returns its content as a BytesIO object.
-    :param url: URL of the CSV file.
-    :return: BytesIO object containing the CSV data.
+    Converts a downloaded SRAG CSV to typed Parquet files and uploads them,
+    as `<file name without .csv>/SEM_NOT=<epiweek>/part-0.parquet`.
+    :param csv_path: Path of the downloaded CSV.
+    :param file_name: Name of the CSV file in DATASUS.
+    :param data_dir: Directory of the Parquet files while they are uploaded.
+    :param dtype_schema: DtypeSchema shared by all the files.
+    :param chunksize: Rows of the CSV converted at a time.
+    :return: True if all the Parquet files were uploaded.
     """
+    logger = manager_interface.logger
+    stem = os.path.splitext(file_name)[0]
+    output_dir = os.path.join(data_dir, "parquet", stem)
+
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        logging.info(f"Successfully downloaded CSV from {url}")
-        return io.BytesIO(response.content)  # Convert to a file-like object
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error downloading CSV: {e}")
-        return None
-    
+        parquet_files = convert_to_parquet(csv_path, output_dir, dtype_schema, chunksize=chunksize, logger=logger)
+    except Exception as e:
+        logger.error(f"Unable to convert file {file_name} to Parquet. {e}")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return False
+
+    # A file per epiweek, uploaded a few at a time
+    file_contents = [open(os.path.join(output_dir, parquet_file), 'rb') for parquet_file in parquet_files]
+    try:
+        results = asyncio.run(AsyncManagerInterface(manager_interface).upload_many([
+            {
+                "organization": "SIVEP",
+                "project": "respat",
+                "file_content": file_content,
+                "file_name": f"{stem}/{parquet_file}"
+            }
+            for parquet_file, file_content in zip(parquet_files, file_contents)
+        ]))
+    finally:
+        for file_content in file_contents:
+            file_content.close()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    uploaded = sum(result["uploaded"] for result in results)
+    logger.info(f"Uploaded {uploaded} of {len(parquet_files)} Parquet files of {file_name}")
+    return uploaded == len(parquet_files)
+
+def upload_delta(manager_interface, csv_path, file_name, data_dir, key_columns, chunksize):
+    """
+    Extracts the rows inserted, updated and deleted since the last release of a SRAG file and uploads
+    them as `delta/<file name without .csv>_<date and time>.csv`, with a JSON summary of the counts.
+    The first release of a file only creates its fingerprint index.
+    :param csv_path: Path of the downloaded CSV.
+    :param file_name: Name of the CSV file in DATASUS.
+    :param data_dir: Directory of the fingerprint indexes and of the delta while it is uploaded.
+    :param key_columns: Columns that identify a record.
+    :param chunksize: Rows of the CSV compared at a time.
+    :return: True if the delta was uploaded, or there was no previous release to compare.
+    """
+    logger = manager_interface.logger
+    stem = os.path.splitext(file_name)[0]
+    delta_name = f"{stem}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    delta_path = os.path.join(data_dir, "delta", f"{delta_name}.csv")
+    os.makedirs(os.path.dirname(delta_path), exist_ok=True)
+    row_index = RowIndex(os.path.join(data_dir, "index", f"{stem}.parquet"), key_columns)
+
+    try:
+        summary = row_index.delta(csv_path, delta_path, chunksize=chunksize, logger=logger)
+    except Exception as e:
+        logger.error(f"Unable to extract the delta of file {file_name}. {e}")
+        row_index.discard()
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+        return False
+
+    if summary is None:
+        logger.info(f"No previous release of file {file_name}: fingerprint index created, the next releases are uploaded as deltas")
+        row_index.commit()
+        return True
+
+    logger.info(
+        f"Delta of file {file_name}: {summary['inserts']} inserts, {summary['updates']} updates, {summary['deletes']} deletes. "
+        f"{summary['unchanged']} of {summary['rows']} rows unchanged ({os.path.getsize(delta_path) / 1024 / 1024:.1f} MB)"
+    )
+    summary = {"file_name": file_name, "delta_file_name": f"delta/{delta_name}.csv", "key_columns": key_columns, **summary}
+
+    with open(delta_path, 'rb') as delta_content:
+        uploaded = manager_interface.upload_file("SIVEP", "respat", delta_content, f"delta/{delta_name}.csv")
+    os.remove(delta_path)
+    uploaded = uploaded and manager_interface.upload_file(
+        "SIVEP", "respat", BytesIO(json.dumps(summary, indent=2).encode()), f"delta/{delta_name}.json"
+    )
+
+    # Without the upload, the next delta is extracted from the same index, and includes these changes
+    if uploaded:
+        row_index.commit()
+    else:
+        row_index.discard()
+    return uploaded
+
 if __name__ == "__main__":
-    datasus_url = 'https://opendatasus.saude.gov.br/dataset/srag-2021-a-2024'
+    datasus_url = os.getenv("SIVEP_DATASUS_URL", 'https://opendatasus.saude.gov.br/dataset/srag-2021-a-2024')
+    CHUNK_SIZE  = int(os.getenv("SIVEP_DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+    DATA_DIR    = os.getenv("SIVEP_DATA_DIR", "/data")
+
+    # Files from RANGE_MIN_SIZE bytes are downloaded to the data volume in parallel ranges, and resumed if interrupted
+    RANGE_MIN_SIZE = int(os.getenv("SIVEP_RANGE_MIN_SIZE", 64 * 1024 * 1024))
+    RANGE_SIZE     = int(os.getenv("SIVEP_RANGE_SIZE", 16 * 1024 * 1024))
+    RANGE_WORKERS  = int(os.getenv("SIVEP_RANGE_WORKERS", 4))
+
+    # 'csv', 'parquet' (typed, partitioned by epiweek) or 'both'. Parquet files are converted from the downloaded CSV.
+    OUTPUT_FORMAT     = os.getenv("SIVEP_OUTPUT_FORMAT", "csv")
+    PARQUET_CHUNKSIZE = int(os.getenv("SIVEP_PARQUET_CHUNKSIZE", 100_000))
+    upload_csv           = OUTPUT_FORMAT in ("csv", "both")
+    upload_parquet_files = OUTPUT_FORMAT in ("parquet", "both")
+
+    # Upload the rows changed since the previous release of each file, besides the output format
+    DELTA           = os.getenv("SIVEP_DELTA", "false").lower() == "true"
+    DELTA_KEY       = [column.strip() for column in os.getenv("SIVEP_DELTA_KEY", "NU_NOTIFIC").split(",")]
+    DELTA_CHUNKSIZE = int(os.getenv("SIVEP_DELTA_CHUNKSIZE", 100_000))
 
     API_ENPOINT = os.getenv("MANAGER_ENDPOINT")
     APP_NAME    = 'sivep'
@@ -85,32 +191,120 @@ if __name__ == "__main__":
 
     logger.info(f"Found {len(csv_links)} files.")
 
+    # Types of the Parquet columns. When a column is widened, only the files that have it are converted again.
+    dtype_schema = DtypeSchema(os.path.join(DATA_DIR, "schema", "srag_dtypes.json"))
+
+    def output_settings(columns=()):
+        return {
+            "output_format": OUTPUT_FORMAT,
+            "delta_key": DELTA_KEY if DELTA else None,
+            "column_types": dtype_schema.column_types(columns) if upload_parquet_files else None,
+        }
+
+    # ETag / Last-Modified / Content-Length of the files uploaded, so the files that did not change are skipped.
+    # Files uploaded with other output settings (e.g. before the Parquet output or the delta were enabled) are processed again.
+    validator_store = ValidatorStore(
+        os.path.join(DATA_DIR, "validators.json"),
+        legacy_settings={"output_format": "csv", "delta_key": None, "column_types": None}
+    )
+    unchanged_files, bytes_saved = 0, 0
+
     was_able_to_download_at_least_one_file = False
     for link in csv_links:
         
-        logger.info(f"Saving file - {link}")
-        file_content = download_csv(link)
         filename = link.split('/')[-1]
+        csv_download = CSVDownload(link, chunk_size=CHUNK_SIZE)
+
+        # Compared with the current types of the columns the file had when it was converted
+        saved_columns = (validator_store.settings(link) or {}).get("column_types") or ()
+        saved_validators = validator_store.get(link, output_settings(saved_columns))
+        if saved_validators is None and validator_store.get(link) is not None:
+            logger.info(f"Output settings changed since the last upload of file {filename}. Processing it again.")
 
-        if not file_content:
-            logger.error(f"Unable to retrieve file - {link}")
+        try:
+            file_unchanged = csv_download.is_unchanged(saved_validators)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Unable to check if file {filename} changed. Downloading it. {e}")
+            file_unchanged = False
+
+        if file_unchanged:
+            logger.info(f"Skipping file {filename}: not changed since the last upload")
+            unchanged_files += 1
+            bytes_saved += saved_validators["content_length"] or 0
+            was_able_to_download_at_least_one_file = True
             continue
-        
-        manager_interface.upload_file(
-            organization="SIVEP",
-            project="respat",
-            file_content=file_content,
-            file_name=filename
+
+        logger.info(f"Saving file - {link}")
+
+        range_download = RangeDownload(
+            link, os.path.join(DATA_DIR, "downloads"),
+            range_size=RANGE_SIZE, workers=RANGE_WORKERS, chunk_size=CHUNK_SIZE
         )
+        try:
+            range_download.probe()
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Unable to get the size of file {filename}. {e}")
+
+        # Large files, and the ones left halfway by a previous run, are downloaded to disk first, so a
+        # dropped connection only loses a range. The others are piped into the upload, never fully in memory.
+        # The Parquet conversion and the delta read the file from disk.
+        download_to_disk = upload_parquet_files or DELTA or range_download.has_partial() or (range_download.size or 0) >= RANGE_MIN_SIZE
+        if download_to_disk:
+            try:
+                range_download.download()
+            except (DownloadError, requests.exceptions.RequestException) as e:
+                logger.error(f"Unable to download file {filename}. {e}")
+                continue
+
+            logger.info(
+                f"Downloaded file {filename} ({range_download.bytes_downloaded / 1024 / 1024:.1f} MB, "
+                f"{range_download.throughput():.1f} MB/s, {'ranges' if range_download.ranges_supported else 'single stream'})"
+            )
+            open_stream = range_download.open_file
+        else:
+            open_stream = csv_download.open
+
+        file_uploaded = True
+        if upload_csv:
+            file_uploaded = manager_interface.upload_stream(
+                organization="SIVEP",
+                project="respat",
+                open_stream=open_stream,
+                file_name=filename
+            )
+
+        if file_uploaded and upload_parquet_files:
+            file_uploaded = upload_parquet(manager_interface, range_download.path, filename, DATA_DIR, dtype_schema, PARQUET_CHUNKSIZE)
+
+        if file_uploaded and DELTA:
+            file_uploaded = upload_delta(manager_interface, range_download.path, filename, DATA_DIR, DELTA_KEY, DELTA_CHUNKSIZE)
+
+        if not file_uploaded:
+            # A file downloaded to disk is kept, and uploaded by the next run
+            logger.error(f"Unable to save file - {filename}")
+            continue
 
-        logger.info(f"Successfully saved file {filename}")
+        if download_to_disk:
+            logger.info(f"Successfully saved file {filename}")
+            columns = read_columns(range_download.path) if upload_parquet_files else ()
+            validator_store.set(link, range_download.validators, output_settings(columns))
+            range_download.remove()
+        else:
+            logger.info(
+                f"Successfully saved file {filename} "
+                f"({csv_download.bytes_downloaded / 1024 / 1024:.1f} MB, {csv_download.throughput():.1f} MB/s)"
+            )
+            validator_store.set(link, csv_download.validators, output_settings())
         was_able_to_download_at_least_one_file = True
 
     if not was_able_to_download_at_least_one_file:
         logger.critical(f"Unable to retrieve any files from DATASUS")
         exit(1)
 
-    logger.info("Finished extracting all data")
+    logger.info(
+        f"Finished extracting all data. {unchanged_files} of {len(csv_links)} files unchanged: "
+        f"{bytes_saved / 1024 / 1024:.1f} MB not downloaded nor uploaded"
+    )
 
     manager_interface.close_session()
 
@@ -0,0 +1,100 @@
+import os
+import json
+
+
+def response_validators(headers):
+    """
+    Extracts the validators of a file from the headers of a HEAD or GET response.
+    :param headers: Response headers.
+    :return: Dict with the ETag, Last-Modified and Content-Length (None when missing).
+    """
+    content_length = headers.get("Content-Length")
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "content_length": int(content_length) if content_length and content_length.isdigit() else None,
+    }
+
+
+def is_unchanged(saved, current):
+    """
+    Compares the validators saved in the last download of a file with the current ones.
+    The ETag is used when both have it, otherwise the Last-Modified date. A different size always means a change.
+    :return: True if the file did not change.
+    """
+    if not saved or not current:
+        return False
+
+    if saved["content_length"] is not None and current["content_length"] is not None:
+        if saved["content_length"] != current["content_length"]:
+            return False
+
+    if saved["etag"] and current["etag"]:
+        return saved["etag"] == current["etag"]
+    if saved["last_modified"] and current["last_modified"]:
+        return saved["last_modified"] == current["last_modified"]
+
+    # Without validators, the file is always downloaded
+    return False
+
+
+def conditional_headers(saved):
+    """
+    :return: If-None-Match / If-Modified-Since headers for a conditional GET of a file.
+    """
+    headers = dict()
+    if saved and saved["etag"]:
+        headers["If-None-Match"] = saved["etag"]
+    if saved and saved["last_modified"]:
+        headers["If-Modified-Since"] = saved["last_modified"]
+    return headers
+
+
+class ValidatorStore():
+
+    def __init__(self, path, legacy_settings=None):
+        """
+        Validators of each file URL, saved after the file is uploaded, so the next runs skip it while it does not change.
+        The output settings of the upload are saved with them: a file uploaded with other settings is processed again.
+        :param path: JSON file where the validators are saved.
+        :param legacy_settings: Settings of the files saved before the settings were saved with the validators.
+        """
+        self.path = path
+        self.legacy_settings = legacy_settings
+        self.validators = dict()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.validators = json.load(f)
+
+    def get(self, url, settings=None):
+        """
+        :param settings: Output settings of this run. If given, validators saved with other settings are not returned.
+        :return: Validators saved in the last upload of the file, or None.
+        """
+        saved = self.validators.get(url)
+        if saved is None:
+            return None
+        if "validators" not in saved:
+            saved = {"validators": saved, "settings": self.legacy_settings}
+        if settings is not None and saved["settings"] != settings:
+            return None
+        return saved["validators"]
+
+    def settings(self, url):
+        """
+        :return: Output settings of the last upload of the file, or None.
+        """
+        saved = self.validators.get(url)
+        if saved is None:
+            return None
+        return saved["settings"] if "validators" in saved else self.legacy_settings
+
+    def set(self, url, validators, settings=None):
+        self.validators[url] = {"validators": validators, "settings": settings}
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", 'w') as f:
+            json.dump(self.validators, f, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
@@ -0,0 +1,122 @@
+"""Benchmark of the SRAG CSV to Parquet conversion: file size and load time of both formats.
+
+Generates a synthetic SRAG CSV with the shape of the DATASUS files (~190 columns,
+';' separated, latin-1), converts it with convert_to_parquet and compares:
+
+- the size of the CSV and of the Parquet files;
+- the conversion time;
+- the time to load the whole file (read_csv vs read_parquet);
+- the time to load a single epiweek of a single UF, the usual downstream query.
+
+Usage: python bench_parquet.py [rows] (default 200000)
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from convert import DtypeSchema, convert_to_parquet
+
+UFS = ["AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS", "MT", "PA", "PB", "PE",
+       "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC", "SE", "SP", "TO"]
+MUNICIPIOS = ["SAO PAULO", "RIO DE JANEIRO", "BELO HORIZONTE", "SÃO LUÍS", "GOIÂNIA", "MACEIÓ", "BRASÍLIA", "VITÓRIA"]
+
+# Columns of the SRAG files, by kind. The symptom, risk factor and test result flags
+# (1 = yes, 2 = no, 9 = unknown) are most of the ~190 columns.
+DATE_COLUMNS = ["DT_NOTIFIC", "DT_SIN_PRI", "DT_NASC", "DT_INTERNA", "DT_ENTUTI", "DT_SAIDUTI",
+                "DT_COLETA", "DT_PCR", "DT_EVOLUCA", "DT_ENCERRA", "DT_DIGITA", "DT_VGM"]
+TEXT_COLUMNS = ["ID_REGIONA", "ID_MUNICIP", "ID_UNIDADE", "ID_RG_RESI", "ID_MN_RESI", "OUTRO_DES",
+                "MORB_DESC", "DS_PCR_OUT", "DS_AN_OUT", "LAB_PR_COV"]
+CODE_COLUMNS = ["CO_REGIONA", "CO_MUN_NOT", "CO_UNI_NOT", "CO_RG_RESI", "CO_MUN_RES", "CO_PAIS"]
+FLAG_COLUMNS = [f"FLAG_{i:03d}" for i in range(150)]
+
+
+def srag_row(row_id):
+    random.seed(row_id)
+    week = random.randint(1, 52)
+    row = {
+        "NU_NOTIFIC": f"{row_id:012d}",
+        "SEM_NOT": str(week),
+        "SEM_PRI": str(max(week - random.randint(0, 2), 1)),
+        "SG_UF_NOT": random.choice(UFS),
+        "SG_UF": random.choice(UFS),
+        "CS_SEXO": random.choice("MFI"),
+        "NU_IDADE_N": str(random.randint(0, 100)),
+        "TP_IDADE": str(random.randint(1, 3)),
+        "CLASSI_FIN": random.choice(["1", "2", "3", "4", "5", ""]),
+        "EVOLUCAO": random.choice(["1", "2", "3", "9", ""]),
+        "SATURACAO_VALOR": f"{random.uniform(80, 100):.1f}".replace(".", ","),
+    }
+    for column in DATE_COLUMNS:
+        row[column] = f"{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/2024" if random.random() < 0.7 else ""
+    for column in TEXT_COLUMNS:
+        row[column] = random.choice(MUNICIPIOS) if random.random() < 0.6 else ""
+    for column in CODE_COLUMNS:
+        row[column] = str(random.randint(100000, 999999))
+    for column in FLAG_COLUMNS:
+        row[column] = random.choice(["1", "2", "9", ""])
+    return row
+
+
+def write_srag_csv(path, rows):
+    columns = list(srag_row(0).keys())
+    with open(path, "w", encoding="latin-1") as f:
+        f.write(";".join(columns) + "\n")
+        for row_id in range(rows):
+            row = srag_row(row_id)
+            f.write(";".join(row[column] for column in columns) + "\n")
+    return len(columns)
+
+
+def timed(function):
+    start = time.monotonic()
+    result = function()
+    return result, time.monotonic() - start
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.join(work_dir, "INFLUD24.csv")
+        parquet_dir = os.path.join(work_dir, "parquet")
+
+        columns, generate_time = timed(lambda: write_srag_csv(csv_path, rows))
+        print(f"Generated {rows} rows x {columns} columns in {generate_time:.1f}s")
+
+        dtype_schema = DtypeSchema(os.path.join(work_dir, "schema", "srag_dtypes.json"))
+        parquet_files, convert_time = timed(lambda: convert_to_parquet(csv_path, parquet_dir, dtype_schema))
+
+        csv_size, parquet_size = os.path.getsize(csv_path), directory_size(parquet_dir)
+
+        _, csv_load_time = timed(lambda: pd.read_csv(csv_path, sep=";", encoding="latin-1", low_memory=False))
+        _, parquet_load_time = timed(lambda: pd.read_parquet(parquet_dir))
+
+        def csv_filtered():
+            csv = pd.read_csv(csv_path, sep=";", encoding="latin-1", low_memory=False)
+            return csv[(csv["SEM_NOT"] == 10) & (csv["SG_UF_NOT"] == "SP")]
+
+        def parquet_filtered():
+            return pd.read_parquet(parquet_dir, filters=[("SEM_NOT", "=", 10), ("SG_UF_NOT", "=", "SP")])
+
+        csv_rows, csv_filtered_time = timed(csv_filtered)
+        parquet_rows, parquet_filtered_time = timed(parquet_filtered)
+        assert len(csv_rows) == len(parquet_rows)
+
+        print(f"Converted to {len(parquet_files)} Parquet files in {convert_time:.1f}s ({rows / convert_time:,.0f} rows/s)")
+        print()
+        print(f"{'':<28}{'CSV':>12}{'Parquet':>12}{'ratio':>8}")
+        for name, csv_value, parquet_value in [
+            ("Size (MB)", csv_size / 1024 / 1024, parquet_size / 1024 / 1024),
+            ("Full load (s)", csv_load_time, parquet_load_time),
+            ("Epiweek 10 of SP load (s)", csv_filtered_time, parquet_filtered_time),
+        ]:
+            print(f"{name:<28}{csv_value:>12.2f}{parquet_value:>12.2f}{csv_value / parquet_value:>7.1f}x")
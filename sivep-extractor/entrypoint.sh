@@ -5,6 +5,9 @@ python /app/healthcheck/check.py
 
 # Check if the health check passed
 if [ $? -eq 0 ]; then
+  # Cron runs the job with an empty environment: the SIVEP_* settings of the
+  # container (e.g. from the .env file) are added to the crontab. Empty ones keep their defaults.
+  { printenv | grep '^SIVEP_[A-Z0-9_]*=.'; cat /etc/cron.d/sivep-cron-job; } | crontab -
   echo "Sivep Extractor Started - CRON in foreground"
   cron -f
 else
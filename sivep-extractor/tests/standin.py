@@ -0,0 +1,220 @@
+"""Local stand-ins of the DATASUS file server and of the Manager API, used by the tests.
+
+The file server serves a synthetic SRAG CSV of any size, generated on the fly.
+The Manager stand-in parses the uploaded multipart body as it arrives, keeping
+only the size and the SHA-256 of the file content.
+"""
+import json
+import hashlib
+import threading
+from http import HTTPStatus
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CSV_HEADER = b"DT_NOTIFIC;SEM_NOT;SG_UF_NOT;ID_MUNICIP;CS_SEXO;NU_IDADE_N;CLASSI_FIN;EVOLUCAO\n"
+CSV_ROWS = b"".join(
+    f"2024-01-{day % 28 + 1:02d};{day % 52 + 1};SP;SAO PAULO;{'MF'[day % 2]};{day % 90};{day % 5 + 1};{day % 3 + 1}\n".encode()
+    for day in range(1000)
+)
+
+
+def synthetic_csv(size, start=0, end=None, chunk_size=1024 * 1024):
+    """Chunks of the bytes `start` to `end` (inclusive) of a synthetic CSV file with exactly `size` bytes."""
+    content_start = len(CSV_HEADER)
+    block = CSV_ROWS * (chunk_size // len(CSV_ROWS) + 2)
+    end = size - 1 if end is None else end
+
+    position = start
+    while position <= end:
+        if position < content_start:
+            chunk = CSV_HEADER[position:min(content_start, end + 1)]
+        else:
+            # The rows repeat after the header, so any offset can be generated
+            offset = (position - content_start) % len(CSV_ROWS)
+            chunk = block[offset:offset + min(chunk_size, end + 1 - position)]
+        position += len(chunk)
+        yield chunk
+
+
+def start_server(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def iter_body(self, chunk_size=1024 * 1024):
+        # Chunked (streamed uploads) or with Content-Length
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    raise ConnectionResetError("Request body interrupted")
+                length = int(line.strip().split(b";")[0], 16)
+                if length == 0:
+                    self.rfile.readline()
+                    return
+                chunk = self.rfile.read(length)
+                self.rfile.readline()
+                yield chunk
+
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining > 0:
+            chunk = self.rfile.read(min(chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+    def read_json(self):
+        return json.loads(b"".join(self.iter_body()) or b"null")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_file_server(files, head_supported=True, ranges_supported=True, drops=0, drop_after=0):
+    """Serve `files` (name -> size in bytes) as synthetic CSVs.
+
+    Each file has an ETag and a Last-Modified date, which change with its size,
+    and conditional GETs are answered with 304 Not Modified. The connection of
+    the first `drops` downloads is closed after `drop_after` bytes.
+    """
+    state = {"drops": drops, "requests": 0}
+    lock = threading.Lock()
+
+    def validators(name):
+        return f'"{name}-{files[name]}"', f"Mon, 01 Jan 2024 00:00:{files[name] % 60:02d} GMT"
+
+    class FileHandler(JSONHandler):
+
+        def send_file_headers(self, name, status=HTTPStatus.OK, content_length=None, content_range=None):
+            etag, last_modified = validators(name)
+            self.send_response(status)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(files[name] if content_length is None else content_length))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            if ranges_supported:
+                self.send_header("Accept-Ranges", "bytes")
+            if content_range:
+                self.send_header("Content-Range", content_range)
+            self.end_headers()
+
+        def do_HEAD(self):
+            name = urlparse(self.path).path.lstrip("/")
+            if not head_supported or name not in files:
+                self.send_response(HTTPStatus.METHOD_NOT_ALLOWED if name in files else HTTPStatus.NOT_FOUND)
+                self.send_header("Content-Length", "0")
+                return self.end_headers()
+            self.send_file_headers(name)
+
+        def do_GET(self):
+            name = urlparse(self.path).path.lstrip("/")
+            if name not in files:
+                return self.send_json(HTTPStatus.NOT_FOUND, {"detail": "Not Found"})
+
+            if self.headers.get("If-None-Match") == validators(name)[0]:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                return self.end_headers()
+
+            start, end = 0, files[name] - 1
+            byte_range = self.headers.get("Range")
+            if ranges_supported and byte_range and self.headers.get("If-Range", validators(name)[0]) in validators(name):
+                start, end = (int(value) for value in byte_range.split("=")[1].split("-"))
+                end = min(end, files[name] - 1)
+                self.send_file_headers(name, HTTPStatus.PARTIAL_CONTENT, end - start + 1, f"bytes {start}-{end}/{files[name]}")
+            else:
+                self.send_file_headers(name)
+
+            with lock:
+                state["requests"] += 1
+                drop = state["drops"] > 0
+                state["drops"] -= drop
+
+            sent = 0
+            try:
+                for chunk in synthetic_csv(files[name], start, end):
+                    if drop and sent + len(chunk) > drop_after:
+                        self.wfile.write(chunk[:drop_after - sent])
+                        self.close_connection = True
+                        return
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+            except ConnectionError:
+                # The client gave up the download
+                self.close_connection = True
+
+    server, url = start_server(FileHandler)
+    return server, url, state
+
+
+def make_manager_server():
+    """Manager API stand-in. Returns the server, its URL and the list of files uploaded."""
+    uploads = []
+
+    class ManagerHandler(JSONHandler):
+
+        def do_GET(self):
+            if urlparse(self.path).path == "/log":
+                return self.send_json(HTTPStatus.CREATED, {"session_id": "test-session"})
+            self.send_json(HTTPStatus.NOT_FOUND, {"detail": "Not Found"})
+
+        def do_PUT(self):
+            self.send_json(HTTPStatus.OK, self.read_json())
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path == "/log/batch":
+                return self.send_json(HTTPStatus.OK, {"received_count": len(self.read_json())})
+            if path == "/log":
+                return self.send_json(HTTPStatus.OK, self.read_json())
+            if path == "/file":
+                try:
+                    uploads.append(self.read_multipart_file())
+                except ConnectionResetError:
+                    # The client gave up the upload (e.g. the download failed)
+                    self.close_connection = True
+                    return
+                return self.send_json(HTTPStatus.OK, {"filename": uploads[-1]["filename"]})
+            self.send_json(HTTPStatus.NOT_FOUND, {"detail": "Not Found"})
+
+        def read_multipart_file(self):
+            # A single file part: the headers, the content and the closing boundary, which is held back
+            boundary = self.headers["Content-Type"].split("boundary=")[1].encode()
+            closing = b"\r\n--" + boundary + b"--\r\n"
+
+            digest, size, buffer, headers = hashlib.sha256(), 0, b"", None
+            for chunk in self.iter_body():
+                buffer += chunk
+                if headers is None:
+                    if b"\r\n\r\n" not in buffer:
+                        continue
+                    headers, buffer = buffer.split(b"\r\n\r\n", 1)
+                if len(buffer) > len(closing):
+                    content, buffer = buffer[:-len(closing)], buffer[-len(closing):]
+                    digest.update(content)
+                    size += len(content)
+
+            filename = headers.split(b'filename="')[1].split(b'"')[0].decode()
+            return {"filename": filename, "size": size, "sha256": digest.hexdigest(), "complete": buffer == closing}
+
+    server, url = start_server(ManagerHandler)
+    return server, url, uploads
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from convert import DtypeSchema, convert_to_parquet, detect_encoding, infer_column_type, read_columns
+
+CSV_HEADER = "NU_NOTIFIC;DT_NOTIFIC;SEM_NOT;SG_UF_NOT;ID_MUNICIP;CO_MUN_NOT;NU_IDADE_N;SATURACAO_VALOR;CLASSI_FIN\n"
+
+
+def srag_rows(rows, start=0):
+    ufs = ["SP", "RJ", "MA"]
+    municipios = ["SAO PAULO", "RIO DE JANEIRO", "SÃO LUÍS"]
+    for row_id in range(start, start + rows):
+        yield (
+            f"{row_id:08d};{row_id % 28 + 1:02d}/01/2024;{row_id % 3 + 1};{ufs[row_id // 3 % 3]};{municipios[row_id // 3 % 3]};"
+            f"{355030 + row_id % 3};{row_id % 90};{90 + row_id % 10},5;{'' if row_id % 4 == 0 else row_id % 5 + 1}\n"
+        )
+
+
+class TestConvertToParquet(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.work_dir.name, "INFLUD24.csv")
+        self.output_dir = os.path.join(self.work_dir.name, "parquet", "INFLUD24")
+        self.dtype_schema = DtypeSchema(os.path.join(self.work_dir.name, "schema", "srag_dtypes.json"))
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def write_csv(self, rows, encoding="latin-1", extra_rows=()):
+        with open(self.csv_path, "w", encoding=encoding) as f:
+            f.write(CSV_HEADER)
+            f.writelines(srag_rows(rows))
+            f.writelines(extra_rows)
+
+    def convert(self, **options):
+        return convert_to_parquet(self.csv_path, self.output_dir, self.dtype_schema, chunksize=100, **options)
+
+    def test_typed_partitions(self):
+        self.write_csv(1000)
+        files = self.convert()
+
+        self.assertEqual(files, [f"SEM_NOT={week}/part-0.parquet" for week in (1, 2, 3)])
+        table = pd.read_parquet(self.output_dir, dtype_backend="pyarrow")
+        self.assertEqual(len(table), 1000)
+        self.assertEqual(str(table["NU_IDADE_N"].dtype), "int64[pyarrow]")
+        self.assertEqual(str(table["SATURACAO_VALOR"].dtype), "double[pyarrow]")
+        self.assertEqual(str(table["DT_NOTIFIC"].dtype), "date32[day][pyarrow]")
+        # Codes with leading zeros are kept as text
+        self.assertEqual(table.sort_values("NU_NOTIFIC")["NU_NOTIFIC"].iloc[0], "00000000")
+        # Latin-1 text is decoded
+        self.assertIn("SÃO LUÍS", set(table["ID_MUNICIP"]))
+
+        self.assertEqual(table["CLASSI_FIN"].isna().sum(), 250)
+        self.assertAlmostEqual(table["SATURACAO_VALOR"].min(), 90.5)
+
+    def test_epiweek_and_uf_filter(self):
+        self.write_csv(1000)
+        self.convert(row_group_size=50)
+
+        table = pd.read_parquet(self.output_dir, filters=[("SEM_NOT", "=", 2), ("SG_UF_NOT", "=", "RJ")])
+        expected_rows = sum(1 for row_id in range(1000) if row_id % 3 == 1 and row_id // 3 % 3 == 1)
+        self.assertEqual(len(table), expected_rows)
+        self.assertEqual(set(table["SG_UF_NOT"]), {"RJ"})
+
+        # The rows of each epiweek are sorted by UF, so a UF is in a few contiguous row groups
+        metadata = pq.ParquetFile(os.path.join(self.output_dir, "SEM_NOT=2", "part-0.parquet")).metadata
+        uf_column = metadata.schema.names.index("SG_UF_NOT")
+        uf_ranges = [
+            (metadata.row_group(i).column(uf_column).statistics.min, metadata.row_group(i).column(uf_column).statistics.max)
+            for i in range(metadata.num_row_groups)
+        ]
+        self.assertGreater(len(uf_ranges), 1)
+        self.assertEqual(uf_ranges, sorted(uf_ranges))
+
+    def test_schema_is_cached_between_files(self):
+        self.write_csv(1000)
+        self.convert()
+        with open(self.dtype_schema.path) as f:
+            saved_types = json.load(f)["types"]
+        self.assertEqual(saved_types["NU_IDADE_N"], "int")
+        self.assertEqual(saved_types["DT_NOTIFIC"], "date:%d/%m/%Y")
+
+        # The next file is converted with the saved types, even if its first values look different
+        self.write_csv(0, encoding="utf-8", extra_rows=["1;01/02/2024;5;SP;SÃO PAULO;355030;;;\n"])
+        self.convert()
+        table = pd.read_parquet(self.output_dir, dtype_backend="pyarrow")
+        self.assertEqual(str(table["NU_IDADE_N"].dtype), "int64[pyarrow]")
+        self.assertIn("SÃO PAULO", set(table["ID_MUNICIP"]))
+
+    def test_invalid_values_widen_the_column_in_the_same_run(self):
+        self.write_csv(1000, extra_rows=["99999999;01/02/2024;3;SP;SAO PAULO;355030;IGNORADO;91,0;1\n"])
+        with self.assertLogs(level="WARNING") as logs:
+            self.convert()
+        self.assertIn("NU_IDADE_N", logs.output[0])
+
+        # The file is converted again with the column as text, so no value is lost
+        table = pd.read_parquet(self.output_dir, dtype_backend="pyarrow")
+        self.assertEqual(len(table), 1001)
+        self.assertEqual(str(table["NU_IDADE_N"].dtype), "string[pyarrow]")
+        self.assertEqual(table.loc[table["NU_NOTIFIC"] == "99999999", "NU_IDADE_N"].tolist(), ["IGNORADO"])
+        self.assertEqual(table["NU_IDADE_N"].isna().sum(), 0)
+
+        # The other columns keep their types, and the widened type is saved
+        self.assertEqual(str(table["SATURACAO_VALOR"].dtype), "double[pyarrow]")
+        saved_schema = DtypeSchema(self.dtype_schema.path)
+        self.assertEqual(saved_schema.types["NU_IDADE_N"], "string")
+
+    def test_column_types_of_a_file(self):
+        self.write_csv(100)
+        self.convert()
+        column_types = self.dtype_schema.column_types(read_columns(self.csv_path))
+        self.assertEqual(list(column_types), CSV_HEADER.strip().split(";"))
+
+        # Only the files with a widened column have other types than when they were converted
+        self.dtype_schema.widen(["NU_IDADE_N"])
+        self.assertNotEqual(self.dtype_schema.column_types(column_types), column_types)
+        self.assertEqual(self.dtype_schema.column_types(["DT_NOTIFIC", "SEM_NOT"]), {"DT_NOTIFIC": "date:%d/%m/%Y", "SEM_NOT": "int"})
+
+    def test_schema_with_only_the_types(self):
+        os.makedirs(os.path.dirname(self.dtype_schema.path))
+        with open(self.dtype_schema.path, "w") as f:
+            json.dump({"NU_IDADE_N": "int"}, f)
+
+        self.assertEqual(DtypeSchema(self.dtype_schema.path).types, {"NU_IDADE_N": "int"})
+
+    def test_detect_encoding(self):
+        self.write_csv(10, encoding="utf-8")
+        self.assertEqual(detect_encoding(self.csv_path), "utf-8-sig")
+        self.write_csv(10, encoding="latin-1")
+        self.assertEqual(detect_encoding(self.csv_path), "latin-1")
+
+    def test_infer_column_type(self):
+        self.assertEqual(infer_column_type(pd.Series(["1", "20", "-3"])), "int")
+        self.assertEqual(infer_column_type(pd.Series(["01", "20"])), "string")
+        self.assertEqual(infer_column_type(pd.Series(["1,5", "20"])), "float")
+        self.assertEqual(infer_column_type(pd.Series(["2024-01-31"])), "date:%Y-%m-%d")
+        self.assertEqual(infer_column_type(pd.Series(["SP", "RJ"])), "string")
+        self.assertEqual(infer_column_type(pd.Series([], dtype=str)), "string")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from delta import RowIndex, KeyCounter, occurrences
+
+COLUMNS = ["NU_NOTIFIC", "DT_NOTIFIC", "SEM_NOT", "SG_UF_NOT", "ID_MUNICIP", "CLASSI_FIN", "EVOLUCAO"]
+
+
+def srag_release(rows):
+    """Rows of a release, as dicts. The values depend only on the notification number."""
+    municipios = ["SAO PAULO", "RIO DE JANEIRO", "SÃO LUÍS"]
+    return [
+        {
+            "NU_NOTIFIC": f"{row_id:08d}",
+            "DT_NOTIFIC": f"{row_id % 28 + 1:02d}/01/2024",
+            "SEM_NOT": str(row_id % 4 + 1),
+            "SG_UF_NOT": ["SP", "RJ", "MA"][row_id % 3],
+            "ID_MUNICIP": municipios[row_id % 3],
+            "CLASSI_FIN": "" if row_id % 4 == 0 else str(row_id % 5 + 1),
+            "EVOLUCAO": "",
+        }
+        for row_id in rows
+    ]
+
+
+class TestRowIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.work_dir.name, "INFLUD24.csv")
+        self.delta_path = os.path.join(self.work_dir.name, "INFLUD24_delta.csv")
+        self.row_index = RowIndex(os.path.join(self.work_dir.name, "index", "INFLUD24.parquet"), ["NU_NOTIFIC"])
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def write_release(self, rows, columns=COLUMNS, encoding="latin-1"):
+        with open(self.csv_path, "w", encoding=encoding) as f:
+            f.write(";".join(columns) + "\n")
+            for row in rows:
+                f.write(";".join(row[column] for column in columns) + "\n")
+
+    def delta(self, commit=True):
+        # Small chunks, so the rows of a release are compared in several chunks
+        summary = self.row_index.delta(self.csv_path, self.delta_path, chunksize=7)
+        if commit:
+            self.row_index.commit()
+        return summary
+
+    def read_delta(self):
+        return pd.read_csv(self.delta_path, sep=";", dtype=str, keep_default_na=False).set_index("NU_NOTIFIC")
+
+    def test_first_release_only_creates_the_index(self):
+        self.write_release(srag_release(range(100)))
+
+        self.assertIsNone(self.delta())
+        self.assertTrue(self.row_index.exists())
+        self.assertFalse(os.path.exists(self.delta_path))
+
+    def test_inserts_updates_and_deletes(self):
+        self.write_release(srag_release(range(100)))
+        self.delta()
+
+        rows = srag_release(range(10, 120))
+        rows[0]["EVOLUCAO"] = "1"
+        rows[5]["ID_MUNICIP"] = "SÃO PAULO"
+        self.write_release(rows)
+        summary = self.delta()
+
+        self.assertEqual(summary, {"rows": 110, "previous_rows": 100, "inserts": 20, "updates": 2, "deletes": 10, "unchanged": 88})
+        delta = self.read_delta()
+        self.assertEqual(list(delta.columns), ["_OPERATION"] + COLUMNS[1:])
+        self.assertEqual(delta["_OPERATION"].value_counts().to_dict(), {"I": 20, "D": 10, "U": 2})
+
+        # Updates have the new values, deletes only the key
+        self.assertEqual(delta.loc["00000010", "EVOLUCAO"], "1")
+        self.assertEqual(delta.loc["00000015", "ID_MUNICIP"], "SÃO PAULO")
+        self.assertEqual(delta.loc["00000119", "_OPERATION"], "I")
+        self.assertEqual(delta.loc["00000000", "_OPERATION"], "D")
+        self.assertEqual(delta.loc["00000000", "SG_UF_NOT"], "")
+
+    def test_unchanged_release_has_an_empty_delta(self):
+        self.write_release(srag_release(range(100)))
+        self.delta()
+        # Same rows, in another column order and encoding
+        self.write_release(srag_release(range(100)), columns=COLUMNS[::-1], encoding="utf-8")
+        summary = self.delta()
+
+        self.assertEqual(summary["unchanged"], 100)
+        self.assertEqual(len(self.read_delta()), 0)
+
+    def test_delta_not_committed_is_included_in_the_next_one(self):
+        self.write_release(srag_release(range(100)))
+        self.delta()
+
+        self.write_release(srag_release(range(110)))
+        self.delta(commit=False)
+        self.row_index.discard()
+
+        self.write_release(srag_release(range(120)))
+        self.assertEqual(self.delta()["inserts"], 20)
+
+    def test_repeated_keys_are_matched_by_order(self):
+        rows = srag_release(range(20)) + srag_release([5, 5])
+        rows[-1]["EVOLUCAO"] = "2"
+        self.write_release(rows)
+        self.delta()
+
+        rows[-1]["EVOLUCAO"] = "3"
+        self.write_release(rows)
+        summary = self.delta()
+
+        self.assertEqual((summary["updates"], summary["inserts"], summary["deletes"]), (1, 0, 0))
+        self.assertEqual(self.read_delta().loc["00000005", "EVOLUCAO"], "3")
+
+    def test_missing_key_column(self):
+        self.write_release(srag_release(range(10)), columns=COLUMNS[1:])
+        with self.assertRaises(ValueError):
+            self.delta(commit=False)
+        self.assertFalse(self.row_index.exists())
+
+
+class TestKeyCounter(unittest.TestCase):
+
+    def test_occurrences(self):
+        keys = np.array([7, 3, 7, 7, 3, 1], dtype=np.uint64)
+        self.assertEqual(occurrences(keys).tolist(), [0, 0, 1, 2, 1, 0])
+
+    def test_occurrences_across_chunks(self):
+        key_counter = KeyCounter()
+        self.assertEqual(key_counter.number(np.array([7, 3, 7], dtype=np.uint64)).tolist(), [0, 0, 1])
+        self.assertEqual(key_counter.number(np.array([3, 9, 7], dtype=np.uint64)).tolist(), [1, 0, 2])
+        self.assertEqual(dict(zip(key_counter.keys.tolist(), key_counter.counts.tolist())), {3: 2, 7: 3, 9: 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
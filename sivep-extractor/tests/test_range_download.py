@@ -0,0 +1,126 @@
+import os
+import sys
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from download import RangeDownload, DownloadError
+
+from standin import make_file_server, synthetic_csv, stop_server
+
+FILE_SIZE = 50 * 1024 * 1024 + 123 # Not a multiple of the range size
+RANGE_SIZE = 4 * 1024 * 1024
+
+
+def sha256(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TestRangeDownload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.expected_sha256 = sha256(synthetic_csv(FILE_SIZE))
+
+    def setUp(self):
+        self.download_dir = tempfile.TemporaryDirectory()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            stop_server(server)
+        self.download_dir.cleanup()
+
+    def file_server(self, **options):
+        server, url, state = make_file_server({"INFLUD24.csv": FILE_SIZE}, **options)
+        self.servers.append(server)
+        return f"{url}/INFLUD24.csv", state
+
+    def range_download(self, url, **options):
+        return RangeDownload(url, self.download_dir.name, range_size=RANGE_SIZE, workers=4, backoff_factor=0, **options)
+
+    def test_parallel_ranges(self):
+        url, state = self.file_server()
+        range_download = self.range_download(url)
+        path = range_download.download()
+
+        self.assertTrue(range_download.ranges_supported)
+        self.assertEqual(os.path.getsize(path), FILE_SIZE)
+        self.assertEqual(sha256(range_download.open_file()), self.expected_sha256)
+        # One HEAD is not counted: a GET for each range
+        self.assertEqual(state["requests"], -(-FILE_SIZE // RANGE_SIZE))
+
+    def test_dropped_connections_are_retried(self):
+        url, _ = self.file_server(drops=3, drop_after=1024 * 1024)
+        path = self.range_download(url).download()
+
+        self.assertEqual(sha256(RangeDownload(url, self.download_dir.name).open_file()), self.expected_sha256)
+        self.assertEqual(os.path.getsize(path), FILE_SIZE)
+
+    def test_interrupted_download_resumes_from_the_partial_file(self):
+        # The first 8 range requests are dropped after 1 MiB, and are not retried in this run
+        url, _ = self.file_server(drops=8, drop_after=1024 * 1024)
+        with self.assertRaises(DownloadError):
+            self.range_download(url, max_retries=0).download()
+        range_download = self.range_download(url)
+        self.assertTrue(range_download.has_partial())
+
+        # Next run: only the missing ranges are requested
+        path = range_download.download()
+        self.assertEqual(os.path.getsize(path), FILE_SIZE)
+        self.assertEqual(sha256(range_download.open_file()), self.expected_sha256)
+        self.assertEqual(range_download.bytes_downloaded, 8 * RANGE_SIZE)
+
+    def test_changed_file_discards_the_partial_file(self):
+        url, _ = self.file_server(drops=100, drop_after=1024 * 1024)
+        with self.assertRaises(DownloadError):
+            self.range_download(url, max_retries=0).download()
+
+        # The new version of the file is served by another server with a different size
+        server, new_url, _ = make_file_server({"INFLUD24.csv": FILE_SIZE + 10})
+        self.servers.append(server)
+        range_download = self.range_download(f"{new_url}/INFLUD24.csv")
+        path = range_download.download()
+
+        self.assertEqual(os.path.getsize(path), FILE_SIZE + 10)
+        self.assertEqual(range_download.bytes_downloaded, FILE_SIZE + 10)
+
+    def test_single_stream_without_range_support(self):
+        url, state = self.file_server(ranges_supported=False, drops=1, drop_after=1024 * 1024)
+        range_download = self.range_download(url)
+        path = range_download.download()
+
+        self.assertFalse(range_download.ranges_supported)
+        self.assertEqual(state["requests"], 2)
+        self.assertEqual(sha256(range_download.open_file()), self.expected_sha256)
+        self.assertEqual(os.path.getsize(path), FILE_SIZE)
+
+    def test_range_support_probed_without_HEAD(self):
+        url, _ = self.file_server(head_supported=False)
+        range_download = self.range_download(url)
+        range_download.probe()
+
+        self.assertTrue(range_download.ranges_supported)
+        self.assertEqual(range_download.size, FILE_SIZE)
+
+    def test_complete_file_is_not_downloaded_again(self):
+        url, state = self.file_server()
+        self.range_download(url).download()
+        requests_first_download = state["requests"]
+
+        range_download = self.range_download(url)
+        range_download.download()
+        self.assertEqual(state["requests"], requests_first_download)
+        self.assertEqual(range_download.bytes_downloaded, 0)
+
+        range_download.remove()
+        self.assertFalse(range_download.has_partial())
+        self.assertEqual(os.listdir(self.download_dir.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
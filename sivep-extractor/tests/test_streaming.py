@@ -0,0 +1,95 @@
+import os
+import sys
+import hashlib
+import resource
+import unittest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from log import ManagerInterface
+from download import CSVDownload
+
+from standin import make_file_server, make_manager_server, synthetic_csv, stop_server
+
+# Size of the synthetic SRAG file. Small by default, so the suite runs fast; set
+# SIVEP_TEST_FILE_SIZE to the size of a real release (e.g. 2 GiB) to check it at scale.
+FILE_SIZE = int(os.getenv("SIVEP_TEST_FILE_SIZE", 64 * 1024 * 1024))
+# A quarter of the file, so the file can not be buffered
+MAX_MEMORY_GROWTH = min(FILE_SIZE // 4, 256 * 1024 * 1024)
+
+
+def peak_rss():
+    # KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class TestStreamingUpload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.file_server, cls.file_server_url, _ = make_file_server({"INFLUD24.csv": FILE_SIZE, "INFLUD23.csv": 10 * 1024 * 1024})
+        cls.manager_server, cls.manager_url, cls.uploads = make_manager_server()
+        cls.manager_interface = ManagerInterface("sivep-test", cls.manager_url, max_retries=0)
+
+        digest = hashlib.sha256()
+        for chunk in synthetic_csv(FILE_SIZE):
+            digest.update(chunk)
+        cls.expected_sha256 = digest.hexdigest()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.manager_interface.api_handler.close()
+        stop_server(cls.file_server)
+        stop_server(cls.manager_server)
+
+    def setUp(self):
+        self.uploads.clear()
+
+    def test_download_piped_into_upload_with_constant_memory(self):
+        csv_download = CSVDownload(f"{self.file_server_url}/INFLUD24.csv")
+
+        rss_before = peak_rss()
+        uploaded = self.manager_interface.upload_stream("SIVEP", "respat", csv_download.open, "INFLUD24.csv")
+
+        self.assertTrue(uploaded)
+        self.assertEqual(len(self.uploads), 1)
+        self.assertEqual(self.uploads[0]["filename"], "INFLUD24.csv")
+        self.assertTrue(self.uploads[0]["complete"])
+        self.assertEqual(self.uploads[0]["size"], FILE_SIZE)
+        self.assertEqual(self.uploads[0]["sha256"], self.expected_sha256)
+        self.assertEqual(csv_download.bytes_downloaded, FILE_SIZE)
+        self.assertLess(peak_rss() - rss_before, MAX_MEMORY_GROWTH)
+
+    def test_each_attempt_downloads_the_file_again(self):
+        manager_interface = ManagerInterface("sivep-test", self.manager_url, max_retries=1, backoff_factor=0)
+        csv_download = CSVDownload(f"{self.file_server_url}/INFLUD23.csv")
+
+        def interrupted(stream):
+            yield next(stream)
+            stream.close()
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+        attempts = []
+        def open_stream():
+            attempts.append(csv_download.open())
+            # The first download fails after the first chunk
+            return interrupted(attempts[-1]) if len(attempts) == 1 else attempts[-1]
+
+        uploaded = manager_interface.upload_stream("SIVEP", "respat", open_stream, "INFLUD23.csv")
+        manager_interface.api_handler.close()
+
+        self.assertTrue(uploaded)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual([upload["size"] for upload in self.uploads], [10 * 1024 * 1024])
+        self.assertEqual(csv_download.bytes_downloaded, 10 * 1024 * 1024)
+
+    def test_missing_file_is_not_uploaded(self):
+        csv_download = CSVDownload(f"{self.file_server_url}/INFLUD19.csv")
+        uploaded = self.manager_interface.upload_stream("SIVEP", "respat", csv_download.open, "INFLUD19.csv")
+
+        self.assertFalse(uploaded)
+        self.assertEqual(self.uploads, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from download import CSVDownload
+from validators import ValidatorStore, is_unchanged
+
+from standin import make_file_server, stop_server
+
+
+class TestConditionalDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.files = {"INFLUD21.csv": 1024 * 1024}
+        self.file_server, self.file_server_url, _ = make_file_server(self.files)
+        self.url = f"{self.file_server_url}/INFLUD21.csv"
+
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.validator_store = ValidatorStore(os.path.join(self.data_dir.name, "validators.json"))
+
+        # First run: the file is downloaded and its validators saved
+        csv_download = CSVDownload(self.url)
+        for _ in csv_download.open():
+            pass
+        self.validator_store.set(self.url, csv_download.validators)
+
+    def tearDown(self):
+        stop_server(self.file_server)
+        self.data_dir.cleanup()
+
+    def test_validators_are_persisted(self):
+        saved = ValidatorStore(self.validator_store.path).get(self.url)
+        self.assertEqual(saved["content_length"], 1024 * 1024)
+        self.assertEqual(saved["etag"], '"INFLUD21.csv-1048576"')
+        self.assertIsNotNone(saved["last_modified"])
+
+    def test_unchanged_file_is_skipped(self):
+        csv_download = CSVDownload(self.url)
+        self.assertTrue(csv_download.is_unchanged(self.validator_store.get(self.url)))
+        self.assertEqual(csv_download.bytes_downloaded, 0)
+
+    def test_changed_file_is_downloaded(self):
+        self.files["INFLUD21.csv"] += 100
+        self.assertFalse(CSVDownload(self.url).is_unchanged(self.validator_store.get(self.url)))
+
+    def test_new_file_is_downloaded(self):
+        self.assertFalse(CSVDownload(self.url).is_unchanged(None))
+
+    def test_conditional_get_without_HEAD_support(self):
+        file_server, file_server_url, _ = make_file_server(self.files, head_supported=False)
+        try:
+            url = f"{file_server_url}/INFLUD21.csv"
+            self.assertTrue(CSVDownload(url).is_unchanged(self.validator_store.get(self.url)))
+
+            self.files["INFLUD21.csv"] += 100
+            self.assertFalse(CSVDownload(url).is_unchanged(self.validator_store.get(self.url)))
+        finally:
+            stop_server(file_server)
+
+    def test_size_change_with_same_etag_is_a_change(self):
+        saved = self.validator_store.get(self.url)
+        self.assertFalse(is_unchanged(saved, {**saved, "content_length": saved["content_length"] + 1}))
+
+    def test_last_modified_used_without_etag(self):
+        saved = {**self.validator_store.get(self.url), "etag": None}
+        self.assertTrue(is_unchanged(saved, saved))
+        self.assertFalse(is_unchanged(saved, {**saved, "last_modified": "Tue, 02 Jan 2024 00:00:00 GMT"}))
+
+    def test_no_validators_is_a_change(self):
+        no_validators = {"etag": None, "last_modified": None, "content_length": 100}
+        self.assertFalse(is_unchanged(no_validators, no_validators))
+
+
+class TestValidatorStoreSettings(unittest.TestCase):
+
+    CSV_SETTINGS = {"output_format": "csv", "delta_key": None, "column_types": None}
+    VALIDATORS = {"etag": '"a"', "last_modified": None, "content_length": 10}
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.data_dir.name, "validators.json")
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_other_settings_are_a_change(self):
+        validator_store = ValidatorStore(self.path)
+        validator_store.set("url", self.VALIDATORS, self.CSV_SETTINGS)
+
+        validator_store = ValidatorStore(self.path)
+        self.assertEqual(validator_store.get("url", self.CSV_SETTINGS), self.VALIDATORS)
+        self.assertIsNone(validator_store.get("url", {**self.CSV_SETTINGS, "output_format": "both"}))
+        self.assertIsNone(validator_store.get("url", {**self.CSV_SETTINGS, "delta_key": ["NU_NOTIFIC"]}))
+        # Without settings, the validators are returned anyway
+        self.assertEqual(validator_store.get("url"), self.VALIDATORS)
+
+    def test_validators_saved_without_settings(self):
+        with open(self.path, "w") as f:
+            json.dump({"url": self.VALIDATORS}, f)
+
+        validator_store = ValidatorStore(self.path, legacy_settings=self.CSV_SETTINGS)
+        self.assertEqual(validator_store.get("url", self.CSV_SETTINGS), self.VALIDATORS)
+        self.assertIsNone(validator_store.get("url", {**self.CSV_SETTINGS, "output_format": "parquet", "column_types": {}}))
+        self.assertEqual(validator_store.settings("url"), self.CSV_SETTINGS)
+
+    def test_widened_column_is_a_change(self):
+        parquet_settings = {**self.CSV_SETTINGS, "output_format": "parquet", "column_types": {"NU_IDADE_N": "int"}}
+        validator_store = ValidatorStore(self.path)
+        validator_store.set("url", self.VALIDATORS, parquet_settings)
+
+        self.assertEqual(validator_store.settings("url"), parquet_settings)
+        self.assertEqual(validator_store.get("url", parquet_settings), self.VALIDATORS)
+        self.assertIsNone(validator_store.get("url", {**parquet_settings, "column_types": {"NU_IDADE_N": "string"}}))
+        self.assertIsNone(validator_store.settings("other url"))
+
+
+if __name__ == "__main__":
+    unittest.main()